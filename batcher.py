@@ -0,0 +1,157 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+import metrics
+
+batch_flushes = metrics.counter('batcher_flushes_total', 'Write batches committed')
+batch_rows = metrics.counter('batcher_rows_total', 'Items written through the batcher')
+batch_errors = metrics.counter('batcher_errors_total', 'Write batches that failed to commit')
+batch_dropped = metrics.counter('batcher_dropped_total', 'Items discarded because the pending queue was full')
+batch_size = metrics.histogram(
+    'batcher_batch_size', 'Items per committed batch',
+    buckets=(1, 5, 10, 25, 50, 100, 250, 500, 1000)
+)
+batch_latency = metrics.histogram('batcher_flush_seconds', 'Time spent committing one batch')
+batch_pending = metrics.gauge('batcher_pending', 'Items waiting for the next flush')
+
+
+class WriteBatcher:
+    """Write-behind queue that hands pending items to ``write`` in batches.
+
+    ``write`` receives the items in the order they were added, every
+    ``interval_ms`` milliseconds or as soon as ``max_rows`` are pending,
+    whichever comes first, and is expected to commit them atomically. Items
+    added with a ``key`` report it to the ``on_flush`` callbacks once their
+    batch has been committed.
+
+    A batch whose write fails goes back to the front of the queue and is
+    retried with exponential backoff, up to ``max_backoff_ms``. Only when
+    more than ``max_pending`` items are waiting are the oldest dropped (and
+    counted in ``batcher_dropped_total``).
+    """
+
+    def __init__(self, write: Callable[[List[Any]], Awaitable[None]], interval_ms: int, max_rows: int,
+                 max_pending: int, max_backoff_ms: int = 30_000):
+        self.write = write
+        self.interval = interval_ms / 1000
+        self.max_rows = max_rows
+        self.max_pending = max_pending
+        self.max_backoff = max_backoff_ms / 1000
+        # (item, key) pairs in the order they were added
+        self._pending: List[Tuple[Any, Any]] = []
+        # key -> pending items added with it
+        self._keys: Dict[Any, int] = {}
+        self.on_flush: List[Callable[[Set[Any]], Awaitable[None]]] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+
+    @property
+    def size(self) -> int:
+        return len(self._pending)
+
+    def start(self):
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        try:
+            await self.flush()
+        except Exception as e:
+            lost = len(self._pending)
+            batch_dropped.inc(lost)
+            self._pending, self._keys = [], {}
+            batch_pending.set(0)
+            print(f"Erro ao gravar o último lote ao encerrar; {lost} itens descartados: {e}")
+
+    def add(self, item: Any, key: Any = None):
+        self._pending.append((item, key))
+        if key is not None:
+            self._keys[key] = self._keys.get(key, 0) + 1
+        self._trim()
+        batch_pending.set(len(self._pending))
+        if len(self._pending) >= self.max_rows and self._wakeup is not None:
+            self._wakeup.set()
+
+    def _lock(self) -> asyncio.Lock:
+        # Created on first use so it belongs to the running loop, even when
+        # stop() flushes a batcher that was never started
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+        return self._flush_lock
+
+    async def flush(self):
+        async with self._lock():
+            if not self._pending:
+                return
+            batch, self._pending = self._pending, []
+            keys, self._keys = self._keys, {}
+            batch_pending.set(len(self._pending))
+
+            start = time.perf_counter()
+            try:
+                await self.write([item for item, _ in batch])
+            except Exception:
+                batch_errors.inc()
+                # Back in front of anything added meanwhile, so order is kept
+                self._pending = batch + self._pending
+                for key, count in keys.items():
+                    self._keys[key] = self._keys.get(key, 0) + count
+                self._trim()
+                batch_pending.set(len(self._pending))
+                raise
+            batch_latency.observe(time.perf_counter() - start)
+            batch_flushes.inc()
+            batch_rows.inc(len(batch))
+            batch_size.observe(len(batch))
+
+            # The batch is committed; a failing callback must not retry it
+            for callback in self.on_flush:
+                try:
+                    await callback(set(keys))
+                except Exception as e:
+                    print(f"Erro após gravar lote: {e}")
+
+    def _trim(self):
+        overflow = len(self._pending) - self.max_pending
+        if overflow <= 0:
+            return
+        dropped = self._pending[:overflow]
+        del self._pending[:overflow]
+        batch_dropped.inc(overflow)
+        # A key stays reported only while an item added with it is pending
+        for _, key in dropped:
+            if key is None:
+                continue
+            remaining = self._keys[key] - 1
+            if remaining:
+                self._keys[key] = remaining
+            else:
+                del self._keys[key]
+
+    async def _run(self):
+        failures = 0
+        while True:
+            if failures:
+                # Backing off: don't let max_rows wake-ups hammer a failing database
+                await asyncio.sleep(min(self.max_backoff, self.interval * 2 ** failures))
+            else:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.interval)
+                except asyncio.TimeoutError:
+                    pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+                failures = 0
+            except Exception as e:
+                failures += 1
+                print(f"Erro ao gravar lote de mensagens ({len(self._pending)} pendentes, tentativa {failures}): {e}")
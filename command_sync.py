@@ -0,0 +1,62 @@
+import hashlib
+import json
+from datetime import datetime, timezone
+from typing import Optional
+
+import discord
+from discord import app_commands
+
+import metrics
+from database import Database
+
+command_syncs = metrics.counter('command_syncs_total', 'Slash command tree syncs at startup by outcome', ['result'])
+
+
+class CommandSync:
+    """Syncs the slash command tree only when it changed since the last sync.
+
+    The signature is a SHA-256 of the payload Discord receives (names,
+    descriptions, parameters, permissions), so any edit that Discord would
+    see changes it. Signatures are kept per application and scope (global
+    or guild) in the local SQLite file, next to the scheduler state.
+    """
+
+    def __init__(self, db: Database, tree: app_commands.CommandTree):
+        self.db = db
+        self.tree = tree
+
+    async def setup(self):
+        await self.db.execute('''
+            CREATE TABLE IF NOT EXISTS command_sync (
+                scope TEXT PRIMARY KEY,
+                signature TEXT NOT NULL,
+                synced_at TIMESTAMP
+            )
+        ''')
+
+    def signature(self, guild: Optional[discord.abc.Snowflake] = None) -> str:
+        payload = sorted(
+            (command.to_dict() for command in self.tree.get_commands(guild=guild)),
+            key=lambda command: (command.get('type', 1), command['name'])
+        )
+        encoded = json.dumps(payload, sort_keys=True, separators=(',', ':'), default=str)
+        return hashlib.sha256(encoded.encode()).hexdigest()
+
+    async def sync(self, guild: Optional[discord.abc.Snowflake] = None, force: bool = False) -> bool:
+        """Sync ``guild`` (or the global commands); returns False when skipped."""
+        scope = f"{self.tree.client.application_id}:{guild.id if guild else 'global'}"
+        signature = self.signature(guild)
+        row = await self.db.fetchone('SELECT signature FROM command_sync WHERE scope = ?', (scope,))
+        if not force and row is not None and row[0] == signature:
+            command_syncs.labels(result='skipped').inc()
+            return False
+
+        await self.tree.sync(guild=guild)
+        # Recorded only after Discord accepted it, so a failed sync is retried next boot
+        await self.db.execute('''
+            INSERT INTO command_sync (scope, signature, synced_at)
+            VALUES (?, ?, ?)
+            ON CONFLICT (scope) DO UPDATE SET signature = excluded.signature, synced_at = excluded.synced_at
+        ''', (scope, signature, datetime.now(timezone.utc).isoformat()))
+        command_syncs.labels(result='forced' if force else 'synced').inc()
+        return True
@@ -0,0 +1,155 @@
+import os
+from typing import List, Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+def _int(name: str, default: int) -> int:
+    return int(os.getenv(name, default))
+
+
+def _float(name: str, default: float) -> float:
+    return float(os.getenv(name, default))
+
+
+def _bool(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+def _optional_int(name: str) -> Optional[int]:
+    value = os.getenv(name)
+    return int(value) if value else None
+
+
+def _int_list(name: str) -> Optional[List[int]]:
+    value = os.getenv(name)
+    if not value:
+        return None
+    return [int(item) for item in value.split(',') if item.strip()]
+
+
+DATABASE_PATH = os.getenv('DATABASE_PATH', 'economy.db')
+
+# Write-behind batching for on_message
+MESSAGE_BATCH_INTERVAL_MS = _int('MESSAGE_BATCH_INTERVAL_MS', 500)
+MESSAGE_BATCH_MAX_ROWS = _int('MESSAGE_BATCH_MAX_ROWS', 500)
+# Failed batches are kept and retried; past this many waiting messages the
+# oldest are dropped
+MESSAGE_BATCH_MAX_PENDING = _int('MESSAGE_BATCH_MAX_PENDING', 50_000)
+
+# Per-account token bucket for messages that count (stored and towards the
+# reward); messages past it are dropped before any database work. A rate
+# of 0 disables the limit.
+MESSAGE_RATE_PER_MINUTE = _float('MESSAGE_RATE_PER_MINUTE', 20)
+MESSAGE_RATE_BURST = _int('MESSAGE_RATE_BURST', 5)
+MESSAGE_RATE_MAX_ACCOUNTS = _int('MESSAGE_RATE_MAX_ACCOUNTS', 100_000)
+
+# Message retention
+STORE_MESSAGE_CONTENT = _bool('STORE_MESSAGE_CONTENT', True)
+MESSAGE_RETENTION_HOURS = _int('MESSAGE_RETENTION_HOURS', 72)
+RETENTION_CRON = os.getenv('RETENTION_CRON', '0 * * * *')
+RETENTION_CHUNK_ROWS = _int('RETENTION_CHUNK_ROWS', 1000)
+RETENTION_VACUUM_PAGES = _int('RETENTION_VACUUM_PAGES', 500)
+
+# Sharding: this process runs the SHARD_IDS shards (e.g. "0,1") out of
+# SHARD_COUNT. With both unset it runs every shard, in the number Discord
+# recommends.
+SHARD_COUNT = _optional_int('SHARD_COUNT')
+SHARD_IDS = _int_list('SHARD_IDS')
+
+# Slash commands are synced globally; set a guild ID to sync there instead
+# (updates immediately, handy for testing). The sync is skipped when the
+# command tree hasn't changed since the last one, unless forced.
+COMMAND_SYNC_GUILD_ID = _optional_int('COMMAND_SYNC_GUILD_ID')
+FORCE_COMMAND_SYNC = _bool('FORCE_COMMAND_SYNC', False)
+
+# Default rewards; /configurar overrides them per guild
+# Message rewards (cents paid on every 10th message)
+MESSAGE_REWARD = _int('MESSAGE_REWARD', 300)
+# Voice rewards (cents per minute in an eligible voice session)
+VOICE_REWARD_PER_MINUTE = _int('VOICE_REWARD_PER_MINUTE', 600)
+VOICE_CHECKPOINT_CRON = os.getenv('VOICE_CHECKPOINT_CRON', '* * * * *')
+
+# Display-name cache used by rankings
+MEMBER_CACHE_TTL_SECONDS = _int('MEMBER_CACHE_TTL_SECONDS', 600)
+MEMBER_CACHE_SIZE = _int('MEMBER_CACHE_SIZE', 5000)
+
+# How long a rendered ranking may be reused after balances change
+RANKING_STALENESS_SECONDS = _float('RANKING_STALENESS_SECONDS', 30)
+
+# Wall-clock scheduler
+SCHEDULER_TIMEZONE = os.getenv('SCHEDULER_TIMEZONE', 'America/Sao_Paulo')
+DAILY_RANKING_CRON = os.getenv('DAILY_RANKING_CRON', '0 0 * * *')
+LEADERBOARD_CHECK_CRON = os.getenv('LEADERBOARD_CHECK_CRON', '30 * * * *')
+LEDGER_CHECKPOINT_CRON = os.getenv('LEDGER_CHECKPOINT_CRON', '15 3 * * *')
+
+# HTTP server (payment webhooks); PORT is what most hosts inject
+WEB_HOST = os.getenv('WEB_HOST', '0.0.0.0')
+WEB_PORT = _int('PORT', 8080)
+# Public URL Mercado Pago posts notifications to, e.g. https://host/webhooks/mercadopago
+MERCADOPAGO_NOTIFICATION_URL = os.getenv('MERCADOPAGO_NOTIFICATION_URL')
+# Secret from the Mercado Pago dashboard; when unset signatures are not checked
+MERCADOPAGO_WEBHOOK_SECRET = os.getenv('MERCADOPAGO_WEBHOOK_SECRET')
+
+# Mercado Pago API calls (blocking SDK, run on a dedicated pool)
+MERCADOPAGO_WORKERS = _int('MERCADOPAGO_WORKERS', 4)
+MERCADOPAGO_TIMEOUT_SECONDS = _float('MERCADOPAGO_TIMEOUT_SECONDS', 8)
+
+# Background delivery of receipts and log posts: concurrent sends, queue
+# bound, attempts per notification and retry backoff (doubling from the
+# base, capped at the max, never shorter than Discord's Retry-After)
+NOTIFICATION_WORKERS = _int('NOTIFICATION_WORKERS', 4)
+NOTIFICATION_QUEUE_SIZE = _int('NOTIFICATION_QUEUE_SIZE', 10_000)
+NOTIFICATION_MAX_ATTEMPTS = _int('NOTIFICATION_MAX_ATTEMPTS', 5)
+NOTIFICATION_RETRY_BASE_SECONDS = _float('NOTIFICATION_RETRY_BASE_SECONDS', 1.0)
+NOTIFICATION_RETRY_MAX_SECONDS = _float('NOTIFICATION_RETRY_MAX_SECONDS', 60.0)
+# How long a user whose DMs refused a receipt is skipped without trying
+NOTIFICATION_CLOSED_DM_TTL_SECONDS = _float('NOTIFICATION_CLOSED_DM_TTL_SECONDS', 3600)
+# Time queued notifications get to go out on shutdown
+NOTIFICATION_DRAIN_SECONDS = _float('NOTIFICATION_DRAIN_SECONDS', 5.0)
+
+# Health endpoint: unhealthy past this event-loop lag or DB probe time
+HEALTH_MAX_LOOP_LAG_SECONDS = _float('HEALTH_MAX_LOOP_LAG_SECONDS', 1.0)
+HEALTH_DB_TIMEOUT_SECONDS = _float('HEALTH_DB_TIMEOUT_SECONDS', 2.0)
+
+# Tracing: handlers slower than this print a span with per-phase timings.
+# SLOW_CALLBACK_SECONDS > 0 turns on asyncio's debug mode to log callbacks
+# that hold the event loop longer than that; debug mode slows the whole bot
+# down, so it's off unless set while chasing a stall
+TRACE_SPAN_THRESHOLD_SECONDS = _float('TRACE_SPAN_THRESHOLD_SECONDS', 1.0)
+SLOW_CALLBACK_SECONDS = _float('SLOW_CALLBACK_SECONDS', 0)
+
+# SQLite storage profile, applied on every connect. WAL lets readers run
+# alongside the writer and, with synchronous=NORMAL, fsyncs on checkpoints
+# instead of every commit (a crash can lose the last commits, not corrupt).
+SQLITE_JOURNAL_MODE = os.getenv('SQLITE_JOURNAL_MODE', 'WAL')
+SQLITE_SYNCHRONOUS = os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL')
+SQLITE_MMAP_SIZE = _int('SQLITE_MMAP_SIZE', 256 * 1024 * 1024)
+# Negative values are KiB, positive values are pages
+SQLITE_CACHE_SIZE = _int('SQLITE_CACHE_SIZE', -64 * 1024)
+SQLITE_BUSY_TIMEOUT_MS = _int('SQLITE_BUSY_TIMEOUT_MS', 5000)
+
+SQLITE_PRAGMAS = {
+    # Only takes effect on a new file, so it must precede journal_mode
+    # (which creates the file); existing files are converted offline with
+    # python -m tools.sqlite_maintenance
+    'auto_vacuum': 'INCREMENTAL',
+    'busy_timeout': SQLITE_BUSY_TIMEOUT_MS,
+    'journal_mode': SQLITE_JOURNAL_MODE,
+    'synchronous': SQLITE_SYNCHRONOUS,
+    'cache_size': SQLITE_CACHE_SIZE,
+    'mmap_size': SQLITE_MMAP_SIZE,
+}
+
+# Storage backend for accounts, messages, exemptions and rankings: 'sqlite'
+# (DATABASE_PATH) or 'postgres' (POSTGRES_DSN). Scheduler state always stays
+# in the local SQLite file.
+STORAGE_BACKEND = os.getenv('STORAGE_BACKEND', 'sqlite').lower()
+POSTGRES_DSN = os.getenv('POSTGRES_DSN', os.getenv('DATABASE_URL'))
+POSTGRES_POOL_MIN = _int('POSTGRES_POOL_MIN', 1)
+POSTGRES_POOL_MAX = _int('POSTGRES_POOL_MAX', 10)
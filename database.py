@@ -0,0 +1,192 @@
+import asyncio
+import contextlib
+import functools
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Optional, Sequence, Tuple
+
+import metrics
+import tracing
+
+query_seconds = metrics.histogram(
+    'db_query_seconds', 'Time statements spend executing on the SQLite worker', ['op']
+)
+lock_wait_seconds = metrics.histogram('db_lock_wait_seconds', 'Time spent waiting for the database lock')
+
+
+def _timed(op: str):
+    def decorator(func):
+        histogram = query_seconds.labels(op=op)
+
+        @functools.wraps(func)
+        def wrapper(*args):
+            start = time.perf_counter()
+            try:
+                return func(*args)
+            finally:
+                histogram.observe(time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+class Transaction:
+    """Handle returned by ``Database.transaction()``; every call runs on the worker thread."""
+
+    def __init__(self, db: 'Database'):
+        self._db = db
+
+    async def execute(self, sql: str, params: Sequence[Any] = ()) -> int:
+        return await self._db._run(self._db._execute, sql, params)
+
+    async def executemany(self, sql: str, seq: Iterable[Sequence[Any]]) -> int:
+        return await self._db._run(self._db._executemany, sql, list(seq))
+
+    async def execute_batch(self, statements: Iterable[Tuple[str, Sequence[Any]]]):
+        """Run a list of ``(sql, params)`` pairs in order with a single worker hop."""
+        await self._db._run(self._db._execute_batch, list(statements))
+
+    async def fetchone(self, sql: str, params: Sequence[Any] = ()) -> Optional[tuple]:
+        return await self._db._run(self._db._fetchone, sql, params)
+
+    async def fetchall(self, sql: str, params: Sequence[Any] = ()) -> list:
+        return await self._db._run(self._db._fetchall, sql, params)
+
+
+class _TransactionContext:
+    def __init__(self, db: 'Database'):
+        self._db = db
+
+    async def __aenter__(self) -> Transaction:
+        await self._db._acquire()
+        try:
+            await self._db._run(self._db._begin)
+        except BaseException:
+            self._db._lock.release()
+            raise
+        return Transaction(self._db)
+
+    async def __aexit__(self, exc_type, exc, tb):
+        try:
+            await self._db._run(self._db._commit if exc_type is None else self._db._rollback)
+        finally:
+            self._db._lock.release()
+        return False
+
+
+class Database:
+    """SQLite connection owned by a dedicated worker thread.
+
+    All statements are shipped to that thread, so a slow disk or a long
+    fsync never blocks the event loop. Standalone calls run in autocommit
+    mode; use ``transaction()`` to group several statements in one commit.
+
+    ``pragmas`` are applied in order right after connecting, e.g.
+    ``{'journal_mode': 'WAL', 'synchronous': 'NORMAL'}``.
+    """
+
+    def __init__(self, path: str, pragmas: Optional[Dict[str, Any]] = None):
+        self.path = path
+        self.pragmas = dict(pragmas or {})
+        self.conn: Optional[sqlite3.Connection] = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='sqlite')
+        self._lock: Optional[asyncio.Lock] = None
+
+    async def connect(self):
+        # The lock is created here so it belongs to the loop the bot runs on
+        self._lock = asyncio.Lock()
+        self.conn = await self._run(sqlite3.connect, self.path, isolation_level=None)
+        for name, value in self.pragmas.items():
+            # Some pragmas (journal_mode) answer with a row that must be read
+            await self.fetchall(f'PRAGMA {name} = {value}')
+
+    async def pragma_report(self) -> Dict[str, Any]:
+        """Values in effect for the configured pragmas (plus journal_mode)."""
+        names = ['journal_mode', *(name for name in self.pragmas if name != 'journal_mode')]
+        report = {}
+        for name in names:
+            row = await self.fetchone(f'PRAGMA {name}')
+            report[name] = row[0] if row else None
+        return report
+
+    async def close(self):
+        if self.conn is not None:
+            async with self._lock:
+                await self._run(self.conn.close)
+            self.conn = None
+        self._executor.shutdown(wait=True)
+
+    async def _run(self, func: Callable, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        with tracing.phase('db'):
+            return await loop.run_in_executor(self._executor, lambda: func(*args, **kwargs))
+
+    async def _acquire(self):
+        start = time.perf_counter()
+        with tracing.phase('db'):
+            await self._lock.acquire()
+        lock_wait_seconds.observe(time.perf_counter() - start)
+
+    @contextlib.asynccontextmanager
+    async def _locked(self):
+        await self._acquire()
+        try:
+            yield
+        finally:
+            self._lock.release()
+
+    # Worker-thread helpers
+
+    @_timed('begin')
+    def _begin(self):
+        self.conn.execute('BEGIN IMMEDIATE')
+
+    @_timed('commit')
+    def _commit(self):
+        self.conn.execute('COMMIT')
+
+    @_timed('rollback')
+    def _rollback(self):
+        self.conn.execute('ROLLBACK')
+
+    @_timed('execute')
+    def _execute(self, sql, params):
+        return self.conn.execute(sql, params).rowcount
+
+    @_timed('executemany')
+    def _executemany(self, sql, seq):
+        return self.conn.executemany(sql, seq).rowcount
+
+    @_timed('execute_batch')
+    def _execute_batch(self, statements):
+        for sql, params in statements:
+            self.conn.execute(sql, params)
+
+    @_timed('fetchone')
+    def _fetchone(self, sql, params):
+        return self.conn.execute(sql, params).fetchone()
+
+    @_timed('fetchall')
+    def _fetchall(self, sql, params):
+        return self.conn.execute(sql, params).fetchall()
+
+    # Public API
+
+    async def execute(self, sql: str, params: Sequence[Any] = ()) -> int:
+        async with self._locked():
+            return await self._run(self._execute, sql, params)
+
+    async def executemany(self, sql: str, seq: Iterable[Sequence[Any]]) -> int:
+        async with self.transaction() as tx:
+            return await tx.executemany(sql, seq)
+
+    async def fetchone(self, sql: str, params: Sequence[Any] = ()) -> Optional[tuple]:
+        async with self._locked():
+            return await self._run(self._fetchone, sql, params)
+
+    async def fetchall(self, sql: str, params: Sequence[Any] = ()) -> list:
+        async with self._locked():
+            return await self._run(self._fetchall, sql, params)
+
+    def transaction(self) -> _TransactionContext:
+        return _TransactionContext(self)
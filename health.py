@@ -0,0 +1,113 @@
+import asyncio
+import json
+import math
+import os
+import resource
+import time
+from typing import Optional
+
+import discord
+from aiohttp import web
+
+import metrics
+from storage import Storage
+
+loop_lag = metrics.gauge('event_loop_lag_seconds', 'How late the last loop-lag probe woke up')
+gateway_latency = metrics.gauge('discord_gateway_latency_seconds', 'Heartbeat latency of the gateway connection')
+resident_memory = metrics.gauge('process_resident_memory_bytes', 'Resident set size of the bot process')
+
+
+def resident_memory_bytes() -> int:
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        # Peak rather than current RSS, in KiB on Linux
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class HealthMonitor:
+    """Serves ``/`` (liveness for the deploy healthcheck) and ``/metrics``.
+
+    Loop lag is measured by a task that sleeps ``interval`` seconds and
+    records how late it woke up.
+    """
+
+    def __init__(self, client: discord.Client, storage: Storage, max_loop_lag: float,
+                 db_timeout: float, interval: float = 1.0):
+        self.client = client
+        self.storage = storage
+        self.max_loop_lag = max_loop_lag
+        self.db_timeout = db_timeout
+        self.interval = interval
+        self.lag = 0.0
+        self._task: Optional[asyncio.Task] = None
+        self._db_probe: Optional[asyncio.Task] = None
+
+    def start(self):
+        self._task = asyncio.get_running_loop().create_task(self._measure_lag())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _measure_lag(self):
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.lag = max(0.0, time.perf_counter() - start - self.interval)
+            loop_lag.set(self.lag)
+
+    async def _db_writable(self) -> Optional[str]:
+        # The probe is never cancelled: abandoning a transaction half-way on
+        # the worker thread would leave it open. A slow probe is shared by
+        # later checks instead of piling up.
+        if self._db_probe is None or self._db_probe.done():
+            self._db_probe = asyncio.get_running_loop().create_task(self.storage.check_writable())
+        try:
+            await asyncio.wait_for(asyncio.shield(self._db_probe), self.db_timeout)
+        except asyncio.TimeoutError:
+            return 'timeout'
+        except Exception as e:
+            return str(e)
+        return None
+
+    def _gateway_latency(self) -> Optional[float]:
+        # nan before the first connection, inf before the first heartbeat ack
+        latency = self.client.latency
+        return latency if math.isfinite(latency) else None
+
+    async def health(self, request: web.Request) -> web.Response:
+        db_error = await self._db_writable()
+        ready = self.client.is_ready() and not self.client.is_closed()
+        latency = self._gateway_latency()
+        report = {
+            'gateway': {
+                'ready': ready,
+                'latency_ms': round(latency * 1000, 1) if latency is not None else None,
+            },
+            'event_loop_lag_ms': round(self.lag * 1000, 1),
+            'database': {'writable': db_error is None, 'error': db_error},
+        }
+        healthy = ready and db_error is None and self.lag <= self.max_loop_lag
+        report['status'] = 'ok' if healthy else 'unhealthy'
+        return web.Response(
+            status=200 if healthy else 503,
+            text=json.dumps(report),
+            content_type='application/json'
+        )
+
+    async def metrics(self, request: web.Request) -> web.Response:
+        resident_memory.set(resident_memory_bytes())
+        latency = self._gateway_latency()
+        if latency is not None:
+            gateway_latency.set(latency)
+        return web.Response(
+            body=metrics.render(metrics.REGISTRY).encode(),
+            headers={'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
+        )
@@ -0,0 +1,89 @@
+import functools
+import time
+
+import aiohttp
+import discord
+from discord import app_commands
+
+import metrics
+import tracing
+
+commands_total = metrics.counter('app_commands_total', 'Slash command invocations by outcome', ['command', 'result'])
+command_seconds = metrics.histogram('app_command_seconds', 'Slash command handler latency', ['command'])
+
+
+def timed_command(name: str, callback):
+    """Wrap a slash command callback so each run is timed inside its own span."""
+
+    @functools.wraps(callback)
+    async def wrapper(interaction: discord.Interaction, *args, **kwargs):
+        start = time.perf_counter()
+        result = 'error'
+        try:
+            async with tracing.span(
+                f'/{name}',
+                interaction_id=interaction.id,
+                user_id=interaction.user.id,
+                guild_id=interaction.guild_id
+            ):
+                value = await callback(interaction, *args, **kwargs)
+            result = 'ok'
+            return value
+        finally:
+            commands_total.labels(command=name, result=result).inc()
+            command_seconds.labels(command=name).observe(time.perf_counter() - start)
+    return wrapper
+
+
+class InstrumentedTree(app_commands.CommandTree):
+    """Command tree that times every slash command registered through it."""
+
+    def command(self, **kwargs):
+        decorator = super().command(**kwargs)
+
+        # functools.wraps keeps the signature, docstring and the attributes
+        # decorators like guild_only() set, so discord.py builds the same command
+        def register(callback):
+            name = str(kwargs.get('name') or callback.__name__)
+            return decorator(timed_command(name, callback))
+        return register
+
+
+def traced_event(coro):
+    """Wrap an event handler so each dispatch runs inside its own span."""
+    name = coro.__name__
+
+    @functools.wraps(coro)
+    async def wrapper(*args, **kwargs):
+        async with tracing.span(name):
+            return await coro(*args, **kwargs)
+    return wrapper
+
+
+def _http_phase(url) -> str:
+    # Interaction responses and followups are webhook calls; the rest is REST
+    path = url.path
+    return 'response' if '/interactions/' in path or '/webhooks/' in path else 'rest'
+
+
+async def _on_request_start(session, context, params):
+    context.span = tracing.current()
+    context.start = time.perf_counter()
+
+
+async def _on_request_end(session, context, params):
+    if context.span is not None:
+        context.span.add(_http_phase(params.url), time.perf_counter() - context.start)
+
+
+def http_trace() -> aiohttp.TraceConfig:
+    """Trace config for the client's HTTP session that charges each Discord
+    API call to the current span: ``response`` for interaction responses and
+    followups, ``rest`` for everything else.
+    """
+    trace = aiohttp.TraceConfig()
+    trace.on_request_start.append(_on_request_start)
+    trace.on_request_end.append(_on_request_end)
+    # Failed attempts took time too; discord.py retries some of them
+    trace.on_request_exception.append(_on_request_end)
+    return trace
@@ -0,0 +1,253 @@
+import asyncio
+import time
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Tuple
+
+from sortedcontainers import SortedList
+
+import metrics
+
+if TYPE_CHECKING:
+    # Only needed for annotations
+    from storage import Account, Storage
+
+snapshot_builds = metrics.counter('leaderboard_snapshot_builds_total', 'Leaderboard snapshots rendered')
+snapshot_hits = metrics.counter('leaderboard_snapshot_hits_total', 'Rankings served from a memoized snapshot')
+
+
+def assign_ranks(rows: List[Tuple[int, int]], first_rank: int = 1) -> List[Tuple[int, int, int]]:
+    """Turn (user_id, balance) rows sorted by balance DESC into RANK()-style positions."""
+    ranked = []
+    previous_balance = None
+    position = first_rank - 1
+    for index, (user_id, balance) in enumerate(rows):
+        if balance != previous_balance:
+            position = first_rank + index
+            previous_balance = balance
+        ranked.append((user_id, balance, position))
+    return ranked
+
+
+class Leaderboard:
+    """In-memory ranking of one guild's funded accounts, kept in step with every balance write.
+
+    Entries are ordered by ``(-balance, user_id)`` so rank lookups are
+    O(log n) and the top k are read in O(k). Only positive balances are
+    ranked, mirroring ``WHERE balance > 0`` in the SQL queries.
+    """
+
+    def __init__(self):
+        self.balances: Dict[int, int] = {}
+        self._ranked = SortedList()
+        self._total = 0
+        # Bumped on every balance change so snapshots know when they are stale
+        self.version = 0
+
+    def load(self, balances: Dict[int, int]):
+        self.balances = balances
+        self._ranked = SortedList(
+            (-balance, user_id) for user_id, balance in self.balances.items() if balance > 0
+        )
+        self._total = sum(-key[0] for key in self._ranked)
+        self.version += 1
+
+    def set(self, user_id: int, balance: int):
+        old = self.balances.get(user_id, 0)
+        if old == balance and user_id in self.balances:
+            return
+        if old > 0:
+            self._ranked.remove((-old, user_id))
+            self._total -= old
+        if balance > 0:
+            self._ranked.add((-balance, user_id))
+            self._total += balance
+        self.balances[user_id] = balance
+        self.version += 1
+
+    def add(self, user_id: int, delta: int):
+        self.set(user_id, self.balances.get(user_id, 0) + delta)
+
+    def reset_all(self, only_positive: bool = False):
+        if only_positive:
+            self.balances = {user_id: min(balance, 0) for user_id, balance in self.balances.items()}
+        else:
+            self.balances = dict.fromkeys(self.balances, 0)
+        self._ranked.clear()
+        self._total = 0
+        self.version += 1
+
+    def top(self, limit: int = 10) -> List[Tuple[int, int, int]]:
+        rows = [(user_id, -key) for key, user_id in self._ranked.islice(0, limit)]
+        return assign_ranks(rows)
+
+    def rank(self, user_id: int) -> Tuple[Optional[int], int]:
+        balance = self.balances.get(user_id, 0)
+        if balance <= 0:
+            return None, 0
+        return self._ranked.bisect_left((-balance,)) + 1, balance
+
+    def totals(self) -> Tuple[int, Optional[int]]:
+        return len(self._ranked), self._total or None
+
+
+class GuildLeaderboards:
+    """One ``Leaderboard`` per guild served by this process.
+
+    Guilds are loaded when their shard connects and dropped when the bot
+    leaves them, so memory follows the shards this process runs. Writes to
+    guilds that aren't loaded (a payment for a server on another process)
+    are ignored; the owning process reads them from the database. Readers
+    use ``fetch``, which loads a guild whose shard hasn't finished
+    attaching yet instead of showing it as empty.
+    """
+
+    def __init__(self):
+        self.boards: Dict[int, Leaderboard] = {}
+
+    def __contains__(self, guild_id: int) -> bool:
+        return guild_id in self.boards
+
+    def get(self, guild_id: int) -> Optional[Leaderboard]:
+        """The guild's leaderboard, or None if it isn't loaded."""
+        return self.boards.get(guild_id)
+
+    async def fetch(self, storage: 'Storage', guild_id: int) -> Leaderboard:
+        """The guild's leaderboard, loading it from the database if needed."""
+        board = self.boards.get(guild_id)
+        if board is None:
+            await self.load(storage, [guild_id])
+            board = self.boards[guild_id]
+        return board
+
+    async def load(self, storage: 'Storage', guild_ids: Iterable[int]):
+        guild_ids = list(guild_ids)
+        grouped: Dict[int, Dict[int, int]] = {guild_id: {} for guild_id in guild_ids}
+        for (guild_id, user_id), balance in (await storage.all_balances(guild_ids)).items():
+            grouped[guild_id][user_id] = balance
+        for guild_id, balances in grouped.items():
+            board = self.boards.get(guild_id)
+            if board is None:
+                board = self.boards[guild_id] = Leaderboard()
+            board.load(balances)
+
+    def unload(self, guild_id: int):
+        self.boards.pop(guild_id, None)
+
+    def set(self, guild_id: int, user_id: int, balance: int):
+        board = self.boards.get(guild_id)
+        if board is not None:
+            board.set(user_id, balance)
+
+    def add(self, guild_id: int, user_id: int, delta: int):
+        board = self.boards.get(guild_id)
+        if board is not None:
+            board.add(user_id, delta)
+
+    def reset_all(self, guild_id: int, only_positive: bool = False):
+        board = self.boards.get(guild_id)
+        if board is not None:
+            board.reset_all(only_positive)
+
+    async def refresh(self, storage: 'Storage', accounts: Iterable['Account']):
+        """Re-read the given accounts, for writes whose effect is decided in SQL."""
+        accounts = [account for account in accounts if account[0] in self.boards]
+        for (guild_id, user_id), balance in (await storage.balances(accounts)).items():
+            self.set(guild_id, user_id, balance)
+
+    async def check_consistency(self, storage: 'Storage') -> List['Account']:
+        """Return the accounts whose in-memory balance differs from the database."""
+        stored = await storage.all_balances(list(self.boards))
+        held = {
+            (guild_id, user_id): balance
+            for guild_id, board in self.boards.items()
+            for user_id, balance in board.balances.items()
+        }
+        return [
+            account for account in stored.keys() | held.keys()
+            if stored.get(account, 0) != held.get(account, 0)
+        ]
+
+
+def medal_for(position: int) -> str:
+    if position == 1:
+        return "🥇"
+    elif position == 2:
+        return "🥈"
+    elif position == 3:
+        return "🥉"
+    return "👑"
+
+
+class Snapshot:
+    """Top-k rows, totals and the rendered ranking text for one leaderboard version."""
+
+    def __init__(self, version: int, rows: List[Tuple[int, int, int]],
+                 names: Dict[int, Optional[str]], totals: Tuple[int, Optional[int]]):
+        self.version = version
+        self.built_at = time.monotonic()
+        self.rows = rows
+        self.total_users, self.total_money = totals
+
+        ranking_text = ""
+        daily_text = ""
+        for user_id, balance, position in rows:
+            name = names.get(user_id)
+            if name is None:
+                continue
+            header = f"{medal_for(position)} **{position}º** {name}\n"
+            ranking_text += header + f"└ {balance / 100:,.2f} Deadcoins\n\n"
+            daily_text += header + f"└ Ð {balance / 100:,.2f}\n\n"
+        self.ranking_text = ranking_text
+        self.daily_text = daily_text
+
+
+class SnapshotService:
+    """Shares one rendered leaderboard per guild between /ranking and the daily post.
+
+    A guild's snapshot is rebuilt only when the leaderboard version moved
+    on and the snapshot is older than ``max_staleness`` seconds; concurrent
+    callers wait on the same rebuild instead of starting their own.
+    """
+
+    def __init__(self, leaderboards: GuildLeaderboards, storage: 'Storage', names, max_staleness: float,
+                 limit: int = 10):
+        self.leaderboards = leaderboards
+        self.storage = storage
+        self.names = names
+        self.max_staleness = max_staleness
+        self.limit = limit
+        self._snapshots: Dict[int, Snapshot] = {}
+        self._locks: Dict[int, asyncio.Lock] = {}
+
+    def _fresh(self, snapshot: Optional[Snapshot], leaderboard: Leaderboard) -> bool:
+        if snapshot is None:
+            return False
+        if snapshot.version == leaderboard.version:
+            return True
+        return time.monotonic() - snapshot.built_at < self.max_staleness
+
+    def forget(self, guild_id: int):
+        self._snapshots.pop(guild_id, None)
+        self._locks.pop(guild_id, None)
+
+    async def get(self, guild) -> Snapshot:
+        leaderboard = await self.leaderboards.fetch(self.storage, guild.id)
+        snapshot = self._snapshots.get(guild.id)
+        if self._fresh(snapshot, leaderboard):
+            snapshot_hits.inc()
+            return snapshot
+
+        lock = self._locks.setdefault(guild.id, asyncio.Lock())
+        async with lock:
+            snapshot = self._snapshots.get(guild.id)
+            if self._fresh(snapshot, leaderboard):
+                snapshot_hits.inc()
+                return snapshot
+
+            version = leaderboard.version
+            rows = leaderboard.top(self.limit)
+            totals = leaderboard.totals()
+            names = await self.names.resolve(guild, [row[0] for row in rows])
+            snapshot = Snapshot(version, rows, names, totals)
+            self._snapshots[guild.id] = snapshot
+            snapshot_builds.inc()
+            return snapshot
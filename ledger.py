@@ -0,0 +1,69 @@
+from typing import Iterable, List, Optional, Tuple
+
+from database import Database, Transaction
+
+# Counterparty for money minted (rewards, purchases, admin credits) or burned
+# (withdrawals, admin removals); its leg of each entry is implicit
+SYSTEM_ACCOUNT = 0
+
+# (guild_id, user_id, kind, counterparty, amount, interaction_id)
+Entry = Tuple[int, int, str, int, int, Optional[int]]
+
+INSERT_ENTRY = '''
+    INSERT INTO ledger (guild_id, user_id, kind, counterparty, amount, interaction_id)
+    VALUES (?, ?, ?, ?, ?, ?)
+'''
+
+
+async def record(tx: Transaction, entries: Iterable[Entry]):
+    """Append entries inside the caller's transaction, next to the balance writes."""
+    await tx.executemany(INSERT_ENTRY, list(entries))
+
+
+def transfer_entries(guild_id: int, sender_id: int, receiver_id: int, amount: int,
+                     interaction_id: Optional[int] = None) -> List[Entry]:
+    return [
+        (guild_id, sender_id, 'transfer', receiver_id, -amount, interaction_id),
+        (guild_id, receiver_id, 'transfer', sender_id, amount, interaction_id),
+    ]
+
+
+async def checkpoint(db: Database) -> int:
+    """Record every account's balance at the current end of the ledger."""
+    async with db.transaction() as tx:
+        last_id = (await tx.fetchone('SELECT COALESCE(MAX(id), 0) FROM ledger'))[0]
+        await tx.execute('''
+            INSERT INTO balance_checkpoints (guild_id, user_id, ledger_id, balance)
+            SELECT guild_id, user_id, ?, balance FROM economy
+            WHERE true
+            ON CONFLICT (guild_id, user_id)
+            DO UPDATE SET ledger_id = excluded.ledger_id, balance = excluded.balance
+        ''', (last_id,))
+    return last_id
+
+
+async def rebuild_balance(db: Database, guild_id: int, user_id: int) -> int:
+    """Balance from the last checkpoint plus the indexed ledger tail after it."""
+    async with db.transaction() as tx:
+        row = await tx.fetchone(
+            'SELECT ledger_id, balance FROM balance_checkpoints WHERE guild_id = ? AND user_id = ?',
+            (guild_id, user_id)
+        )
+        ledger_id, balance = row if row else (0, 0)
+        tail = await tx.fetchone('''
+            SELECT COALESCE(SUM(amount), 0) FROM ledger
+            WHERE guild_id = ? AND user_id = ? AND id > ?
+        ''', (guild_id, user_id, ledger_id))
+    return balance + tail[0]
+
+
+async def statement(db: Database, guild_id: int, user_id: int, before: Optional[int] = None,
+                    limit: int = 10) -> List[tuple]:
+    """Newest-first page of entries; pass the last returned ``id`` as ``before`` for the next page."""
+    return await db.fetchall('''
+        SELECT id, kind, counterparty, amount, interaction_id, created_at
+        FROM ledger
+        WHERE guild_id = ? AND user_id = ? AND id < ?
+        ORDER BY id DESC
+        LIMIT ?
+    ''', (guild_id, user_id, before if before is not None else 2 ** 63 - 1, limit))
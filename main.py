@@ -1,120 +1,286 @@
 import discord
 from discord import app_commands
-import sqlite3
-from typing import Optional
+from typing import Dict, List, Optional, Set
 from datetime import datetime
 import asyncio
 import os
-import mercadopago
 
-
-class Client(discord.Client):
+import config
+import instrumentation
+import tracing
+from batcher import WriteBatcher
+from command_sync import CommandSync
+from database import Database
+from health import HealthMonitor
+from leaderboard import GuildLeaderboards, SnapshotService
+from members import MemberNameResolver
+from notifications import NotificationQueue
+from migrations import LEGACY_GUILD_ID
+from payments import MercadoPago, PaymentWebhook, payment_reference
+from postgres_storage import PostgresStorage
+from ratelimit import TokenBucketLimiter
+from retention import RetentionJob
+from scheduler import CronSchedule, Scheduler
+from storage import Account, GuildSettings, MessageRecord, SQLiteStorage, Storage
+from voice import VoiceTracker
+from webserver import WebServer
+
+
+class Client(discord.AutoShardedClient):
     def __init__(self):
         intents = discord.Intents.default()
         intents.message_content = True
         intents.voice_states = True
-        super().__init__(intents=intents)
-        self.tree = app_commands.CommandTree(self)
-        self.setup_database()
-        self.voice_check_task = None
-
-    def setup_database(self):
-        self.conn = sqlite3.connect('economy.db')
-        self.cursor = self.conn.cursor()
-
-        self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS economy (
-                user_id INTEGER PRIMARY KEY,
-                balance INTEGER DEFAULT 0,
-                last_daily TIMESTAMP
-            )
-        ''')
-
-        self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS messages (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER,
-                content TEXT,
-                timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                message_count INTEGER DEFAULT 0
+        super().__init__(
+            intents=intents,
+            shard_count=config.SHARD_COUNT,
+            shard_ids=config.SHARD_IDS,
+            # Charges Discord API calls to the rest/response phases of handler spans
+            http_trace=instrumentation.http_trace()
+        )
+        self.tree = instrumentation.InstrumentedTree(self)
+        tracing.threshold = config.TRACE_SPAN_THRESHOLD_SECONDS
+        self.startup = tracing.StartupTimer()
+        # The local SQLite file always holds scheduler state; economy data
+        # lives in self.storage, which may be the same file or PostgreSQL
+        self.db = Database(config.DATABASE_PATH, pragmas=config.SQLITE_PRAGMAS)
+        self.storage = self.create_storage()
+        self.message_batcher = WriteBatcher(
+            self.storage.record_messages,
+            interval_ms=config.MESSAGE_BATCH_INTERVAL_MS,
+            max_rows=config.MESSAGE_BATCH_MAX_ROWS,
+            max_pending=config.MESSAGE_BATCH_MAX_PENDING
+        )
+        self.message_limiter = TokenBucketLimiter(
+            'messages',
+            rate=config.MESSAGE_RATE_PER_MINUTE / 60,
+            burst=config.MESSAGE_RATE_BURST,
+            max_size=config.MESSAGE_RATE_MAX_ACCOUNTS
+        )
+        self.retention_job = RetentionJob(
+            self.storage,
+            retention_hours=config.MESSAGE_RETENTION_HOURS,
+            chunk_rows=config.RETENTION_CHUNK_ROWS
+        )
+        self.voice_tracker = VoiceTracker(
+            self.storage,
+            cents_per_minute=self.voice_reward,
+            is_excepted=lambda guild_id, user_id: (guild_id, user_id) in self.excepted_users
+        )
+        # Holds only the guilds of this process's shards (see attach_guilds)
+        self.leaderboards = GuildLeaderboards()
+        self.message_batcher.on_flush.append(
+            lambda accounts: self.leaderboards.refresh(self.storage, accounts)
+        )
+        self.voice_tracker.on_credit = self.leaderboards.add
+        self.member_names = MemberNameResolver(
+            ttl_seconds=config.MEMBER_CACHE_TTL_SECONDS,
+            max_size=config.MEMBER_CACHE_SIZE
+        )
+        self.ranking_snapshots = SnapshotService(
+            self.leaderboards,
+            self.storage,
+            self.member_names,
+            max_staleness=config.RANKING_STALENESS_SECONDS
+        )
+        self.scheduler = Scheduler(self.db)
+        self.command_sync = CommandSync(self.db, self.tree)
+        self.mercado_pago = MercadoPago(
+            "APP_USR-3127370453049654-011114-5e758cc211d62f5db3005733cc36143c-170195579",
+            workers=config.MERCADOPAGO_WORKERS,
+            timeout=config.MERCADOPAGO_TIMEOUT_SECONDS
+        )
+        self.payment_webhook = PaymentWebhook(
+            self.storage,
+            self.mercado_pago,
+            secret=config.MERCADOPAGO_WEBHOOK_SECRET,
+            on_credit=self.notify_payment
+        )
+        self.notifications = NotificationQueue(
+            self,
+            workers=config.NOTIFICATION_WORKERS,
+            max_size=config.NOTIFICATION_QUEUE_SIZE,
+            max_attempts=config.NOTIFICATION_MAX_ATTEMPTS,
+            base_delay=config.NOTIFICATION_RETRY_BASE_SECONDS,
+            max_delay=config.NOTIFICATION_RETRY_MAX_SECONDS,
+            closed_dm_ttl=config.NOTIFICATION_CLOSED_DM_TTL_SECONDS
+        )
+        self.health = HealthMonitor(
+            self,
+            self.storage,
+            max_loop_lag=config.HEALTH_MAX_LOOP_LAG_SECONDS,
+            db_timeout=config.HEALTH_DB_TIMEOUT_SECONDS
+        )
+        self.web = WebServer(config.WEB_HOST, config.WEB_PORT)
+        self.web.add_route('GET', '/', self.health.health)
+        self.web.add_route('GET', '/metrics', self.health.metrics)
+        self.web.add_route('POST', '/webhooks/mercadopago', self.payment_webhook.handle)
+        # Mirror of the excepted_users table, kept in sync by except_user/unexcept_user
+        self.excepted_users: Set[Account] = set()
+        # Mirror of guild_settings, kept in sync by /configurar
+        self.settings: Dict[int, GuildSettings] = {}
+
+    def create_storage(self) -> Storage:
+        if config.STORAGE_BACKEND == 'postgres':
+            return PostgresStorage(
+                config.POSTGRES_DSN,
+                min_size=config.POSTGRES_POOL_MIN,
+                max_size=config.POSTGRES_POOL_MAX
             )
-        ''')
+        if config.STORAGE_BACKEND != 'sqlite':
+            raise ValueError(f"STORAGE_BACKEND inválido: {config.STORAGE_BACKEND!r} (use 'sqlite' ou 'postgres')")
+        return SQLiteStorage(self.db, vacuum_pages=config.RETENTION_VACUUM_PAGES)
 
-        self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS excepted_users (
-                user_id INTEGER PRIMARY KEY
-            )
-        ''')
-        self.conn.commit()
+    async def setup_database(self):
+        await self.db.connect()
+        await self.storage.connect()
+        settings = await self.storage.describe()
+        print(f"Armazenamento {self.storage.name}: " + ", ".join(f"{name}={value}" for name, value in settings.items()))
 
-    async def setup_hook(self):
-        guild = discord.Object(id=1326926349448904769)
-        self.tree.copy_global_to(guild=guild)
-        await self.tree.sync(guild=guild)
-        self.voice_check_task = self.loop.create_task(self.check_voice_channels())
-
-    async def check_voice_channels(self):
-        while True:
-            try:
-                for guild in self.guilds:
-                    for voice_channel in guild.voice_channels:
-                        for member in voice_channel.members:
-                            if not member.bot and not member.voice.afk and not member.voice.self_deaf:
-                                self.cursor.execute('SELECT 1 FROM excepted_users WHERE user_id = ?', (member.id,))
-                                if not self.cursor.fetchone():
-                                    ensure_user_exists(member.id)
-                                    self.cursor.execute('''
-                                        UPDATE economy 
-                                        SET balance = balance + 600
-                                        WHERE user_id = ?
-                                    ''', (member.id,))
-                                    self.conn.commit()
-
-            except Exception as e:
-                print(f"Erro ao verificar canais de voz: {e}")
-
-            await asyncio.sleep(60)
+        await self.storage.setup()
+        self.excepted_users = await self.storage.exempted_users()
+        self.settings = await self.storage.guild_settings()
 
+        await self.scheduler.setup()
+        await self.command_sync.setup()
 
-client = Client()
+    def guild_settings(self, guild_id: int) -> GuildSettings:
+        return self.settings.get(guild_id) or GuildSettings(guild_id)
+
+    def message_reward(self, guild_id: int) -> int:
+        reward = self.guild_settings(guild_id).message_reward
+        return config.MESSAGE_REWARD if reward is None else reward
+
+    def voice_reward(self, guild_id: int) -> int:
+        reward = self.guild_settings(guild_id).voice_reward_per_minute
+        return config.VOICE_REWARD_PER_MINUTE if reward is None else reward
+
+    async def attach_guilds(self, guilds: List[discord.Guild]):
+        """Load rankings and voice sessions for guilds this process now serves."""
+        await self.leaderboards.load(self.storage, [guild.id for guild in guilds])
+        await self.voice_tracker.rebuild(guilds)
+
+    def event(self, coro):
+        # Every @client.event handler runs inside a tracing span
+        return super().event(instrumentation.traced_event(coro))
+
+    async def start(self, token: str, *, reconnect: bool = True):
+        self.startup.reset()
+        await super().start(token, reconnect=reconnect)
+
+    async def setup_hook(self):
+        # Runs at the end of login(), once the token is checked
+        self.startup.mark('login')
+        if config.SLOW_CALLBACK_SECONDS > 0:
+            # asyncio's debug mode logs every callback that blocks the loop
+            # for longer than slow_callback_duration
+            loop = asyncio.get_running_loop()
+            loop.slow_callback_duration = config.SLOW_CALLBACK_SECONDS
+            loop.set_debug(True)
+        await self.setup_database()
+        self.startup.mark('db')
+        self.message_batcher.start()
+        self.notifications.start()
+        self.schedule_jobs()
+        self.health.start()
+        await self.web.start()
+        self.startup.mark('services')
+
+        guild = None
+        if config.COMMAND_SYNC_GUILD_ID:
+            guild = discord.Object(id=config.COMMAND_SYNC_GUILD_ID)
+            self.tree.copy_global_to(guild=guild)
+        synced = await self.command_sync.sync(guild, force=config.FORCE_COMMAND_SYNC)
+        self.startup.attrs['commands'] = 'synced' if synced else 'unchanged'
+        if config.COMMAND_SYNC_GUILD_ID != LEGACY_GUILD_ID:
+            await self.clear_legacy_commands()
+        self.startup.mark('sync')
+
+    async def clear_legacy_commands(self):
+        # The bot used to sync its commands to the legacy guild only; left
+        # there, they show up twice next to the global ones. Syncing an
+        # empty guild tree removes them, and the stored signature makes
+        # this a no-op on later boots
+        legacy = discord.Object(id=LEGACY_GUILD_ID)
+        self.tree.clear_commands(guild=legacy)
+        try:
+            await self.command_sync.sync(legacy)
+        except discord.HTTPException as e:
+            print(f"Não foi possível remover os comandos antigos do servidor {LEGACY_GUILD_ID}: {e}")
+
+    def schedule_jobs(self):
+        tz = config.SCHEDULER_TIMEZONE
+        self.scheduler.add_job(
+            'voice_checkpoint',
+            CronSchedule(config.VOICE_CHECKPOINT_CRON, tz),
+            lambda state: self.voice_tracker.checkpoint()
+        )
+        self.scheduler.add_job(
+            'message_retention',
+            CronSchedule(config.RETENTION_CRON, tz),
+            self.retention_job.run
+        )
+        self.scheduler.add_job(
+            'ledger_checkpoint',
+            CronSchedule(config.LEDGER_CHECKPOINT_CRON, tz),
+            lambda state: self.storage.checkpoint_ledger()
+        )
+        self.scheduler.add_job(
+            'leaderboard_check',
+            CronSchedule(config.LEADERBOARD_CHECK_CRON, tz),
+            check_leaderboard
+        )
+        # Catches up once after downtime; the stored message IDs let it edit
+        # each guild's existing post instead of sending a new one
+        self.scheduler.add_job(
+            'daily_ranking',
+            CronSchedule(config.DAILY_RANKING_CRON, tz),
+            send_daily_ranking,
+            catch_up=True
+        )
 
+    async def notify_payment(self, guild_id: int, user_id: int, cents: int, deadcoins: int):
+        # No-op when the guild's shard runs in another process
+        self.leaderboards.add(guild_id, user_id, cents)
 
-def is_user_excepted(user_id: int) -> bool:
-    client.cursor.execute('SELECT 1 FROM excepted_users WHERE user_id = ?', (user_id,))
-    return bool(client.cursor.fetchone())
+        embed = discord.Embed(
+            title="✅ Pagamento Confirmado",
+            description=f"Você recebeu {deadcoins:,} Deadcoins!",
+            color=discord.Color.green()
+        )
+        self.notifications.send_dm(user_id, embed=embed)
+
+    async def close(self):
+        # While the HTTP session is still open, so queued receipts can go out
+        await self.notifications.stop(timeout=config.NOTIFICATION_DRAIN_SECONDS)
+        await super().close()
+        await self.web.stop()
+        await self.health.stop()
+        await self.scheduler.stop()
+        await self.voice_tracker.checkpoint()
+        await self.message_batcher.stop()
+        await self.storage.close()
+        await self.db.close()
+        self.mercado_pago.close()
 
 
-def ensure_user_exists(user_id: int):
-    client.cursor.execute('''
-        INSERT OR IGNORE INTO economy (user_id, balance)
-        VALUES (?, 0)
-    ''', (user_id,))
-    client.conn.commit()
+client = Client()
 
 
-def handle_message_reward(user_id: int):
-    client.cursor.execute('SELECT 1 FROM excepted_users WHERE user_id = ?', (user_id,))
-    if client.cursor.fetchone():
-        return False
+def is_user_excepted(guild_id: int, user_id: int) -> bool:
+    return (guild_id, user_id) in client.excepted_users
 
-    client.cursor.execute('''
-        SELECT COUNT(*) FROM messages 
-        WHERE user_id = ?
-    ''', (user_id,))
-    message_count = client.cursor.fetchone()[0]
 
-    if message_count % 10 == 0 and message_count > 0:
-        client.cursor.execute('''
-            UPDATE economy 
-            SET balance = balance + 300
-            WHERE user_id = ?
-        ''', (user_id,))
-        client.conn.commit()
-        return True
-    return False
+def followup_warning(interaction: discord.Interaction, text: str):
+    # Dead-letter hook for receipts: tells the command's author through the
+    # interaction, whose followups stay valid for 15 minutes
+    async def warn():
+        await interaction.followup.send(text, ephemeral=True)
+    return warn
 
 
 @client.tree.command()
+@app_commands.guild_only()
 async def saldo(
         interaction: discord.Interaction,
         usuario: Optional[discord.Member] = None
@@ -128,10 +294,7 @@ async def saldo(
         )
         return
 
-    ensure_user_exists(target_user.id)
-
-    client.cursor.execute('SELECT balance FROM economy WHERE user_id = ?', (target_user.id,))
-    balance = client.cursor.fetchone()[0] / 100
+    balance = await client.storage.balance(interaction.guild_id, target_user.id) / 100
 
     embed = discord.Embed(
         title="💰 Consulta de Saldo",
@@ -163,21 +326,26 @@ async def saldo(
 
 @client.event
 async def on_message(message: discord.Message):
-    if message.author.bot:
+    if message.author.bot or message.guild is None:
         return
 
-    ensure_user_exists(message.author.id)
-
-    client.cursor.execute('''
-        INSERT INTO messages (user_id, content)
-        VALUES (?, ?)
-    ''', (message.author.id, message.content))
-    client.conn.commit()
+    guild_id = message.guild.id
+    # Bursts past the per-account limit are dropped before they cost a write
+    if not client.message_limiter.allow((guild_id, message.author.id)):
+        return
 
-    handle_message_reward(message.author.id)
+    # Written behind in batches; the storage bumps the per-account counter
+    # and pays the reward on every 10th message (see Storage.record_messages)
+    client.message_batcher.add(MessageRecord(
+        guild_id,
+        message.author.id,
+        message.content if config.STORE_MESSAGE_CONTENT else None,
+        0 if is_user_excepted(guild_id, message.author.id) else client.message_reward(guild_id)
+    ), key=(guild_id, message.author.id))
 
 
 @client.tree.command()
+@app_commands.guild_only()
 async def addsaldo(
         interaction: discord.Interaction,
         usuario: discord.Member,
@@ -190,15 +358,10 @@ async def addsaldo(
         )
         return
 
-    ensure_user_exists(usuario.id)
     quantidade_cents = int(quantidade * 100)  # Convert to cents for storage
 
-    client.cursor.execute('''
-        UPDATE economy 
-        SET balance = balance + ?
-        WHERE user_id = ?
-    ''', (quantidade_cents, usuario.id))
-    client.conn.commit()
+    await client.storage.credit(interaction.guild_id, usuario.id, quantidade_cents, 'admin_add', interaction.id)
+    client.leaderboards.add(interaction.guild_id, usuario.id, quantidade_cents)
 
     embed = discord.Embed(
         title="💰 Saldo Adicionado",
@@ -228,6 +391,7 @@ async def addsaldo(
 
 
 @client.tree.command()
+@app_commands.guild_only()
 async def removesaldo(
         interaction: discord.Interaction,
         usuario: discord.Member,
@@ -240,26 +404,17 @@ async def removesaldo(
         )
         return
 
-    ensure_user_exists(usuario.id)
     quantidade_cents = int(quantidade * 100)  # Convert to cents for storage
 
-    # Check if user has enough balance
-    client.cursor.execute('SELECT balance FROM economy WHERE user_id = ?', (usuario.id,))
-    current_balance = client.cursor.fetchone()[0]
-
-    if current_balance < quantidade_cents:
+    # Balance check and debit happen in one conditional UPDATE
+    if not await client.storage.debit(interaction.guild_id, usuario.id, quantidade_cents,
+                                      kind='admin_remove', interaction_id=interaction.id):
         await interaction.response.send_message(
             f"❌ {usuario.mention} não possui saldo suficiente para esta operação.",
             ephemeral=True
         )
         return
-
-    client.cursor.execute('''
-        UPDATE economy 
-        SET balance = balance - ?
-        WHERE user_id = ?
-    ''', (quantidade_cents, usuario.id))
-    client.conn.commit()
+    client.leaderboards.add(interaction.guild_id, usuario.id, -quantidade_cents)
 
     embed = discord.Embed(
         title="💰 Saldo Removido",
@@ -289,6 +444,7 @@ async def removesaldo(
 
 
 @client.tree.command()
+@app_commands.guild_only()
 async def resetsaldo(
         interaction: discord.Interaction,
         usuario: discord.Member
@@ -300,15 +456,9 @@ async def resetsaldo(
         )
         return
 
-    client.cursor.execute('SELECT balance FROM economy WHERE user_id = ?', (usuario.id,))
-    old_balance = client.cursor.fetchone()[0] / 100  # Convert to reais
-
-    client.cursor.execute('''
-        UPDATE economy 
-        SET balance = 0
-        WHERE user_id = ?
-    ''', (usuario.id,))
-    client.conn.commit()
+    old_cents = await client.storage.reset(interaction.guild_id, usuario.id, interaction.id)
+    old_balance = (old_cents or 0) / 100  # Convert to reais
+    client.leaderboards.set(interaction.guild_id, usuario.id, 0)
 
     embed = discord.Embed(
         title="🔄 Saldo Resetado",
@@ -342,6 +492,7 @@ async def resetsaldo(
 
 
 @client.tree.command()
+@app_commands.guild_only()
 async def resetsaldoall(
         interaction: discord.Interaction
 ):
@@ -352,17 +503,11 @@ async def resetsaldoall(
         )
         return
 
-    client.cursor.execute('SELECT COUNT(*), SUM(balance) FROM economy WHERE balance > 0')
-    result = client.cursor.fetchone()
-    total_users = result[0]
-    total_balance = result[1] / 100 if result[1] else 0  # Convert to reais
+    total_users, total_cents = await client.storage.totals(interaction.guild_id)
+    total_balance = total_cents / 100 if total_cents else 0  # Convert to reais
 
-    client.cursor.execute('''
-        UPDATE economy 
-        SET balance = 0
-        WHERE balance > 0
-    ''')
-    client.conn.commit()
+    await client.storage.reset_all(interaction.guild_id, interaction.id, only_positive=True)
+    client.leaderboards.reset_all(interaction.guild_id, only_positive=True)
 
     embed = discord.Embed(
         title="🔄 Reset Global de Saldos",
@@ -409,8 +554,8 @@ async def resetsaldoall(
         reaction, user = await client.wait_for('reaction_add', timeout=30.0, check=check)
 
         if str(reaction.emoji) == "✅":
-            client.cursor.execute('UPDATE economy SET balance = 0')
-            client.conn.commit()
+            await client.storage.reset_all(interaction.guild_id, interaction.id)
+            client.leaderboards.reset_all(interaction.guild_id)
 
             await message.edit(content="✅ Todos os saldos foram resetados com sucesso!", embed=embed)
         else:
@@ -423,6 +568,7 @@ async def resetsaldoall(
 
 
 @client.tree.command()
+@app_commands.guild_only()
 async def removepercent(
         interaction: discord.Interaction,
         usuario: discord.Member,
@@ -442,23 +588,11 @@ async def removepercent(
         )
         return
 
-    ensure_user_exists(usuario.id)
-
-    # Get current balance
-    client.cursor.execute('SELECT balance FROM economy WHERE user_id = ?', (usuario.id,))
-    current_balance = client.cursor.fetchone()[0]  # This is in cents
-
-    # Calculate amount to remove
-    amount_to_remove = int(current_balance * (porcentagem / 100))
-    new_balance = current_balance - amount_to_remove
-
-    # Update the balance
-    client.cursor.execute('''
-        UPDATE economy 
-        SET balance = ?
-        WHERE user_id = ?
-    ''', (new_balance, usuario.id))
-    client.conn.commit()
+    # Read, calculate and update in one transaction (all values in cents)
+    current_balance, amount_to_remove, new_balance = await client.storage.remove_percent(
+        interaction.guild_id, usuario.id, porcentagem, interaction.id
+    )
+    client.leaderboards.add(interaction.guild_id, usuario.id, -amount_to_remove)
 
     embed = discord.Embed(
         title="💰 Saldo Removido (Porcentagem)",
@@ -502,24 +636,11 @@ async def removepercent(
 
 
 @client.tree.command()
+@app_commands.guild_only()
 async def ranking(interaction: discord.Interaction):
-    client.cursor.execute('''
-        SELECT user_id, balance, 
-        RANK() OVER (ORDER BY balance DESC) as rank_position
-        FROM economy 
-        WHERE balance > 0
-    ''')
-    all_rankings = client.cursor.fetchall()
-
-    user_rank = None
-    user_balance = 0
-    for rank in all_rankings:
-        if rank[0] == interaction.user.id:
-            user_rank = rank[2]
-            user_balance = rank[1]
-            break
-
-    top_10 = all_rankings[:10]
+    snapshot = await client.ranking_snapshots.get(interaction.guild)
+    leaderboard = await client.leaderboards.fetch(client.storage, interaction.guild_id)
+    user_rank, user_balance = leaderboard.rank(interaction.user.id)
 
     embed = discord.Embed(
         title="🏆 Ranking de Riqueza em Deadcoins",
@@ -527,30 +648,9 @@ async def ranking(interaction: discord.Interaction):
         color=discord.Color.gold()
     )
 
-    rank_text = ""
-    for user_id, balance, position in top_10:
-        try:
-            member = await interaction.guild.fetch_member(user_id)
-            name = member.display_name
-
-            if position == 1:
-                medal = "🥇"
-            elif position == 2:
-                medal = "🥈"
-            elif position == 3:
-                medal = "🥉"
-            else:
-                medal = "👑"
-
-            rank_text += f"{medal} **{position}º** {name}\n"
-            rank_text += f"└ {balance / 100:,.2f} Deadcoins\n\n"
-
-        except discord.NotFound:
-            continue
-
     embed.add_field(
         name="Top 10 Usuários",
-        value=rank_text if rank_text else "Nenhum usuário encontrado.",
+        value=snapshot.ranking_text or "Nenhum usuário encontrado.",
         inline=False
     )
 
@@ -567,18 +667,10 @@ async def ranking(interaction: discord.Interaction):
             inline=False
         )
 
-    client.cursor.execute('''
-        SELECT COUNT(*) as total_users, 
-        SUM(balance) as total_money 
-        FROM economy 
-        WHERE balance > 0
-    ''')
-    total_users, total_money = client.cursor.fetchone()
-
-    if total_money:
+    if snapshot.total_money:
         stats = (
-            f"👥 Total de usuários: **{total_users}**\n"
-            f"💰 Dinheiro em circulação: **R$ {total_money / 100:,.2f}**"
+            f"👥 Total de usuários: **{snapshot.total_users}**\n"
+            f"💰 Dinheiro em circulação: **R$ {snapshot.total_money / 100:,.2f}**"
         )
         embed.add_field(name="Estatísticas", value=stats, inline=False)
 
@@ -592,6 +684,7 @@ async def ranking(interaction: discord.Interaction):
 
 
 @client.tree.command()
+@app_commands.guild_only()
 async def sacar(
         interaction: discord.Interaction,
         valor: float
@@ -611,31 +704,18 @@ async def sacar(
         )
         return
 
-    # Garante que o usuário existe no banco
-    ensure_user_exists(interaction.user.id)
-
     # Converte o valor para centavos para armazenamento no banco
     valor_cents = int(valor * 100)
 
-    # Verifica o saldo do usuário
-    client.cursor.execute('SELECT balance FROM economy WHERE user_id = ?', (interaction.user.id,))
-    current_balance = client.cursor.fetchone()[0]
-
-    # Verifica se o usuário tem saldo suficiente
-    if current_balance < valor_cents:
+    # Verifica o saldo e debita numa única atualização condicional
+    if not await client.storage.debit(interaction.guild_id, interaction.user.id, valor_cents,
+                                      kind='withdrawal', interaction_id=interaction.id):
         await interaction.response.send_message(
             f"❌ Você não tem saldo suficiente para sacar **R$ {valor:,.2f}**.",
             ephemeral=True
         )
         return
-
-    # Realiza a atualização do saldo
-    client.cursor.execute('''
-        UPDATE economy 
-        SET balance = balance - ?
-        WHERE user_id = ?
-    ''', (valor_cents, interaction.user.id))
-    client.conn.commit()
+    client.leaderboards.add(interaction.guild_id, interaction.user.id, -valor_cents)
 
     # Criar o embed de comprovante
     embed = discord.Embed(
@@ -647,29 +727,29 @@ async def sacar(
     embed.add_field(name="Valor", value=f"R$ {valor:,.2f}", inline=False)
     embed.set_footer(text=f"ID da transação: {interaction.id} | {datetime.now().strftime('%H:%M')}")
 
-    # Enviar o embed nas DMs do usuário
-    try:
-        await interaction.user.send(embed=embed)
-    except discord.Forbidden:
-        await interaction.followup.send(
-            "⚠️ Não foi possível enviar o comprovante no seu DM devido às suas configurações de privacidade.",
-            ephemeral=True
-        )
-
-    # Enviar o embed no canal específico (ID: 1325644185264717844)
-    canal_id = 1325644185264717844
-    canal = client.get_channel(canal_id)
-    if canal:
-        await canal.send(embed=embed)
-
-    # Responder no chat do comando
+    # Responder no chat do comando antes de qualquer envio
     await interaction.response.send_message(
         "✅ Seu saque foi realizado com sucesso! Verifique seu DM para o comprovante.",
         ephemeral=True
     )
 
+    # Comprovante no DM e no canal de saques do servidor (ver /configurar),
+    # entregues em segundo plano pela fila de notificações
+    client.notifications.send_dm(
+        interaction.user.id,
+        embed=embed,
+        on_dead_letter=followup_warning(
+            interaction,
+            "⚠️ Não foi possível enviar o comprovante no seu DM devido às suas configurações de privacidade."
+        )
+    )
+    canal_id = client.guild_settings(interaction.guild_id).log_channel_id
+    if canal_id:
+        client.notifications.send_channel(canal_id, embed=embed)
+
 
 @client.tree.command()
+@app_commands.guild_only()
 async def enviar(
         interaction: discord.Interaction,
         usuario: discord.Member,
@@ -700,37 +780,19 @@ async def enviar(
     # Responde imediatamente enquanto processa
     await interaction.response.defer(ephemeral=True)
 
-    # Garante que ambos os usuários existem no banco
-    ensure_user_exists(interaction.user.id)
-    ensure_user_exists(usuario.id)
-
     valor_cents = int(valor * 100)
 
-    # Verifica saldo do remetente
-    client.cursor.execute('SELECT balance FROM economy WHERE user_id = ?', (interaction.user.id,))
-    sender_balance = client.cursor.fetchone()[0]
-
-    if sender_balance < valor_cents:
+    # Débito condicional e crédito na mesma transação; o saldo do
+    # remetente é verificado pela própria atualização
+    if not await client.storage.transfer(interaction.guild_id, interaction.user.id, usuario.id,
+                                         valor_cents, interaction.id):
         await interaction.followup.send(
             "❌ Você não possui saldo suficiente para esta transferência.",
             ephemeral=True
         )
         return
-
-    # Realiza a transferência
-    client.cursor.execute('''
-        UPDATE economy 
-        SET balance = balance - ?
-        WHERE user_id = ?
-    ''', (valor_cents, interaction.user.id))
-
-    client.cursor.execute('''
-        UPDATE economy 
-        SET balance = balance + ?
-        WHERE user_id = ?
-    ''', (valor_cents, usuario.id))
-
-    client.conn.commit()
+    client.leaderboards.add(interaction.guild_id, interaction.user.id, -valor_cents)
+    client.leaderboards.add(interaction.guild_id, usuario.id, valor_cents)
 
     # Criar o embed de comprovante
     embed = discord.Embed(
@@ -743,29 +805,80 @@ async def enviar(
     embed.add_field(name="Valor", value=f"R$ {valor:,.2f}", inline=False)
     embed.set_footer(text=f"ID da transação: {interaction.id} | {datetime.now().strftime('%H:%M')}")
 
-    # Enviar o embed nas DMs dos dois usuários
-    try:
-        await interaction.user.send(embed=embed)
-    except discord.Forbidden:
-        await interaction.followup.send(
-            "⚠️ Não foi possível enviar o comprovante no seu DM devido às suas configurações de privacidade.",
-            ephemeral=True
-        )
-
-    try:
-        await usuario.send(embed=embed)
-    except discord.Forbidden:
-        await interaction.followup.send(
-            f"⚠️ Não foi possível enviar o comprovante para {usuario.mention} devido às configurações de privacidade.",
-            ephemeral=True
-        )
-
     # Responder no chat do comando
     await interaction.followup.send(
         "✅ Transferência realizada com sucesso! Verifique seu DM para o comprovante.",
         ephemeral=True
     )
 
+    # Comprovante no DM dos dois usuários, entregue em segundo plano
+    client.notifications.send_dm(
+        interaction.user.id,
+        embed=embed,
+        on_dead_letter=followup_warning(
+            interaction,
+            "⚠️ Não foi possível enviar o comprovante no seu DM devido às suas configurações de privacidade."
+        )
+    )
+    client.notifications.send_dm(
+        usuario.id,
+        embed=embed,
+        on_dead_letter=followup_warning(
+            interaction,
+            f"⚠️ Não foi possível enviar o comprovante para {usuario.mention} devido às configurações de privacidade."
+        )
+    )
+
+
+LEDGER_KIND_LABELS = {
+    "message_reward": "Recompensa por mensagens",
+    "voice_reward": "Recompensa por voz",
+    "transfer": "Transferência",
+    "withdrawal": "Saque",
+    "payment": "Compra de Deadcoins",
+    "admin_add": "Crédito administrativo",
+    "admin_remove": "Débito administrativo",
+    "admin_remove_percent": "Débito percentual",
+    "admin_reset": "Saldo resetado",
+    "admin_reset_all": "Reset global de saldos",
+}
+
+
+@client.tree.command()
+@app_commands.guild_only()
+async def extrato(
+        interaction: discord.Interaction,
+        antes: Optional[int] = None
+):
+    entries = await client.storage.statement(interaction.guild_id, interaction.user.id, before=antes, limit=10)
+
+    embed = discord.Embed(
+        title="🧾 Extrato de Movimentações",
+        description=f"Movimentações de {interaction.user.mention}",
+        color=discord.Color.blue()
+    )
+
+    if not entries:
+        embed.add_field(name="Sem movimentações", value="Nenhuma movimentação encontrada.", inline=False)
+
+    for entry_id, kind, counterparty, amount, _, created_at in entries:
+        label = LEDGER_KIND_LABELS.get(kind, kind)
+        if kind == "transfer":
+            label += f" {'para' if amount < 0 else 'de'} <@{counterparty}>"
+
+        embed.add_field(
+            name=f"{'🔴' if amount < 0 else '🟢'} {amount / 100:+,.2f} Deadcoins",
+            value=f"{label}\n└ #{entry_id} • {created_at}",
+            inline=False
+        )
+
+    footer = "Sistema de economia"
+    if len(entries) == 10:
+        footer += f" • Próxima página: /extrato antes:{entries[-1][0]}"
+    embed.set_footer(text=footer, icon_url=client.user.display_avatar.url)
+
+    await interaction.response.send_message(embed=embed, ephemeral=True)
+
 
 @client.tree.command()
 async def ajuda(
@@ -947,6 +1060,36 @@ async def ajuda(
             """,
             "exemplo": "/sacar 100.50",
             "permissão": "Qualquer um pode usar"
+        },
+        "extrato": {
+            "uso": "/extrato [antes]",
+            "desc": "Mostra o histórico de movimentações do seu saldo.",
+            "explicacao_detalhada": """
+                - Disponível para todos os usuários
+                - Lista as 10 movimentações mais recentes
+                - Inclui recompensas, transferências, saques, compras e ajustes administrativos
+                - O parâmetro [antes] é opcional e mostra movimentações anteriores a um número (#)
+                - O rodapé indica o comando para a próxima página
+                - A resposta é privada (apenas você vê)
+            """,
+            "exemplo": "/extrato antes:1234",
+            "permissão": "Qualquer um pode usar"
+        },
+        "configurar": {
+            "uso": "/configurar [canal_ranking] [canal_saques] [recompensa_mensagem] [recompensa_voz]",
+            "desc": "Configura os canais e as recompensas da economia deste servidor.",
+            "explicacao_detalhada": """
+                - Exclusivo para administradores
+                - Cada servidor tem sua própria economia e configuração
+                - [canal_ranking] recebe o ranking diário
+                - [canal_saques] recebe os comprovantes de saque
+                - [recompensa_mensagem] é paga a cada 10 mensagens
+                - [recompensa_voz] é paga por minuto em canais de voz
+                - Todos os parâmetros são opcionais; sem nenhum, mostra a configuração atual
+                - A resposta é privada (apenas você vê)
+            """,
+            "exemplo": "/configurar canal_ranking:#ranking recompensa_mensagem:3",
+            "permissão": "Apenas administradores"
         }
     }
 
@@ -994,6 +1137,7 @@ async def ajuda(
 
 
 @client.tree.command()
+@app_commands.guild_only()
 async def ajjsac(interaction: discord.Interaction):
     if not interaction.user.guild_permissions.administrator:
         await interaction.response.send_message(
@@ -1053,6 +1197,7 @@ async def ajjsac(interaction: discord.Interaction):
 
 
 @client.tree.command()
+@app_commands.guild_only()
 async def ajjsald(interaction: discord.Interaction):
     if not interaction.user.guild_permissions.administrator:
         await interaction.response.send_message(
@@ -1125,91 +1270,73 @@ async def ajjsald(interaction: discord.Interaction):
     await interaction.response.send_message(embed=embed)
 
 
-async def send_daily_ranking():
-    stored_message = None
-    while True:
+async def send_daily_ranking(state: dict):
+    # One post per guild with a ranking channel, keyed by guild ID (JSON keys are strings)
+    messages = state.setdefault('messages', {})
+    if 'message_id' in state:
+        # State saved before rankings were per guild
+        messages[str(LEGACY_GUILD_ID)] = state.pop('message_id')
+
+    for guild in client.guilds:
+        channel_id = client.guild_settings(guild.id).ranking_channel_id
+        channel = client.get_channel(channel_id) if channel_id else None
+        if channel is None:
+            continue
         try:
-            channel = client.get_channel(1325564899879026758)
-
-            if channel:
-                client.cursor.execute('''
-                    SELECT user_id, balance, 
-                    RANK() OVER (ORDER BY balance DESC) as rank_position
-                    FROM economy 
-                    WHERE balance > 0
-                ''')
-                all_rankings = client.cursor.fetchall()
-                top_10 = all_rankings[:10]
-
-                embed = discord.Embed(
-                    title="🏆 Ranking Diário de Deadcoins",
-                    description="Os usuários mais ricos do servidor",
-                    color=discord.Color.gold()
-                )
-
-                rank_text = ""
-                for user_id, balance, position in top_10:
-                    try:
-                        member = await channel.guild.fetch_member(user_id)
-                        name = member.display_name
-
-                        if position == 1:
-                            medal = "🥇"
-                        elif position == 2:
-                            medal = "🥈"
-                        elif position == 3:
-                            medal = "🥉"
-                        else:
-                            medal = "👑"
-
-                        rank_text += f"{medal} **{position}º** {name}\n"
-                        rank_text += f"└ Ð {balance / 100:,.2f}\n\n"
-
-                    except discord.NotFound:
-                        continue
-
-                embed.add_field(
-                    name="Top 10 Usuários",
-                    value=rank_text if rank_text else "Nenhum usuário encontrado.",
-                    inline=False
-                )
-
-                client.cursor.execute('''
-                    SELECT COUNT(*) as total_users, 
-                    SUM(balance) as total_money 
-                    FROM economy 
-                    WHERE balance > 0
-                ''')
-                total_users, total_money = client.cursor.fetchone()
-
-                if total_money:
-                    stats = (
-                        f"👥 Total de usuários: **{total_users}**\n"
-                        f"💰 Deadcoins em circulação: **Ð {total_money / 100:,.2f}**"
-                    )
-                    embed.add_field(name="Estatísticas", value=stats, inline=False)
-
-                embed.set_thumbnail(url=channel.guild.icon.url if channel.guild.icon else None)
-                embed.set_footer(
-                    text="Sistema de economia • Ranking Diário",
-                    icon_url=client.user.display_avatar.url
-                )
-
-                if stored_message is None:
-                    stored_message = await channel.send(embed=embed)
-                else:
-                    try:
-                        await stored_message.edit(embed=embed)
-                    except discord.NotFound:
-                        stored_message = await channel.send(embed=embed)
-
-        except Exception as e:
-            print(f"Erro ao atualizar ranking diário: {e}")
-
-        await asyncio.sleep(86400)
+            messages[str(guild.id)] = await post_daily_ranking(channel, messages.get(str(guild.id)))
+        except discord.HTTPException as e:
+            print(f"Erro ao publicar o ranking diário em {guild.id}: {e}")
+
+
+async def post_daily_ranking(channel, message_id: Optional[int]) -> int:
+    snapshot = await client.ranking_snapshots.get(channel.guild)
+
+    embed = discord.Embed(
+        title="🏆 Ranking Diário de Deadcoins",
+        description="Os usuários mais ricos do servidor",
+        color=discord.Color.gold()
+    )
+
+    embed.add_field(
+        name="Top 10 Usuários",
+        value=snapshot.daily_text or "Nenhum usuário encontrado.",
+        inline=False
+    )
+
+    if snapshot.total_money:
+        stats = (
+            f"👥 Total de usuários: **{snapshot.total_users}**\n"
+            f"💰 Deadcoins em circulação: **Ð {snapshot.total_money / 100:,.2f}**"
+        )
+        embed.add_field(name="Estatísticas", value=stats, inline=False)
+
+    embed.set_thumbnail(url=channel.guild.icon.url if channel.guild.icon else None)
+    embed.set_footer(
+        text="Sistema de economia • Ranking Diário",
+        icon_url=client.user.display_avatar.url
+    )
+
+    if message_id is not None:
+        try:
+            await channel.get_partial_message(message_id).edit(embed=embed)
+            return message_id
+        except discord.NotFound:
+            pass
+
+    message = await channel.send(embed=embed)
+    return message.id
+
+
+async def check_leaderboard(state: dict):
+    mismatched = await client.leaderboards.check_consistency(client.storage)
+    if mismatched:
+        guild_ids = {guild_id for guild_id, _ in mismatched}
+        print(f"Ranking em memória divergente para {len(mismatched)} contas em {len(guild_ids)} servidores; recarregando")
+        await client.leaderboards.load(client.storage, guild_ids)
 
 
 @client.tree.command()
+@app_commands.guild_only()
 async def except_user(
         interaction: discord.Interaction,
         usuario: discord.Member
@@ -1221,8 +1348,8 @@ async def except_user(
         )
         return
 
-    client.cursor.execute('INSERT OR REPLACE INTO excepted_users (user_id) VALUES (?)', (usuario.id,))
-    client.conn.commit()
+    await client.storage.add_exemption(interaction.guild_id, usuario.id)
+    client.excepted_users.add((interaction.guild_id, usuario.id))
 
     embed = discord.Embed(
         title="⛔ Usuário Excetuado",
@@ -1236,6 +1363,7 @@ async def except_user(
 
 # Add new unexcept command for removing users from exception list
 @client.tree.command()
+@app_commands.guild_only()
 async def unexcept_user(
         interaction: discord.Interaction,
         usuario: discord.Member
@@ -1247,8 +1375,8 @@ async def unexcept_user(
         )
         return
 
-    client.cursor.execute('DELETE FROM excepted_users WHERE user_id = ?', (usuario.id,))
-    client.conn.commit()
+    await client.storage.remove_exemption(interaction.guild_id, usuario.id)
+    client.excepted_users.discard((interaction.guild_id, usuario.id))
 
     embed = discord.Embed(
         title="✅ Exceção Removida",
@@ -1259,9 +1387,73 @@ async def unexcept_user(
 
     await interaction.response.send_message(embed=embed)
 
-sdk = mercadopago.SDK("APP_USR-3127370453049654-011114-5e758cc211d62f5db3005733cc36143c-170195579")
+@client.tree.command()
+@app_commands.guild_only()
+async def configurar(
+        interaction: discord.Interaction,
+        canal_ranking: Optional[discord.TextChannel] = None,
+        canal_saques: Optional[discord.TextChannel] = None,
+        recompensa_mensagem: Optional[float] = None,
+        recompensa_voz: Optional[float] = None
+):
+    if not interaction.user.guild_permissions.administrator:
+        await interaction.response.send_message(
+            "❌ Você não tem permissão para usar este comando.",
+            ephemeral=True
+        )
+        return
+
+    if any(valor is not None and valor < 0 for valor in (recompensa_mensagem, recompensa_voz)):
+        await interaction.response.send_message(
+            "❌ As recompensas não podem ser negativas.",
+            ephemeral=True
+        )
+        return
+
+    changes = {}
+    if canal_ranking is not None:
+        changes['ranking_channel_id'] = canal_ranking.id
+    if canal_saques is not None:
+        changes['log_channel_id'] = canal_saques.id
+    if recompensa_mensagem is not None:
+        changes['message_reward'] = int(recompensa_mensagem * 100)
+    if recompensa_voz is not None:
+        changes['voice_reward_per_minute'] = int(recompensa_voz * 100)
+
+    # Sem argumentos, apenas mostra a configuração atual
+    settings = client.guild_settings(interaction.guild_id)
+    if changes:
+        settings = settings._replace(**changes)
+        await client.storage.save_guild_settings(settings)
+        client.settings[settings.guild_id] = settings
+
+    def channel_text(channel_id: Optional[int]) -> str:
+        return f"<#{channel_id}>" if channel_id else "Não configurado"
+
+    embed = discord.Embed(
+        title="⚙️ Configuração do Servidor",
+        description=f"Configuração atualizada por {interaction.user.mention}" if changes else "Configuração atual",
+        color=discord.Color.blue()
+    )
+    embed.add_field(name="Canal do ranking diário", value=channel_text(settings.ranking_channel_id), inline=False)
+    embed.add_field(name="Canal de saques", value=channel_text(settings.log_channel_id), inline=False)
+    embed.add_field(
+        name="Recompensa a cada 10 mensagens",
+        value=f"**{client.message_reward(interaction.guild_id) / 100:,.2f} Deadcoins**",
+        inline=False
+    )
+    embed.add_field(
+        name="Recompensa por minuto em voz",
+        value=f"**{client.voice_reward(interaction.guild_id) / 100:,.2f} Deadcoins**",
+        inline=False
+    )
+    embed.set_footer(text="Sistema de Economia")
+
+    await interaction.response.send_message(embed=embed, ephemeral=True)
+
 
 @client.tree.command()
+@app_commands.guild_only()
 async def comprar(interaction: discord.Interaction, reais: float):
 
     if reais < 1:
@@ -1283,11 +1475,24 @@ async def comprar(interaction: discord.Interaction, reais: float):
             "success": "https://seu-site.com/success",
             "failure": "https://seu-site.com/failure"
         },
-        "external_reference": f"{interaction.user.id}"
+        "external_reference": payment_reference(interaction.guild_id, interaction.user.id)
     }
+    if config.MERCADOPAGO_NOTIFICATION_URL:
+        preference_data["notification_url"] = config.MERCADOPAGO_NOTIFICATION_URL
+
+    # A API do Mercado Pago pode levar segundos; responde antes do prazo da interação
+    await interaction.response.defer(ephemeral=True, thinking=True)
 
-    preference_response = sdk.preference().create(preference_data)
-    payment_url = preference_response["response"]["init_point"]
+    try:
+        preference_response = await client.mercado_pago.create_preference(preference_data)
+        payment_url = preference_response["response"]["init_point"]
+    except Exception as e:
+        print(f"Erro ao criar preferência de pagamento: {e}")
+        await interaction.followup.send(
+            "❌ Não foi possível gerar o link de pagamento agora. Tente novamente em instantes.",
+            ephemeral=True
+        )
+        return
 
     embed = discord.Embed(
         title="🛒 Comprar Deadcoins",
@@ -1297,41 +1502,40 @@ async def comprar(interaction: discord.Interaction, reais: float):
     embed.add_field(name="Link de Pagamento", value=f"[Clique aqui para pagar]({payment_url})")
     embed.set_footer(text="O pagamento será processado pelo Mercado Pago")
 
-    await interaction.response.send_message(embed=embed, ephemeral=True)
+    await interaction.followup.send(embed=embed, ephemeral=True)
 
 
 @client.event
-async def on_webhook(data):
-    if data["type"] == "payment" and data["status"] == "approved":
-        user_id = int(data["external_reference"])
-        amount = float(data["transaction_amount"])
-        deadcoins = int(amount * 1000)
-
-        client.cursor.execute('''
-            UPDATE economy 
-            SET balance = balance + ?
-            WHERE user_id = ?
-        ''', (deadcoins * 100, user_id))
-        client.conn.commit()
-
-        user = await client.fetch_user(user_id)
-        if user:
-            embed = discord.Embed(
-                title="✅ Pagamento Confirmado",
-                description=f"Você recebeu {deadcoins:,} Deadcoins!",
-                color=discord.Color.green()
-            )
-            try:
-                await user.send(embed=embed)
-            except:
-                pass
+async def on_voice_state_update(member: discord.Member, before: discord.VoiceState, after: discord.VoiceState):
+    await client.voice_tracker.on_voice_state_update(member, after)
+
+
+@client.event
+async def on_shard_ready(shard_id: int):
+    # Also fires when a shard re-identifies, so its sessions are reconciled
+    # and its rankings reloaded after an outage
+    await client.attach_guilds([guild for guild in client.guilds if guild.shard_id == shard_id])
+
+
+@client.event
+async def on_guild_join(guild: discord.Guild):
+    await client.attach_guilds([guild])
+
+
+@client.event
+async def on_guild_remove(guild: discord.Guild):
+    await client.voice_tracker.close_guild(guild.id)
+    client.leaderboards.unload(guild.id)
+    client.ranking_snapshots.forget(guild.id)
+
 
 @client.event
 async def on_ready():
-    print(f'Bot está online como {client.user}')
-    if client.voice_check_task is None:
-        client.voice_check_task = client.loop.create_task(client.check_voice_channels())
-    client.loop.create_task(send_daily_ranking())
+    print(f'Bot está online como {client.user} (shards {sorted(client.shards)} de {client.shard_count})')
+    # Gateway connection and the first READY of every shard
+    client.startup.finish('ready')
+    await client.scheduler.start()
 
 
-client.run('MTMyNzA2MzAwNDk0NDI3MzQzOQ.GjW_ED.ZCSldcjS34r5q-7ywX3CvdTQHhwSBsFeFPLnv8')
+if __name__ == '__main__':
+    client.run('MTMyNzA2MzAwNDk0NDI3MzQzOQ.GjW_ED.ZCSldcjS34r5q-7ywX3CvdTQHhwSBsFeFPLnv8')
@@ -0,0 +1,107 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import discord
+
+import metrics
+
+name_lookups = metrics.counter('member_names_total', 'Display name lookups by source', ['source'])
+
+CacheKey = Tuple[int, int]  # (guild_id, user_id)
+
+
+class MemberNameResolver:
+    """Resolves display names for rankings with as few REST calls as possible.
+
+    Lookups go to the TTL cache first, then the gateway member cache, and
+    whatever is left is fetched in one batched request. Members that left
+    the guild are cached as ``None`` so they aren't refetched every render.
+    Renames and departures show up once an entry expires; the bot doesn't
+    request the privileged members intent whose events could evict sooner.
+    """
+
+    def __init__(self, ttl_seconds: int, max_size: int):
+        self.ttl = ttl_seconds
+        self.max_size = max_size
+        self._cache: 'OrderedDict[CacheKey, Tuple[float, Optional[str]]]' = OrderedDict()
+
+    def _get(self, key: CacheKey) -> Tuple[bool, Optional[str]]:
+        entry = self._cache.get(key)
+        if entry is None:
+            return False, None
+        expires, name = entry
+        if expires < time.monotonic():
+            del self._cache[key]
+            return False, None
+        self._cache.move_to_end(key)
+        return True, name
+
+    def _put(self, key: CacheKey, name: Optional[str]):
+        self._cache[key] = (time.monotonic() + self.ttl, name)
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.max_size:
+            self._cache.popitem(last=False)
+
+    async def _fetch(self, guild: discord.Guild, user_ids: List[int]) -> Dict[int, Optional[discord.Member]]:
+        """Map each ID to its member, or ``None`` if it isn't in the guild.
+
+        IDs whose lookup failed for another reason are left out, so a
+        transient error isn't cached as a departed member.
+        """
+        try:
+            members = await guild.query_members(user_ids=user_ids, limit=len(user_ids), cache=True)
+            found = {member.id: member for member in members}
+            return {user_id: found.get(user_id) for user_id in user_ids}
+        except (discord.ClientException, asyncio.TimeoutError):
+            pass
+
+        # Fall back to concurrent REST fetches if the gateway query isn't available
+        results = await asyncio.gather(
+            *(guild.fetch_member(user_id) for user_id in user_ids),
+            return_exceptions=True
+        )
+        members = {}
+        for user_id, result in zip(user_ids, results):
+            if isinstance(result, discord.Member):
+                members[user_id] = result
+            elif isinstance(result, discord.NotFound):
+                members[user_id] = None
+        return members
+
+    async def resolve(self, guild: discord.Guild, user_ids: Iterable[int]) -> Dict[int, Optional[str]]:
+        names: Dict[int, Optional[str]] = {}
+        missing = []
+        for user_id in user_ids:
+            key = (guild.id, user_id)
+            found, name = self._get(key)
+            if found:
+                name_lookups.labels(source='cache').inc()
+                names[user_id] = name
+                continue
+
+            member = guild.get_member(user_id)
+            if member is not None:
+                name_lookups.labels(source='gateway').inc()
+                names[user_id] = member.display_name
+                self._put(key, member.display_name)
+            else:
+                missing.append(user_id)
+
+        if missing:
+            # query_members accepts at most 100 IDs per request
+            for start in range(0, len(missing), 100):
+                chunk = missing[start:start + 100]
+                fetched = await self._fetch(guild, chunk)
+                name_lookups.labels(source='fetch').inc(len(chunk))
+                for user_id in chunk:
+                    if user_id not in fetched:
+                        names[user_id] = None
+                        continue
+                    member = fetched[user_id]
+                    name = member.display_name if member is not None else None
+                    names[user_id] = name
+                    self._put((guild.id, user_id), name)
+
+        return names
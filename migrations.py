@@ -0,0 +1,227 @@
+from typing import Awaitable, Callable, List, Tuple
+
+from database import Database, Transaction
+
+# (version, description, step); steps run in version order, each in its own
+# transaction together with its schema_version row. Never edit a released
+# step: add a new one.
+Migration = Tuple[int, str, Callable[[Transaction], Awaitable[None]]]
+
+# The server the bot served before economies were kept per guild; rows
+# written before migration 7 belong to it
+LEGACY_GUILD_ID = 1326926349448904769
+LEGACY_RANKING_CHANNEL_ID = 1325564899879026758
+LEGACY_LOG_CHANNEL_ID = 1325644185264717844
+
+
+async def _base_tables(tx: Transaction):
+    # IF NOT EXISTS so databases created before versioning adopt this step
+    await tx.execute('''
+        CREATE TABLE IF NOT EXISTS economy (
+            user_id INTEGER PRIMARY KEY,
+            balance INTEGER DEFAULT 0,
+            last_daily TIMESTAMP
+        )
+    ''')
+    await tx.execute('''
+        CREATE TABLE IF NOT EXISTS messages (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            content TEXT,
+            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            message_count INTEGER DEFAULT 0
+        )
+    ''')
+    await tx.execute('''
+        CREATE TABLE IF NOT EXISTS excepted_users (
+            user_id INTEGER PRIMARY KEY
+        )
+    ''')
+
+
+async def _message_counts(tx: Transaction):
+    # Backfill of economy.message_count from the messages history
+    columns = await tx.fetchall('PRAGMA table_info(economy)')
+    if any(column[1] == 'message_count' for column in columns):
+        return
+
+    await tx.execute('ALTER TABLE economy ADD COLUMN message_count INTEGER DEFAULT 0')
+    await tx.execute('''
+        INSERT OR IGNORE INTO economy (user_id, balance)
+        SELECT DISTINCT user_id, 0 FROM messages
+    ''')
+    await tx.execute('''
+        UPDATE economy
+        SET message_count = (
+            SELECT COUNT(*) FROM messages
+            WHERE messages.user_id = economy.user_id
+        )
+    ''')
+
+
+async def _lookup_indexes(tx: Transaction):
+    await tx.execute('CREATE INDEX IF NOT EXISTS idx_messages_user ON messages (user_id)')
+    await tx.execute('CREATE INDEX IF NOT EXISTS idx_economy_balance ON economy (balance)')
+
+
+async def _ledger(tx: Transaction):
+    await tx.execute('''
+        CREATE TABLE IF NOT EXISTS ledger (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            kind TEXT NOT NULL,
+            counterparty INTEGER NOT NULL,
+            amount INTEGER NOT NULL,
+            interaction_id INTEGER,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    await tx.execute('CREATE INDEX IF NOT EXISTS idx_ledger_user ON ledger (user_id, id)')
+    await tx.execute('''
+        CREATE TABLE IF NOT EXISTS balance_checkpoints (
+            user_id INTEGER PRIMARY KEY,
+            ledger_id INTEGER NOT NULL,
+            balance INTEGER NOT NULL
+        )
+    ''')
+
+    # Balances that predate the ledger are only recoverable from a first checkpoint
+    if not await tx.fetchone('SELECT 1 FROM balance_checkpoints LIMIT 1'):
+        await tx.execute('''
+            INSERT INTO balance_checkpoints (user_id, ledger_id, balance)
+            SELECT user_id, (SELECT COALESCE(MAX(id), 0) FROM ledger), balance FROM economy
+        ''')
+
+
+async def _message_rollups(tx: Transaction):
+    await tx.execute('''
+        CREATE TABLE IF NOT EXISTS message_rollups (
+            user_id INTEGER,
+            hour TIMESTAMP,
+            message_count INTEGER DEFAULT 0,
+            PRIMARY KEY (user_id, hour)
+        )
+    ''')
+
+
+async def _processed_payments(tx: Transaction):
+    await tx.execute('''
+        CREATE TABLE IF NOT EXISTS processed_payments (
+            payment_id TEXT PRIMARY KEY,
+            user_id INTEGER,
+            amount INTEGER,
+            processed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+
+async def _rekey(tx: Transaction, table: str, definition: str, columns: str):
+    # SQLite can't change a primary key in place, so the table is copied
+    await tx.execute(f'CREATE TABLE {table}_new ({definition})')
+    await tx.execute(
+        f'INSERT INTO {table}_new (guild_id, {columns}) SELECT ?, {columns} FROM {table}',
+        (LEGACY_GUILD_ID,)
+    )
+    await tx.execute(f'DROP TABLE {table}')
+    await tx.execute(f'ALTER TABLE {table}_new RENAME TO {table}')
+
+
+async def _add_guild_column(tx: Transaction, table: str):
+    await tx.execute(f'ALTER TABLE {table} ADD COLUMN guild_id INTEGER')
+    await tx.execute(f'UPDATE {table} SET guild_id = ?', (LEGACY_GUILD_ID,))
+
+
+async def _guild_keys(tx: Transaction):
+    await _rekey(tx, 'economy', '''
+        guild_id INTEGER NOT NULL,
+        user_id INTEGER NOT NULL,
+        balance INTEGER DEFAULT 0,
+        last_daily TIMESTAMP,
+        message_count INTEGER DEFAULT 0,
+        PRIMARY KEY (guild_id, user_id)
+    ''', 'user_id, balance, last_daily, message_count')
+    await tx.execute('CREATE INDEX idx_economy_balance ON economy (guild_id, balance)')
+
+    await _rekey(tx, 'balance_checkpoints', '''
+        guild_id INTEGER NOT NULL,
+        user_id INTEGER NOT NULL,
+        ledger_id INTEGER NOT NULL,
+        balance INTEGER NOT NULL,
+        PRIMARY KEY (guild_id, user_id)
+    ''', 'user_id, ledger_id, balance')
+    await _rekey(tx, 'excepted_users', '''
+        guild_id INTEGER NOT NULL,
+        user_id INTEGER NOT NULL,
+        PRIMARY KEY (guild_id, user_id)
+    ''', 'user_id')
+    await _rekey(tx, 'message_rollups', '''
+        guild_id INTEGER NOT NULL,
+        user_id INTEGER,
+        hour TIMESTAMP,
+        message_count INTEGER DEFAULT 0,
+        PRIMARY KEY (guild_id, user_id, hour)
+    ''', 'user_id, hour, message_count')
+
+    await _add_guild_column(tx, 'messages')
+    await _add_guild_column(tx, 'processed_payments')
+    await _add_guild_column(tx, 'ledger')
+    await tx.execute('DROP INDEX IF EXISTS idx_ledger_user')
+    await tx.execute('CREATE INDEX idx_ledger_user ON ledger (guild_id, user_id, id)')
+
+
+async def _guild_settings(tx: Transaction):
+    # NULL columns fall back to the defaults in config.py
+    await tx.execute('''
+        CREATE TABLE IF NOT EXISTS guild_settings (
+            guild_id INTEGER PRIMARY KEY,
+            ranking_channel_id INTEGER,
+            log_channel_id INTEGER,
+            message_reward INTEGER,
+            voice_reward_per_minute INTEGER
+        )
+    ''')
+    # The channels the bot used before they were configurable; only when
+    # upgrading existing data, so new databases start empty
+    await tx.execute('''
+        INSERT OR IGNORE INTO guild_settings (guild_id, ranking_channel_id, log_channel_id)
+        SELECT ?, ?, ?
+        WHERE EXISTS (SELECT 1 FROM economy)
+    ''', (LEGACY_GUILD_ID, LEGACY_RANKING_CHANNEL_ID, LEGACY_LOG_CHANNEL_ID))
+
+
+MIGRATIONS: List[Migration] = [
+    (1, 'tabelas economy, messages e excepted_users', _base_tables),
+    (2, 'economy.message_count preenchido a partir de messages', _message_counts),
+    (3, 'índices em messages.user_id e economy.balance', _lookup_indexes),
+    (4, 'ledger e balance_checkpoints', _ledger),
+    (5, 'message_rollups', _message_rollups),
+    (6, 'processed_payments', _processed_payments),
+    (7, 'chaves (guild_id, user_id) em todas as tabelas', _guild_keys),
+    (8, 'guild_settings', _guild_settings),
+]
+
+
+async def migrate(db: Database, migrations: List[Migration] = MIGRATIONS) -> List[int]:
+    """Apply pending migrations; returns the versions applied by this call."""
+    await db.execute('''
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    current = (await db.fetchone('SELECT COALESCE(MAX(version), 0) FROM schema_version'))[0]
+
+    applied = []
+    for version, description, step in sorted(migrations, key=lambda migration: migration[0]):
+        if version <= current:
+            continue
+        async with db.transaction() as tx:
+            await step(tx)
+            await tx.execute(
+                'INSERT INTO schema_version (version, description) VALUES (?, ?)',
+                (version, description)
+            )
+        print(f"Migração {version} aplicada: {description}")
+        applied.append(version)
+    return applied
@@ -0,0 +1,215 @@
+import asyncio
+import random
+import time
+from collections import OrderedDict, deque
+from typing import Awaitable, Callable, Deque, Optional, Set
+
+import aiohttp
+import discord
+
+import metrics
+
+notifications_total = metrics.counter(
+    'notifications_total', 'Background notifications by kind and outcome', ['kind', 'result']
+)
+notification_queue_depth = metrics.gauge('notification_queue_depth', 'Notifications waiting for a worker')
+notification_delivery_seconds = metrics.histogram(
+    'notification_delivery_seconds', 'Time from enqueue to delivery, retries included', ['kind'],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+)
+
+DeadLetterHook = Callable[[], Awaitable[None]]
+
+
+class Undeliverable(Exception):
+    """Permanent failure found without calling the API."""
+
+
+class DMsClosed(Undeliverable):
+    pass
+
+
+class Notification:
+    """One DM or channel post waiting for delivery."""
+
+    __slots__ = ('kind', 'target_id', 'content', 'embed', 'on_dead_letter', 'attempts', 'created_at')
+
+    def __init__(self, kind: str, target_id: int, content: Optional[str], embed: Optional[discord.Embed],
+                 on_dead_letter: Optional[DeadLetterHook]):
+        self.kind = kind
+        self.target_id = target_id
+        self.content = content
+        self.embed = embed
+        self.on_dead_letter = on_dead_letter
+        self.attempts = 0
+        self.created_at = time.monotonic()
+
+
+class NotificationQueue:
+    """Delivers receipts and log posts outside the command path.
+
+    ``workers`` tasks send in parallel, so one slow DM doesn't hold up the
+    rest. Transient failures (5xx, network errors, 429s discord.py gave up
+    on) are retried with exponential backoff that waits at least as long
+    as Discord's ``Retry-After``. Closed DMs, missing channels and other
+    permanent failures are dead-lettered: kept in ``dead_letters`` and
+    handed to the notification's ``on_dead_letter`` hook. Users whose DMs
+    are closed are remembered for ``closed_dm_ttl`` seconds, so receipts to
+    them don't spend API calls on 403s (which also count towards
+    Cloudflare's invalid-request limit).
+    """
+
+    def __init__(self, client: discord.Client, workers: int, max_size: int, max_attempts: int,
+                 base_delay: float, max_delay: float, closed_dm_ttl: float, dead_letter_size: int = 500):
+        self.client = client
+        self.workers = workers
+        self.max_size = max_size
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.closed_dm_ttl = closed_dm_ttl
+        self.dead_letters: Deque[Notification] = deque(maxlen=dead_letter_size)
+        # user_id -> monotonic time until which DMs are assumed closed
+        self._closed_dms: 'OrderedDict[int, float]' = OrderedDict()
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: Set[asyncio.Task] = set()
+        self._retries: Set[asyncio.Task] = set()
+
+    def start(self):
+        self._queue = asyncio.Queue(self.max_size)
+        loop = asyncio.get_running_loop()
+        self._tasks = {loop.create_task(self._worker()) for _ in range(self.workers)}
+
+    async def stop(self, timeout: float):
+        """Give queued notifications up to ``timeout`` seconds, then cancel the rest."""
+        if self._queue is None:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout=timeout)
+        except asyncio.TimeoutError:
+            pass
+        # Retries waiting out their backoff aren't in the queue
+        discarded = self._queue.qsize() + len(self._retries)
+        if discarded:
+            print(f"Notificações descartadas no desligamento: {discarded}")
+        for task in self._tasks | self._retries:
+            task.cancel()
+        await asyncio.gather(*self._tasks, *self._retries, return_exceptions=True)
+        self._tasks, self._retries = set(), set()
+        self._queue = None
+
+    def send_dm(self, user_id: int, content: Optional[str] = None, embed: Optional[discord.Embed] = None,
+                on_dead_letter: Optional[DeadLetterHook] = None):
+        self._enqueue(Notification('dm', user_id, content, embed, on_dead_letter))
+
+    def send_channel(self, channel_id: int, content: Optional[str] = None, embed: Optional[discord.Embed] = None):
+        self._enqueue(Notification('channel', channel_id, content, embed, None))
+
+    def _enqueue(self, notification: Notification):
+        if self._queue is None:
+            notifications_total.labels(kind=notification.kind, result='dropped').inc()
+            return
+        try:
+            self._queue.put_nowait(notification)
+        except asyncio.QueueFull:
+            # Bounded so an API outage can't grow memory without limit
+            notifications_total.labels(kind=notification.kind, result='dropped').inc()
+            print(f"Fila de notificações cheia; {notification.kind} para {notification.target_id} descartada")
+            return
+        notification_queue_depth.set(self._queue.qsize())
+
+    def _dms_closed(self, user_id: int) -> bool:
+        until = self._closed_dms.get(user_id)
+        if until is None:
+            return False
+        if until < time.monotonic():
+            del self._closed_dms[user_id]
+            return False
+        return True
+
+    def _remember_closed_dm(self, user_id: int):
+        self._closed_dms[user_id] = time.monotonic() + self.closed_dm_ttl
+        self._closed_dms.move_to_end(user_id)
+        while len(self._closed_dms) > 10_000:
+            self._closed_dms.popitem(last=False)
+
+    async def _deliver(self, notification: Notification):
+        if notification.kind == 'dm':
+            if self._dms_closed(notification.target_id):
+                raise DMsClosed(notification.target_id)
+            user = self.client.get_user(notification.target_id) or await self.client.fetch_user(notification.target_id)
+            await user.send(content=notification.content, embed=notification.embed)
+        else:
+            channel = self.client.get_channel(notification.target_id)
+            if channel is None:
+                raise Undeliverable(f'canal {notification.target_id} não encontrado')
+            await channel.send(content=notification.content, embed=notification.embed)
+
+    def _retry_after(self, error: Exception) -> Optional[float]:
+        """Seconds to wait before retrying, or None when retrying can't help."""
+        if isinstance(error, discord.RateLimited):
+            return error.retry_after
+        if isinstance(error, (discord.Forbidden, discord.NotFound)):
+            return None
+        if isinstance(error, discord.HTTPException):
+            if error.status == 429:
+                header = error.response.headers.get('Retry-After') if error.response is not None else None
+                return float(header) if header else self.base_delay
+            return 0.0 if error.status >= 500 else None
+        if isinstance(error, (aiohttp.ClientError, asyncio.TimeoutError, OSError)):
+            return 0.0
+        return None
+
+    async def _handle(self, notification: Notification):
+        notification.attempts += 1
+        try:
+            await self._deliver(notification)
+        except Exception as e:
+            retry_after = self._retry_after(e)
+            if retry_after is None or notification.attempts >= self.max_attempts:
+                if notification.kind == 'dm' and isinstance(e, discord.Forbidden):
+                    self._remember_closed_dm(notification.target_id)
+                await self._dead_letter(notification, e)
+                return
+            backoff = min(self.max_delay, self.base_delay * 2 ** (notification.attempts - 1))
+            delay = max(retry_after, backoff * random.uniform(0.5, 1.0))
+            notifications_total.labels(kind=notification.kind, result='retried').inc()
+            task = asyncio.get_running_loop().create_task(self._requeue(notification, delay))
+            self._retries.add(task)
+            task.add_done_callback(self._retries.discard)
+            return
+
+        notifications_total.labels(kind=notification.kind, result='sent').inc()
+        notification_delivery_seconds.labels(kind=notification.kind).observe(
+            time.monotonic() - notification.created_at
+        )
+
+    async def _requeue(self, notification: Notification, delay: float):
+        await asyncio.sleep(delay)
+        if self._queue is not None:
+            await self._queue.put(notification)
+            notification_queue_depth.set(self._queue.qsize())
+
+    async def _dead_letter(self, notification: Notification, error: Exception):
+        notifications_total.labels(kind=notification.kind, result='dead_letter').inc()
+        self.dead_letters.append(notification)
+        # Closed DMs are routine; anything else is worth a log line
+        if not (notification.kind == 'dm' and isinstance(error, (discord.Forbidden, DMsClosed))):
+            print(f"Notificação {notification.kind} para {notification.target_id} descartada "
+                  f"após {notification.attempts} tentativas: {error}")
+        if notification.on_dead_letter is not None:
+            try:
+                await notification.on_dead_letter()
+            except Exception as e:
+                print(f"Erro ao avisar sobre notificação não entregue: {e}")
+
+    async def _worker(self):
+        while True:
+            notification = await self._queue.get()
+            notification_queue_depth.set(self._queue.qsize())
+            try:
+                await self._handle(notification)
+            except Exception as e:
+                print(f"Erro ao entregar notificação: {e}")
+            finally:
+                self._queue.task_done()
@@ -0,0 +1,215 @@
+import asyncio
+import hashlib
+import hmac
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, Optional, Set
+
+import mercadopago
+import requests
+from aiohttp import web
+from mercadopago.config import RequestOptions
+from mercadopago.http import HttpClient
+from requests.adapters import HTTPAdapter
+from urllib3.util import Retry
+
+import metrics
+from migrations import LEGACY_GUILD_ID
+from storage import Account, Storage
+
+notifications = metrics.counter('payment_notifications_total', 'Mercado Pago notifications by outcome', ['result'])
+api_latency = metrics.histogram(
+    'mercadopago_request_seconds', 'Mercado Pago API round-trips', ['operation', 'result']
+)
+api_pending = metrics.gauge('mercadopago_requests_in_flight', 'Mercado Pago API calls being awaited')
+
+# Deadcoins granted per real, as advertised by /comprar
+DEADCOINS_PER_REAL = 1000
+
+
+class PooledHttpClient(HttpClient):
+    """SDK transport that keeps one pooled ``requests`` session alive.
+
+    The stock client opens a new session, and so a new TLS connection, for
+    every call.
+    """
+
+    def __init__(self, pool_size: int, retries: int = 2):
+        self.session = requests.Session()
+        # urllib3 only retries idempotent methods, so preference creation is never sent twice
+        adapter = HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=pool_size,
+            max_retries=Retry(total=retries, backoff_factor=0.2, status_forcelist=[429, 500, 502, 503, 504])
+        )
+        self.session.mount('https://', adapter)
+
+    def request(self, method, url, maxretries=None, **kwargs):
+        api_result = self.session.request(method, url, **kwargs)
+        return {
+            'status': api_result.status_code,
+            'response': api_result.json()
+        }
+
+    def close(self):
+        self.session.close()
+
+
+class MercadoPago:
+    """Mercado Pago API calls made from coroutines.
+
+    The SDK is blocking, so calls run on a small dedicated pool (never the
+    loop, and never more than ``workers`` at once) and are abandoned after
+    ``timeout`` seconds.
+    """
+
+    def __init__(self, access_token: str, workers: int, timeout: float):
+        self.timeout = timeout
+        self.http = PooledHttpClient(pool_size=workers)
+        self.sdk = mercadopago.SDK(
+            access_token,
+            http_client=self.http,
+            request_options=RequestOptions(connection_timeout=float(timeout))
+        )
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='mercadopago')
+
+    async def _call(self, operation: str, func, *args) -> Dict[str, Any]:
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        result = 'error'
+        api_pending.inc()
+        try:
+            response = await asyncio.wait_for(
+                loop.run_in_executor(self._executor, func, *args), self.timeout
+            )
+            result = 'ok' if 200 <= response.get('status', 0) < 300 else 'http_error'
+            return response
+        except asyncio.TimeoutError:
+            result = 'timeout'
+            raise
+        finally:
+            api_pending.dec()
+            api_latency.labels(operation=operation, result=result).observe(time.perf_counter() - start)
+
+    async def create_preference(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        return await self._call('create_preference', self.sdk.preference().create, data)
+
+    async def get_payment(self, payment_id: str) -> Dict[str, Any]:
+        return await self._call('get_payment', self.sdk.payment().get, payment_id)
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+        self.http.close()
+
+
+def payment_reference(guild_id: int, user_id: int) -> str:
+    """``external_reference`` for a purchase, naming the account to credit."""
+    return f'{guild_id}:{user_id}'
+
+
+def parse_reference(reference: str) -> Account:
+    # Preferences created before per-guild economies carry only the user ID
+    guild_id, _, user_id = str(reference).rpartition(':')
+    return (int(guild_id) if guild_id else LEGACY_GUILD_ID), int(user_id)
+
+
+def verify_signature(secret: str, signature: str, request_id: str, data_id: str) -> bool:
+    """Check the ``x-signature`` header Mercado Pago signs notifications with."""
+    parts = dict(
+        item.split('=', 1) for item in signature.split(',') if '=' in item
+    )
+    ts, received = parts.get('ts', '').strip(), parts.get('v1', '').strip()
+    if not ts or not received:
+        return False
+    manifest = f'id:{data_id.lower()};request-id:{request_id};ts:{ts};'
+    expected = hmac.new(secret.encode(), manifest.encode(), hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected, received)
+
+
+class PaymentWebhook:
+    """HTTP endpoint that credits approved Mercado Pago payments exactly once.
+
+    The notification only says *which* payment changed; status, amount and
+    buyer are read back from the Mercado Pago API. Processed payment IDs are
+    kept in ``processed_payments`` so retried notifications are no-ops.
+    """
+
+    def __init__(self, storage: Storage, gateway: MercadoPago, secret: Optional[str],
+                 on_credit: Optional[Callable[[int, int, int, int], Awaitable[None]]] = None):
+        self.storage = storage
+        self.gateway = gateway
+        self.secret = secret
+        # Called with (guild_id, user_id, cents, deadcoins) after a payment is credited
+        self.on_credit = on_credit
+        self._in_flight: Set[str] = set()
+
+    @staticmethod
+    async def _notification(request: web.Request) -> Dict[str, Optional[str]]:
+        body: Dict[str, Any] = {}
+        if request.can_read_body:
+            try:
+                body = await request.json()
+            except ValueError:
+                body = {}
+        data = body.get('data') or {}
+        return {
+            'type': request.query.get('type') or request.query.get('topic') or body.get('type'),
+            'id': request.query.get('data.id') or request.query.get('id') or (
+                str(data['id']) if data.get('id') is not None else None
+            ),
+        }
+
+    async def handle(self, request: web.Request) -> web.Response:
+        notification = await self._notification(request)
+        payment_id = notification['id']
+        if notification['type'] != 'payment' or not payment_id:
+            notifications.labels(result='ignored').inc()
+            return web.Response(text='ignored')
+
+        if self.secret and not verify_signature(
+            self.secret,
+            request.headers.get('x-signature', ''),
+            request.headers.get('x-request-id', ''),
+            payment_id
+        ):
+            notifications.labels(result='bad_signature').inc()
+            return web.Response(status=401, text='invalid signature')
+
+        # Retries and concurrent duplicates stop here, before any API call
+        if payment_id in self._in_flight or await self.storage.payment_processed(payment_id):
+            notifications.labels(result='duplicate').inc()
+            return web.Response(text='duplicate')
+
+        self._in_flight.add(payment_id)
+        try:
+            response = await self.gateway.get_payment(payment_id)
+            payment = response.get('response') or {}
+            if response.get('status') != 200:
+                raise RuntimeError(f"status {response.get('status')} ao consultar pagamento {payment_id}")
+
+            if payment.get('status') != 'approved':
+                notifications.labels(result='not_approved').inc()
+                return web.Response(text='pending')
+
+            guild_id, user_id = parse_reference(payment['external_reference'])
+            deadcoins = int(float(payment['transaction_amount']) * DEADCOINS_PER_REAL)
+            cents = deadcoins * 100
+
+            if not await self.storage.credit_payment(payment_id, guild_id, user_id, cents):
+                notifications.labels(result='duplicate').inc()
+                return web.Response(text='duplicate')
+        except Exception as e:
+            notifications.labels(result='error').inc()
+            print(f"Erro ao processar pagamento {payment_id}: {e}")
+            # A non-2xx answer makes Mercado Pago retry later
+            return web.Response(status=500, text='error')
+        finally:
+            self._in_flight.discard(payment_id)
+
+        notifications.labels(result='credited').inc()
+        if self.on_credit is not None:
+            try:
+                await self.on_credit(guild_id, user_id, cents, deadcoins)
+            except Exception as e:
+                print(f"Erro ao notificar pagamento {payment_id}: {e}")
+        return web.Response(text='credited')
@@ -0,0 +1,631 @@
+import asyncio
+import functools
+import time
+from datetime import datetime
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+try:
+    import asyncpg
+except ImportError:  # only needed with STORAGE_BACKEND=postgres
+    asyncpg = None
+
+import metrics
+import tracing
+from ledger import SYSTEM_ACCOUNT
+from migrations import LEGACY_GUILD_ID, LEGACY_LOG_CHANNEL_ID, LEGACY_RANKING_CHANNEL_ID
+from storage import (
+    MESSAGES_PER_REWARD, TABLES, TIMESTAMP_COLUMNS, Account, GuildSettings, MessageRecord, Storage,
+    aggregate_messages, format_timestamp
+)
+from transfers import transfer_results
+
+operation_seconds = metrics.histogram('postgres_operation_seconds', 'Storage operations on PostgreSQL', ['op'])
+deadlock_retries = metrics.counter('postgres_deadlock_retries_total', 'Transactions retried after a deadlock')
+
+# Same shape as the SQLite schema (see migrations.py), with 64-bit keys for
+# Discord snowflakes. Timestamps are naive UTC like SQLite's CURRENT_TIMESTAMP.
+MIGRATIONS: List[Tuple[int, str, str]] = [
+    (1, 'esquema inicial', '''
+        CREATE TABLE IF NOT EXISTS economy (
+            user_id BIGINT PRIMARY KEY,
+            balance BIGINT NOT NULL DEFAULT 0,
+            last_daily TIMESTAMP,
+            message_count BIGINT NOT NULL DEFAULT 0
+        );
+        CREATE INDEX IF NOT EXISTS idx_economy_balance ON economy (balance);
+
+        CREATE TABLE IF NOT EXISTS messages (
+            id BIGSERIAL PRIMARY KEY,
+            user_id BIGINT,
+            content TEXT,
+            timestamp TIMESTAMP DEFAULT (now() AT TIME ZONE 'utc'),
+            message_count INTEGER DEFAULT 0
+        );
+        CREATE INDEX IF NOT EXISTS idx_messages_user ON messages (user_id);
+        CREATE INDEX IF NOT EXISTS idx_messages_timestamp ON messages (timestamp);
+
+        CREATE TABLE IF NOT EXISTS excepted_users (
+            user_id BIGINT PRIMARY KEY
+        );
+
+        CREATE TABLE IF NOT EXISTS ledger (
+            id BIGSERIAL PRIMARY KEY,
+            user_id BIGINT NOT NULL,
+            kind TEXT NOT NULL,
+            counterparty BIGINT NOT NULL,
+            amount BIGINT NOT NULL,
+            interaction_id BIGINT,
+            created_at TIMESTAMP DEFAULT (now() AT TIME ZONE 'utc')
+        );
+        CREATE INDEX IF NOT EXISTS idx_ledger_user ON ledger (user_id, id);
+
+        CREATE TABLE IF NOT EXISTS balance_checkpoints (
+            user_id BIGINT PRIMARY KEY,
+            ledger_id BIGINT NOT NULL,
+            balance BIGINT NOT NULL
+        );
+
+        CREATE TABLE IF NOT EXISTS message_rollups (
+            user_id BIGINT,
+            hour TIMESTAMP,
+            message_count BIGINT DEFAULT 0,
+            PRIMARY KEY (user_id, hour)
+        );
+
+        CREATE TABLE IF NOT EXISTS processed_payments (
+            payment_id TEXT PRIMARY KEY,
+            user_id BIGINT,
+            amount BIGINT,
+            processed_at TIMESTAMP DEFAULT (now() AT TIME ZONE 'utc')
+        );
+    '''),
+    # Existing rows belong to migrations.LEGACY_GUILD_ID. A constant default
+    # makes ADD COLUMN metadata-only; it is dropped right after.
+    (2, 'chaves (guild_id, user_id) e guild_settings', f'''
+        ALTER TABLE economy ADD COLUMN guild_id BIGINT NOT NULL DEFAULT {LEGACY_GUILD_ID};
+        ALTER TABLE economy ALTER COLUMN guild_id DROP DEFAULT;
+        ALTER TABLE economy DROP CONSTRAINT economy_pkey, ADD PRIMARY KEY (guild_id, user_id);
+        DROP INDEX idx_economy_balance;
+        CREATE INDEX idx_economy_balance ON economy (guild_id, balance);
+
+        ALTER TABLE balance_checkpoints ADD COLUMN guild_id BIGINT NOT NULL DEFAULT {LEGACY_GUILD_ID};
+        ALTER TABLE balance_checkpoints ALTER COLUMN guild_id DROP DEFAULT;
+        ALTER TABLE balance_checkpoints DROP CONSTRAINT balance_checkpoints_pkey,
+            ADD PRIMARY KEY (guild_id, user_id);
+
+        ALTER TABLE excepted_users ADD COLUMN guild_id BIGINT NOT NULL DEFAULT {LEGACY_GUILD_ID};
+        ALTER TABLE excepted_users ALTER COLUMN guild_id DROP DEFAULT;
+        ALTER TABLE excepted_users DROP CONSTRAINT excepted_users_pkey, ADD PRIMARY KEY (guild_id, user_id);
+
+        ALTER TABLE message_rollups ADD COLUMN guild_id BIGINT NOT NULL DEFAULT {LEGACY_GUILD_ID};
+        ALTER TABLE message_rollups ALTER COLUMN guild_id DROP DEFAULT;
+        ALTER TABLE message_rollups DROP CONSTRAINT message_rollups_pkey,
+            ADD PRIMARY KEY (guild_id, user_id, hour);
+
+        ALTER TABLE messages ADD COLUMN guild_id BIGINT NOT NULL DEFAULT {LEGACY_GUILD_ID};
+        ALTER TABLE messages ALTER COLUMN guild_id DROP DEFAULT;
+
+        ALTER TABLE processed_payments ADD COLUMN guild_id BIGINT DEFAULT {LEGACY_GUILD_ID};
+        ALTER TABLE processed_payments ALTER COLUMN guild_id DROP DEFAULT;
+
+        ALTER TABLE ledger ADD COLUMN guild_id BIGINT NOT NULL DEFAULT {LEGACY_GUILD_ID};
+        ALTER TABLE ledger ALTER COLUMN guild_id DROP DEFAULT;
+        DROP INDEX idx_ledger_user;
+        CREATE INDEX idx_ledger_user ON ledger (guild_id, user_id, id);
+
+        CREATE TABLE guild_settings (
+            guild_id BIGINT PRIMARY KEY,
+            ranking_channel_id BIGINT,
+            log_channel_id BIGINT,
+            message_reward BIGINT,
+            voice_reward_per_minute BIGINT
+        );
+        INSERT INTO guild_settings (guild_id, ranking_channel_id, log_channel_id)
+        SELECT {LEGACY_GUILD_ID}, {LEGACY_RANKING_CHANNEL_ID}, {LEGACY_LOG_CHANNEL_ID}
+        WHERE EXISTS (SELECT 1 FROM economy);
+    '''),
+]
+
+# Tables with a BIGSERIAL id whose sequence must follow imported rows
+SERIAL_TABLES = ('messages', 'ledger')
+
+
+def _timed(op: str):
+    def decorator(func):
+        histogram = operation_seconds.labels(op=op)
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                with tracing.phase('db'):
+                    return await func(*args, **kwargs)
+            finally:
+                histogram.observe(time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+def _rowcount(status: str) -> int:
+    # asyncpg returns the command tag, e.g. 'UPDATE 1' or 'INSERT 0 1'
+    return int(status.rsplit(' ', 1)[-1])
+
+
+class PostgresStorage(Storage):
+    """Storage on PostgreSQL through an asyncpg connection pool.
+
+    Unlike SQLite, several bot processes can write at once, so multi-row
+    writes lock the affected accounts in (guild, user) order and deadlocks
+    are retried.
+    """
+
+    name = 'postgres'
+
+    def __init__(self, dsn: str, min_size: int = 1, max_size: int = 10, deadlock_retries: int = 3):
+        if asyncpg is None:
+            raise RuntimeError('asyncpg não está instalado; necessário para STORAGE_BACKEND=postgres')
+        self.dsn = dsn
+        self.min_size = min_size
+        self.max_size = max_size
+        self.deadlock_retries = deadlock_retries
+        self.pool: Optional['asyncpg.Pool'] = None
+
+    async def connect(self):
+        self.pool = await asyncpg.create_pool(self.dsn, min_size=self.min_size, max_size=self.max_size)
+
+    async def close(self):
+        if self.pool is not None:
+            await self.pool.close()
+            self.pool = None
+
+    async def _transaction(self, func: Callable[['asyncpg.Connection'], Awaitable[Any]]):
+        """Run ``func(conn)`` in a transaction, retrying it if it deadlocks."""
+        for attempt in range(self.deadlock_retries + 1):
+            try:
+                async with self.pool.acquire() as conn:
+                    async with conn.transaction():
+                        return await func(conn)
+            except asyncpg.DeadlockDetectedError:
+                if attempt == self.deadlock_retries:
+                    raise
+                deadlock_retries.inc()
+                await asyncio.sleep(0.01 * (attempt + 1))
+
+    @staticmethod
+    async def _lock_accounts(conn, accounts: Iterable[Account]):
+        """Create missing accounts and row-lock them in a global order."""
+        accounts = sorted(set(accounts))
+        guild_ids = [guild_id for guild_id, _ in accounts]
+        user_ids = [user_id for _, user_id in accounts]
+        await conn.execute('''
+            INSERT INTO economy (guild_id, user_id)
+            SELECT * FROM unnest($1::bigint[], $2::bigint[])
+            ON CONFLICT DO NOTHING
+        ''', guild_ids, user_ids)
+        await conn.execute('''
+            SELECT 1 FROM economy e
+            JOIN unnest($1::bigint[], $2::bigint[]) AS v(guild_id, user_id)
+            ON e.guild_id = v.guild_id AND e.user_id = v.user_id
+            ORDER BY e.guild_id, e.user_id
+            FOR UPDATE OF e
+        ''', guild_ids, user_ids)
+
+    @staticmethod
+    async def _record(conn, entries: List[tuple]):
+        await conn.executemany('''
+            INSERT INTO ledger (guild_id, user_id, kind, counterparty, amount, interaction_id)
+            VALUES ($1, $2, $3, $4, $5, $6)
+        ''', entries)
+
+    async def setup(self):
+        async with self.pool.acquire() as conn:
+            await conn.execute('''
+                CREATE TABLE IF NOT EXISTS schema_version (
+                    version INTEGER PRIMARY KEY,
+                    description TEXT NOT NULL,
+                    applied_at TIMESTAMP DEFAULT (now() AT TIME ZONE 'utc')
+                )
+            ''')
+            for version, description, sql in MIGRATIONS:
+                async with conn.transaction():
+                    # Serializes concurrent startups of several bot processes
+                    await conn.execute('LOCK TABLE schema_version IN EXCLUSIVE MODE')
+                    if await conn.fetchval('SELECT 1 FROM schema_version WHERE version = $1', version):
+                        continue
+                    await conn.execute(sql)
+                    await conn.execute(
+                        'INSERT INTO schema_version (version, description) VALUES ($1, $2)',
+                        version, description
+                    )
+                print(f"Migração PostgreSQL {version} aplicada: {description}")
+
+            seeded = await conn.fetchval('SELECT 1 FROM balance_checkpoints LIMIT 1')
+        if not seeded:
+            # First run: checkpoint under the same lock as the periodic job, so
+            # a transfer committed by another process can't slip in between
+            await self.checkpoint_ledger()
+
+    async def describe(self) -> Dict[str, Any]:
+        async with self.pool.acquire() as conn:
+            version = await conn.fetchval('SHOW server_version')
+            isolation = await conn.fetchval('SHOW default_transaction_isolation')
+        return {
+            'server_version': version,
+            'isolation': isolation,
+            'pool': f'{self.min_size}-{self.max_size}',
+        }
+
+    async def check_writable(self):
+        if await self.pool.fetchval('SELECT pg_is_in_recovery()'):
+            raise RuntimeError('servidor PostgreSQL em modo somente leitura')
+
+    # Accounts
+
+    @_timed('balance')
+    async def balance(self, guild_id: int, user_id: int) -> int:
+        balance = await self.pool.fetchval(
+            'SELECT balance FROM economy WHERE guild_id = $1 AND user_id = $2', guild_id, user_id
+        )
+        return balance or 0
+
+    @staticmethod
+    async def _add(conn, guild_id: int, user_id: int, amount: int):
+        await conn.execute('''
+            UPDATE economy SET balance = balance + $1
+            WHERE guild_id = $2 AND user_id = $3
+        ''', amount, guild_id, user_id)
+
+    @_timed('credit')
+    async def credit(self, guild_id: int, user_id: int, amount: int, kind: str,
+                     interaction_id: Optional[int] = None):
+        async def run(conn):
+            await self._lock_accounts(conn, [(guild_id, user_id)])
+            await self._add(conn, guild_id, user_id, amount)
+            await self._record(conn, [(guild_id, user_id, kind, SYSTEM_ACCOUNT, amount, interaction_id)])
+        await self._transaction(run)
+        transfer_results.labels(kind=kind, result='ok').inc()
+
+    @_timed('credit_many')
+    async def credit_many(self, amounts: Dict[Account, int], kind: str):
+        if not amounts:
+            return
+        accounts = sorted(amounts)
+
+        async def run(conn):
+            await self._lock_accounts(conn, accounts)
+            await conn.execute('''
+                UPDATE economy e
+                SET balance = e.balance + v.amount
+                FROM unnest($1::bigint[], $2::bigint[], $3::bigint[]) AS v(guild_id, user_id, amount)
+                WHERE e.guild_id = v.guild_id AND e.user_id = v.user_id
+            ''', [guild_id for guild_id, _ in accounts], [user_id for _, user_id in accounts],
+                [amounts[account] for account in accounts])
+            await self._record(conn, [
+                (guild_id, user_id, kind, SYSTEM_ACCOUNT, amounts[(guild_id, user_id)], None)
+                for guild_id, user_id in accounts
+            ])
+        await self._transaction(run)
+
+    @_timed('credit_payment')
+    async def credit_payment(self, payment_id: str, guild_id: int, user_id: int, amount: int) -> bool:
+        async def run(conn):
+            status = await conn.execute('''
+                INSERT INTO processed_payments (payment_id, guild_id, user_id, amount)
+                VALUES ($1, $2, $3, $4)
+                ON CONFLICT DO NOTHING
+            ''', payment_id, guild_id, user_id, amount)
+            if not _rowcount(status):
+                return False
+            await self._lock_accounts(conn, [(guild_id, user_id)])
+            await self._add(conn, guild_id, user_id, amount)
+            await self._record(conn, [(guild_id, user_id, 'payment', SYSTEM_ACCOUNT, amount, None)])
+            return True
+        credited = await self._transaction(run)
+        if credited:
+            transfer_results.labels(kind='payment', result='ok').inc()
+        return credited
+
+    @_timed('payment_processed')
+    async def payment_processed(self, payment_id: str) -> bool:
+        return bool(await self.pool.fetchval('SELECT 1 FROM processed_payments WHERE payment_id = $1', payment_id))
+
+    @staticmethod
+    async def _debit(conn, guild_id: int, user_id: int, amount: int) -> bool:
+        # Re-checked against the row's latest version after the row lock,
+        # so two concurrent debits can never both pass
+        status = await conn.execute('''
+            UPDATE economy
+            SET balance = balance - $1
+            WHERE guild_id = $2 AND user_id = $3 AND balance >= $1
+        ''', amount, guild_id, user_id)
+        return _rowcount(status) == 1
+
+    @_timed('debit')
+    async def debit(self, guild_id: int, user_id: int, amount: int, kind: str,
+                    interaction_id: Optional[int] = None) -> bool:
+        async def run(conn):
+            await self._lock_accounts(conn, [(guild_id, user_id)])
+            ok = await self._debit(conn, guild_id, user_id, amount)
+            if ok:
+                await self._record(conn, [(guild_id, user_id, kind, SYSTEM_ACCOUNT, -amount, interaction_id)])
+            return ok
+        ok = await self._transaction(run)
+        transfer_results.labels(kind=kind, result='ok' if ok else 'insufficient').inc()
+        return ok
+
+    @_timed('transfer')
+    async def transfer(self, guild_id: int, sender_id: int, receiver_id: int, amount: int,
+                       interaction_id: Optional[int] = None) -> bool:
+        async def run(conn):
+            await self._lock_accounts(conn, [(guild_id, sender_id), (guild_id, receiver_id)])
+            ok = await self._debit(conn, guild_id, sender_id, amount)
+            if ok:
+                await self._add(conn, guild_id, receiver_id, amount)
+                await self._record(conn, [
+                    (guild_id, sender_id, 'transfer', receiver_id, -amount, interaction_id),
+                    (guild_id, receiver_id, 'transfer', sender_id, amount, interaction_id),
+                ])
+            return ok
+        ok = await self._transaction(run)
+        transfer_results.labels(kind='transfer', result='ok' if ok else 'insufficient').inc()
+        return ok
+
+    @_timed('remove_percent')
+    async def remove_percent(self, guild_id: int, user_id: int, percent: float,
+                             interaction_id: Optional[int] = None) -> Tuple[int, int, int]:
+        async def run(conn):
+            await self._lock_accounts(conn, [(guild_id, user_id)])
+            old = await conn.fetchval(
+                'SELECT balance FROM economy WHERE guild_id = $1 AND user_id = $2', guild_id, user_id
+            )
+            removed = int(old * (percent / 100))
+            await self._add(conn, guild_id, user_id, -removed)
+            if removed:
+                await self._record(conn, [
+                    (guild_id, user_id, 'admin_remove_percent', SYSTEM_ACCOUNT, -removed, interaction_id)
+                ])
+            return old, removed, old - removed
+        result = await self._transaction(run)
+        transfer_results.labels(kind='admin_remove_percent', result='ok').inc()
+        return result
+
+    @_timed('reset')
+    async def reset(self, guild_id: int, user_id: int, interaction_id: Optional[int] = None) -> Optional[int]:
+        async def run(conn):
+            old = await conn.fetchval(
+                'SELECT balance FROM economy WHERE guild_id = $1 AND user_id = $2 FOR UPDATE', guild_id, user_id
+            )
+            if old is None:
+                return None
+            await conn.execute('UPDATE economy SET balance = 0 WHERE guild_id = $1 AND user_id = $2', guild_id, user_id)
+            if old:
+                await self._record(conn, [(guild_id, user_id, 'admin_reset', SYSTEM_ACCOUNT, -old, interaction_id)])
+            return old
+        return await self._transaction(run)
+
+    @_timed('reset_all')
+    async def reset_all(self, guild_id: int, interaction_id: Optional[int] = None, only_positive: bool = False):
+        condition = 'balance > 0' if only_positive else 'balance != 0'
+
+        async def run(conn):
+            # The balances are read under row locks and the ledger entries come
+            # from those same rows, so concurrent writes can't slip in between
+            await conn.execute(f'''
+                WITH old AS (
+                    SELECT user_id, balance FROM economy
+                    WHERE guild_id = $3 AND {condition}
+                    ORDER BY user_id
+                    FOR UPDATE
+                ), cleared AS (
+                    UPDATE economy e SET balance = 0
+                    FROM old
+                    WHERE e.guild_id = $3 AND e.user_id = old.user_id
+                )
+                INSERT INTO ledger (guild_id, user_id, kind, counterparty, amount, interaction_id)
+                SELECT $3, user_id, 'admin_reset_all', $1, -balance, $2
+                FROM old
+            ''', SYSTEM_ACCOUNT, interaction_id, guild_id)
+        await self._transaction(run)
+
+    @_timed('statement')
+    async def statement(self, guild_id: int, user_id: int, before: Optional[int] = None,
+                        limit: int = 10) -> List[tuple]:
+        rows = await self.pool.fetch('''
+            SELECT id, kind, counterparty, amount, interaction_id, created_at
+            FROM ledger
+            WHERE guild_id = $1 AND user_id = $2 AND id < $3
+            ORDER BY id DESC
+            LIMIT $4
+        ''', guild_id, user_id, before if before is not None else 2 ** 63 - 1, limit)
+        # Same text timestamps as the SQLite backend
+        return [(*row[:5], format_timestamp(row[5])) for row in rows]
+
+    async def checkpoint_ledger(self) -> int:
+        async def run(conn):
+            # Balances and the ledger end must be read at the same instant
+            await conn.execute('LOCK TABLE economy IN SHARE MODE')
+            last_id = await conn.fetchval('SELECT COALESCE(MAX(id), 0) FROM ledger')
+            await conn.execute('''
+                INSERT INTO balance_checkpoints (guild_id, user_id, ledger_id, balance)
+                SELECT guild_id, user_id, $1, balance FROM economy
+                ON CONFLICT (guild_id, user_id)
+                DO UPDATE SET ledger_id = excluded.ledger_id, balance = excluded.balance
+            ''', last_id)
+            return last_id
+        return await self._transaction(run)
+
+    async def rebuild_balance(self, guild_id: int, user_id: int) -> int:
+        async with self.pool.acquire() as conn:
+            async with conn.transaction(isolation='repeatable_read', readonly=True):
+                row = await conn.fetchrow(
+                    'SELECT ledger_id, balance FROM balance_checkpoints WHERE guild_id = $1 AND user_id = $2',
+                    guild_id, user_id
+                )
+                ledger_id, balance = (row['ledger_id'], row['balance']) if row else (0, 0)
+                tail = await conn.fetchval('''
+                    SELECT COALESCE(SUM(amount), 0)::bigint FROM ledger
+                    WHERE guild_id = $1 AND user_id = $2 AND id > $3
+                ''', guild_id, user_id, ledger_id)
+        return balance + tail
+
+    # Messages
+
+    @_timed('record_messages')
+    async def record_messages(self, messages: List[MessageRecord]):
+        authors = aggregate_messages(messages)
+
+        async def run(conn):
+            await self._lock_accounts(conn, [(guild_id, user_id) for guild_id, user_id, _, _ in authors])
+            await conn.copy_records_to_table(
+                'messages',
+                records=[(message.guild_id, message.user_id, message.content) for message in messages],
+                columns=('guild_id', 'user_id', 'content')
+            )
+            # SET expressions see the old message_count, RETURNING sees the new one
+            paid = await conn.fetch(f'''
+                UPDATE economy e
+                SET message_count = e.message_count + v.count,
+                balance = e.balance + v.reward * ((e.message_count + v.count) / {MESSAGES_PER_REWARD} - e.message_count / {MESSAGES_PER_REWARD})
+                FROM unnest($1::bigint[], $2::bigint[], $3::bigint[], $4::bigint[]) AS v(guild_id, user_id, count, reward)
+                WHERE e.guild_id = v.guild_id AND e.user_id = v.user_id
+                RETURNING e.guild_id, e.user_id,
+                    v.reward * (e.message_count / {MESSAGES_PER_REWARD} - (e.message_count - v.count) / {MESSAGES_PER_REWARD}) AS amount
+            ''', *(list(column) for column in zip(*authors)))
+            await self._record(conn, [
+                (row['guild_id'], row['user_id'], 'message_reward', SYSTEM_ACCOUNT, row['amount'], None)
+                for row in paid if row['amount'] > 0
+            ])
+        await self._transaction(run)
+
+    @_timed('prune_messages')
+    async def prune_messages(self, cutoff: datetime, limit: int) -> int:
+        async def run(conn):
+            return await conn.fetchval('''
+                WITH doomed AS (
+                    DELETE FROM messages
+                    WHERE id IN (
+                        SELECT id FROM messages
+                        WHERE timestamp < $1
+                        ORDER BY id
+                        LIMIT $2
+                    )
+                    RETURNING guild_id, user_id, timestamp
+                ), rolled AS (
+                    INSERT INTO message_rollups (guild_id, user_id, hour, message_count)
+                    SELECT guild_id, user_id, date_trunc('hour', timestamp), COUNT(*)
+                    FROM doomed
+                    GROUP BY 1, 2, 3
+                    ON CONFLICT (guild_id, user_id, hour)
+                    DO UPDATE SET message_count = message_rollups.message_count + excluded.message_count
+                )
+                SELECT COUNT(*) FROM doomed
+            ''', cutoff, limit)
+        return await self._transaction(run)
+
+    async def compact(self):
+        # Autovacuum reclaims dead rows on its own
+        pass
+
+    # Exemptions
+
+    async def exempted_users(self) -> Set[Account]:
+        rows = await self.pool.fetch('SELECT guild_id, user_id FROM excepted_users')
+        return {(row['guild_id'], row['user_id']) for row in rows}
+
+    async def add_exemption(self, guild_id: int, user_id: int):
+        await self.pool.execute('''
+            INSERT INTO excepted_users (guild_id, user_id) VALUES ($1, $2)
+            ON CONFLICT DO NOTHING
+        ''', guild_id, user_id)
+
+    async def remove_exemption(self, guild_id: int, user_id: int):
+        await self.pool.execute('DELETE FROM excepted_users WHERE guild_id = $1 AND user_id = $2', guild_id, user_id)
+
+    # Guild settings
+
+    async def guild_settings(self) -> Dict[int, GuildSettings]:
+        rows = await self.pool.fetch(f"SELECT {', '.join(GuildSettings._fields)} FROM guild_settings")
+        return {row['guild_id']: GuildSettings(*row) for row in rows}
+
+    async def save_guild_settings(self, settings: GuildSettings):
+        columns = GuildSettings._fields
+        await self.pool.execute(f'''
+            INSERT INTO guild_settings ({', '.join(columns)}) VALUES ($1, $2, $3, $4, $5)
+            ON CONFLICT (guild_id) DO UPDATE SET
+            {', '.join(f'{column} = excluded.{column}' for column in columns[1:])}
+        ''', *settings)
+
+    # Rankings
+
+    @_timed('all_balances')
+    async def all_balances(self, guild_ids: Optional[Iterable[int]] = None) -> Dict[Account, int]:
+        if guild_ids is None:
+            rows = await self.pool.fetch('SELECT guild_id, user_id, balance FROM economy')
+        else:
+            rows = await self.pool.fetch(
+                'SELECT guild_id, user_id, balance FROM economy WHERE guild_id = ANY($1::bigint[])',
+                list(set(guild_ids))
+            )
+        return {(row['guild_id'], row['user_id']): row['balance'] or 0 for row in rows}
+
+    @_timed('balances')
+    async def balances(self, accounts: Iterable[Account]) -> Dict[Account, int]:
+        accounts = list(set(accounts))
+        if not accounts:
+            return {}
+        rows = await self.pool.fetch('''
+            SELECT e.guild_id, e.user_id, e.balance FROM economy e
+            JOIN unnest($1::bigint[], $2::bigint[]) AS v(guild_id, user_id)
+            ON e.guild_id = v.guild_id AND e.user_id = v.user_id
+        ''', [guild_id for guild_id, _ in accounts], [user_id for _, user_id in accounts])
+        return {(row['guild_id'], row['user_id']): row['balance'] or 0 for row in rows}
+
+    async def totals(self, guild_id: int) -> Tuple[int, Optional[int]]:
+        row = await self.pool.fetchrow('''
+            SELECT COUNT(*), SUM(balance)::bigint
+            FROM economy
+            WHERE guild_id = $1 AND balance > 0
+        ''', guild_id)
+        return row[0], row[1]
+
+    # Bulk copy
+
+    async def count_rows(self, table: str) -> int:
+        return await self.pool.fetchval(f'SELECT COUNT(*) FROM {table}')
+
+    async def export_rows(self, table: str, batch: int) -> AsyncIterator[List[tuple]]:
+        columns = ', '.join(TABLES[table])
+        async with self.pool.acquire() as conn:
+            async with conn.transaction(isolation='repeatable_read', readonly=True):
+                rows = []
+                async for row in conn.cursor(f'SELECT {columns} FROM {table}', prefetch=batch):
+                    rows.append(tuple(row))
+                    if len(rows) >= batch:
+                        yield rows
+                        rows = []
+                if rows:
+                    yield rows
+
+    async def import_rows(self, table: str, rows: List[tuple]):
+        columns = TABLES[table]
+        timestamps = [index for index, column in enumerate(columns) if column in TIMESTAMP_COLUMNS]
+        if timestamps:
+            # Naive UTC datetimes, as produced by every backend's export_rows
+            rows = [
+                tuple(value.replace(tzinfo=None) if index in timestamps and value is not None else value
+                      for index, value in enumerate(row))
+                for row in rows
+            ]
+        async with self.pool.acquire() as conn:
+            await conn.copy_records_to_table(table, records=rows, columns=columns)
+
+    async def finish_import(self):
+        async with self.pool.acquire() as conn:
+            for table in SERIAL_TABLES:
+                await conn.execute(f'''
+                    SELECT setval(
+                        pg_get_serial_sequence('{table}', 'id'),
+                        COALESCE((SELECT MAX(id) FROM {table}), 0) + 1,
+                        false
+                    )
+                ''')
@@ -0,0 +1,63 @@
+import time
+from collections import OrderedDict
+from typing import Hashable, Optional, Tuple
+
+import metrics
+
+limited_total = metrics.counter('rate_limited_total', 'Events dropped by an in-memory rate limiter', ['limiter'])
+limiter_buckets = metrics.gauge('rate_limiter_buckets', 'Buckets held by an in-memory rate limiter', ['limiter'])
+
+
+class TokenBucketLimiter:
+    """Per-key token buckets kept in memory.
+
+    A key may spend up to ``burst`` events at once and regains ``rate``
+    tokens per second. A bucket left alone until it refilled is the same as
+    no bucket, so idle ones are dropped as they reach the front of the LRU
+    order. ``max_size`` caps memory under a flood of distinct keys, at the
+    cost of handing the evicted keys a fresh burst.
+    """
+
+    def __init__(self, name: str, rate: float, burst: int, max_size: int):
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+        self.max_size = max_size
+        self.idle_seconds = burst / rate if rate > 0 else 0.0
+        # key -> (tokens, updated_at), least recently used first
+        self._buckets: 'OrderedDict[Hashable, Tuple[float, float]]' = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def allow(self, key: Hashable, now: Optional[float] = None) -> bool:
+        """Spend a token for ``key``; False means the event should be dropped."""
+        if self.rate <= 0:
+            return True
+        now = time.monotonic() if now is None else now
+        self._evict_idle(now)
+
+        entry = self._buckets.pop(key, None)
+        if entry is None:
+            tokens = float(self.burst)
+        else:
+            tokens, updated_at = entry
+            tokens = min(float(self.burst), tokens + (now - updated_at) * self.rate)
+
+        allowed = tokens >= 1
+        if allowed:
+            tokens -= 1
+        else:
+            limited_total.labels(limiter=self.name).inc()
+        self._buckets[key] = (tokens, now)
+        if len(self._buckets) > self.max_size:
+            self._buckets.popitem(last=False)
+        limiter_buckets.labels(limiter=self.name).set(len(self._buckets))
+        return allowed
+
+    def _evict_idle(self, now: float):
+        while self._buckets:
+            key, (_, updated_at) = next(iter(self._buckets.items()))
+            if now - updated_at < self.idle_seconds:
+                return
+            del self._buckets[key]
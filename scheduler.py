@@ -0,0 +1,213 @@
+import asyncio
+import json
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+from zoneinfo import ZoneInfo
+
+import metrics
+from database import Database
+
+job_seconds = metrics.histogram('scheduler_job_seconds', 'Duration of scheduled job runs', ['job'])
+job_runs = metrics.counter('scheduler_job_runs_total', 'Scheduled job runs', ['job'])
+job_failures = metrics.counter('scheduler_job_failures_total', 'Scheduled job runs that raised', ['job'])
+job_last_success = metrics.gauge(
+    'scheduler_job_last_success_timestamp', 'Unix time of the last successful run', ['job']
+)
+
+_FIELD_RANGES = (
+    (0, 59),  # minute
+    (0, 23),  # hour
+    (1, 31),  # day of month
+    (1, 12),  # month
+    (0, 6),   # day of week, 0 = Sunday
+)
+
+
+def _parse_field(field: str, low: int, high: int) -> Set[int]:
+    values = set()
+    for part in field.split(','):
+        step = 1
+        if '/' in part:
+            part, step_text = part.split('/', 1)
+            step = int(step_text)
+        if part == '*':
+            start, end = low, high
+        elif '-' in part:
+            start_text, end_text = part.split('-', 1)
+            start, end = int(start_text), int(end_text)
+        else:
+            start = int(part)
+            end = high if step != 1 else start
+        if start < low or end > high or start > end or step < 1:
+            raise ValueError(f'Campo cron inválido: {field!r}')
+        values.update(range(start, end + 1, step))
+    return values
+
+
+class CronSchedule:
+    """Five-field cron expression (minute hour day month weekday) in a given timezone."""
+
+    def __init__(self, expression: str, tz: str = 'UTC'):
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError(f'Expressão cron inválida: {expression!r}')
+        self.expression = expression
+        self.tz = ZoneInfo(tz)
+        self.minutes, self.hours, self.days, self.months, self.weekdays = (
+            _parse_field(field, low, high) for field, (low, high) in zip(fields, _FIELD_RANGES)
+        )
+        # Like cron, a restricted day-of-month OR day-of-week matches
+        self._any_day = fields[2] == '*'
+        self._any_weekday = fields[4] == '*'
+
+    def _day_matches(self, moment: datetime) -> bool:
+        weekday = (moment.weekday() + 1) % 7
+        if self._any_day or self._any_weekday:
+            return moment.day in self.days and weekday in self.weekdays
+        return moment.day in self.days or weekday in self.weekdays
+
+    def next_after(self, moment: datetime) -> datetime:
+        """Return the first matching minute strictly after ``moment`` (aware datetime)."""
+        local = moment.astimezone(self.tz).replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = local + timedelta(days=366 * 5)
+        while local < limit:
+            if local.month not in self.months:
+                year, month = (local.year + 1, 1) if local.month == 12 else (local.year, local.month + 1)
+                local = local.replace(year=year, month=month, day=1, hour=0, minute=0)
+            elif not self._day_matches(local):
+                local = (local + timedelta(days=1)).replace(hour=0, minute=0)
+            elif local.hour not in self.hours:
+                local = (local + timedelta(hours=1)).replace(minute=0)
+            elif local.minute not in self.minutes:
+                local += timedelta(minutes=1)
+            else:
+                return local.astimezone(timezone.utc)
+        raise ValueError(f'Expressão cron nunca dispara: {self.expression!r}')
+
+
+class Job:
+    def __init__(self, name: str, schedule: CronSchedule,
+                 func: Callable[[Dict[str, Any]], Awaitable[None]], catch_up: bool = False):
+        self.name = name
+        self.schedule = schedule
+        self.func = func
+        # Run once at startup if a trigger was missed (or the job never ran)
+        self.catch_up = catch_up
+        self.state: Dict[str, Any] = {}
+        self.last_run: Optional[datetime] = None
+        self.next_run: Optional[datetime] = None
+        self.running = False
+
+
+class Scheduler:
+    """Runs jobs on wall-clock cron triggers.
+
+    Each job's last successful run time and a small JSON state dict are
+    persisted in ``scheduler_jobs`` so a restart resumes the schedule
+    instead of resetting it. A run that raised leaves ``last_run`` alone,
+    so a ``catch_up`` job is still due after a restart.
+    """
+
+    def __init__(self, db: Database):
+        self.db = db
+        self.jobs: Dict[str, Job] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._running: Set[asyncio.Task] = set()
+
+    def add_job(self, name: str, schedule: CronSchedule,
+                func: Callable[[Dict[str, Any]], Awaitable[None]], catch_up: bool = False) -> Job:
+        job = Job(name, schedule, func, catch_up)
+        self.jobs[name] = job
+        return job
+
+    async def setup(self):
+        await self.db.execute('''
+            CREATE TABLE IF NOT EXISTS scheduler_jobs (
+                name TEXT PRIMARY KEY,
+                last_run TIMESTAMP,
+                state TEXT
+            )
+        ''')
+
+    async def _load(self, job: Job):
+        row = await self.db.fetchone('SELECT last_run, state FROM scheduler_jobs WHERE name = ?', (job.name,))
+        now = datetime.now(timezone.utc)
+        if row is not None:
+            job.last_run = datetime.fromisoformat(row[0]) if row[0] else None
+            job.state = json.loads(row[1]) if row[1] else {}
+
+        if job.last_run is None:
+            job.next_run = now if job.catch_up else job.schedule.next_after(now)
+            return
+
+        job.next_run = job.schedule.next_after(job.last_run)
+        if job.next_run <= now and not job.catch_up:
+            job.next_run = job.schedule.next_after(now)
+
+    async def _save(self, job: Job):
+        await self.db.execute('''
+            INSERT INTO scheduler_jobs (name, last_run, state)
+            VALUES (?, ?, ?)
+            ON CONFLICT (name) DO UPDATE SET last_run = excluded.last_run, state = excluded.state
+        ''', (job.name, job.last_run.isoformat() if job.last_run else None, json.dumps(job.state)))
+
+    async def start(self):
+        if self._task is not None:
+            return
+        for job in self.jobs.values():
+            await self._load(job)
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._running:
+            await asyncio.gather(*self._running, return_exceptions=True)
+
+    async def run_job(self, job: Job):
+        job.running = True
+        started = datetime.now(timezone.utc)
+        start = time.perf_counter()
+        try:
+            await job.func(job.state)
+            job_last_success.labels(job=job.name).set(time.time())
+            job.last_run = started
+        except Exception as e:
+            job_failures.labels(job=job.name).inc()
+            print(f"Erro ao executar tarefa agendada {job.name}: {e}")
+        finally:
+            job.running = False
+            job_runs.labels(job=job.name).inc()
+            job_seconds.labels(job=job.name).observe(time.perf_counter() - start)
+
+        # State is saved either way; jobs record what they already did in it
+        try:
+            await self._save(job)
+        except Exception as e:
+            print(f"Erro ao salvar estado da tarefa {job.name}: {e}")
+
+    def _due(self, now: datetime) -> List[Job]:
+        return [job for job in self.jobs.values() if job.next_run <= now]
+
+    async def _run(self):
+        while True:
+            now = datetime.now(timezone.utc)
+            for job in self._due(now):
+                job.next_run = job.schedule.next_after(now)
+                if job.running:
+                    # Never overlap a job with itself; this trigger is skipped
+                    continue
+                task = asyncio.get_running_loop().create_task(self.run_job(job))
+                self._running.add(task)
+                task.add_done_callback(self._running.discard)
+
+            next_run = min(job.next_run for job in self.jobs.values()) if self.jobs else None
+            delay = 60.0 if next_run is None else (next_run - datetime.now(timezone.utc)).total_seconds()
+            # Re-check at least once a minute in case the wall clock jumps
+            await asyncio.sleep(min(max(delay, 0.0), 60.0))
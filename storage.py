@@ -0,0 +1,505 @@
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+import ledger
+import migrations
+import transfers
+from database import Database
+from ledger import SYSTEM_ACCOUNT
+
+# Tables copied by tools.migrate_storage, with the columns copied for each
+TABLES: Dict[str, Tuple[str, ...]] = {
+    'economy': ('guild_id', 'user_id', 'balance', 'last_daily', 'message_count'),
+    'excepted_users': ('guild_id', 'user_id'),
+    'messages': ('id', 'guild_id', 'user_id', 'content', 'timestamp', 'message_count'),
+    'message_rollups': ('guild_id', 'user_id', 'hour', 'message_count'),
+    'ledger': ('id', 'guild_id', 'user_id', 'kind', 'counterparty', 'amount', 'interaction_id', 'created_at'),
+    'balance_checkpoints': ('guild_id', 'user_id', 'ledger_id', 'balance'),
+    'processed_payments': ('payment_id', 'guild_id', 'user_id', 'amount', 'processed_at'),
+    'guild_settings': ('guild_id', 'ranking_channel_id', 'log_channel_id', 'message_reward', 'voice_reward_per_minute'),
+}
+TIMESTAMP_COLUMNS = {'last_daily', 'timestamp', 'hour', 'created_at', 'processed_at'}
+
+# Accounts per IN (...) list in bulk SQLite reads
+IN_CHUNK = 400
+
+# Every MESSAGES_PER_REWARD-th message of a user pays its reward
+MESSAGES_PER_REWARD = 10
+
+# Economies are per guild: an account is a member of one server
+Account = Tuple[int, int]  # (guild_id, user_id)
+
+
+class MessageRecord(NamedTuple):
+    guild_id: int
+    user_id: int
+    content: Optional[str]
+    # Cents paid if this message completes a reward cycle (0 for exempt users)
+    reward: int
+
+
+class GuildSettings(NamedTuple):
+    """Per-guild overrides; ``None`` means the default from config.py."""
+    guild_id: int
+    ranking_channel_id: Optional[int] = None
+    log_channel_id: Optional[int] = None
+    message_reward: Optional[int] = None
+    voice_reward_per_minute: Optional[int] = None
+
+
+def aggregate_messages(messages: Iterable[MessageRecord]) -> List[Tuple[int, int, int, int]]:
+    """Collapse a batch into ``(guild_id, user_id, message_count, reward)`` per author.
+
+    The reward of the author's latest message in the batch applies to the
+    whole batch, so an exemption toggled mid-batch takes effect on the next.
+    """
+    counts: Dict[Account, List[int]] = {}
+    for message in messages:
+        entry = counts.setdefault((message.guild_id, message.user_id), [0, 0])
+        entry[0] += 1
+        entry[1] = message.reward
+    return [(guild_id, user_id, count, reward) for (guild_id, user_id), (count, reward) in sorted(counts.items())]
+
+
+def parse_timestamp(value: Any) -> Optional[datetime]:
+    """Read a timestamp stored by either backend as a naive UTC datetime."""
+    if value is None or isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(str(value).replace('T', ' '))
+
+
+def format_timestamp(value: Optional[datetime]) -> Optional[str]:
+    return value.strftime('%Y-%m-%d %H:%M:%S') if value is not None else None
+
+
+class Storage:
+    """Accounts, messages, exemptions and rankings, independent of the engine.
+
+    Every account belongs to one guild. Amounts are integer cents. Every method that moves money also writes the
+    matching ledger entries in the same transaction. Implemented by
+    ``SQLiteStorage`` (one file, one writer) and ``PostgresStorage`` (a
+    connection pool shared by any number of bot processes).
+    """
+
+    name = ''
+
+    async def connect(self):
+        raise NotImplementedError
+
+    async def close(self):
+        raise NotImplementedError
+
+    async def setup(self):
+        """Create or upgrade the schema."""
+        raise NotImplementedError
+
+    async def describe(self) -> Dict[str, Any]:
+        """Settings in effect, printed at startup."""
+        raise NotImplementedError
+
+    async def check_writable(self):
+        """Raise if the backend cannot take writes right now."""
+        raise NotImplementedError
+
+    # Accounts
+
+    async def balance(self, guild_id: int, user_id: int) -> int:
+        raise NotImplementedError
+
+    async def credit(self, guild_id: int, user_id: int, amount: int, kind: str,
+                     interaction_id: Optional[int] = None):
+        raise NotImplementedError
+
+    async def credit_many(self, amounts: Dict[Account, int], kind: str):
+        """Credit several accounts in one transaction (voice rewards)."""
+        raise NotImplementedError
+
+    async def credit_payment(self, payment_id: str, guild_id: int, user_id: int, amount: int) -> bool:
+        """Credit a payment unless its ID was seen before; True if it was credited now."""
+        raise NotImplementedError
+
+    async def payment_processed(self, payment_id: str) -> bool:
+        raise NotImplementedError
+
+    async def debit(self, guild_id: int, user_id: int, amount: int, kind: str,
+                    interaction_id: Optional[int] = None) -> bool:
+        """Remove ``amount`` if the account can cover it; False leaves it untouched."""
+        raise NotImplementedError
+
+    async def transfer(self, guild_id: int, sender_id: int, receiver_id: int, amount: int,
+                       interaction_id: Optional[int] = None) -> bool:
+        raise NotImplementedError
+
+    async def remove_percent(self, guild_id: int, user_id: int, percent: float,
+                             interaction_id: Optional[int] = None) -> Tuple[int, int, int]:
+        """Returns (old, removed, new)."""
+        raise NotImplementedError
+
+    async def reset(self, guild_id: int, user_id: int, interaction_id: Optional[int] = None) -> Optional[int]:
+        """Zero an account; returns the previous balance, or None if it doesn't exist."""
+        raise NotImplementedError
+
+    async def reset_all(self, guild_id: int, interaction_id: Optional[int] = None, only_positive: bool = False):
+        raise NotImplementedError
+
+    async def statement(self, guild_id: int, user_id: int, before: Optional[int] = None,
+                        limit: int = 10) -> List[tuple]:
+        """Newest-first ``(id, kind, counterparty, amount, interaction_id, created_at)`` rows."""
+        raise NotImplementedError
+
+    async def checkpoint_ledger(self) -> int:
+        raise NotImplementedError
+
+    async def rebuild_balance(self, guild_id: int, user_id: int) -> int:
+        raise NotImplementedError
+
+    # Messages
+
+    async def record_messages(self, messages: List[MessageRecord]):
+        """Store a batch of messages, bump counters and pay due rewards."""
+        raise NotImplementedError
+
+    async def prune_messages(self, cutoff: datetime, limit: int) -> int:
+        """Fold up to ``limit`` messages older than ``cutoff`` into hourly rollups."""
+        raise NotImplementedError
+
+    async def compact(self):
+        """Return space freed by pruning, where the engine needs to be asked."""
+        raise NotImplementedError
+
+    # Exemptions
+
+    async def exempted_users(self) -> Set[Account]:
+        raise NotImplementedError
+
+    async def add_exemption(self, guild_id: int, user_id: int):
+        raise NotImplementedError
+
+    async def remove_exemption(self, guild_id: int, user_id: int):
+        raise NotImplementedError
+
+    # Guild settings
+
+    async def guild_settings(self) -> Dict[int, GuildSettings]:
+        raise NotImplementedError
+
+    async def save_guild_settings(self, settings: GuildSettings):
+        raise NotImplementedError
+
+    # Rankings
+
+    async def all_balances(self, guild_ids: Optional[Iterable[int]] = None) -> Dict[Account, int]:
+        """Every account of the given guilds (all guilds when ``None``)."""
+        raise NotImplementedError
+
+    async def balances(self, accounts: Iterable[Account]) -> Dict[Account, int]:
+        raise NotImplementedError
+
+    async def totals(self, guild_id: int) -> Tuple[int, Optional[int]]:
+        """(funded accounts, money in circulation) in one guild."""
+        raise NotImplementedError
+
+    # Bulk copy, used by tools.migrate_storage
+
+    async def count_rows(self, table: str) -> int:
+        raise NotImplementedError
+
+    def export_rows(self, table: str, batch: int) -> AsyncIterator[List[tuple]]:
+        """Batches of rows in ``TABLES[table]`` column order, timestamps as datetimes."""
+        raise NotImplementedError
+
+    async def import_rows(self, table: str, rows: List[tuple]):
+        raise NotImplementedError
+
+    async def finish_import(self):
+        """Fix up anything derived from imported rows (e.g. ID sequences)."""
+        raise NotImplementedError
+
+
+class SQLiteStorage(Storage):
+    """Storage on the bot's SQLite file, through the single-writer ``Database``."""
+
+    name = 'sqlite'
+
+    def __init__(self, db: Database, vacuum_pages: int = 500):
+        self.db = db
+        self.vacuum_pages = vacuum_pages
+
+    async def connect(self):
+        # The Database is shared with the scheduler, which connects it first
+        if self.db.conn is None:
+            await self.db.connect()
+
+    async def close(self):
+        await self.db.close()
+
+    async def setup(self):
+        await migrations.migrate(self.db)
+
+        # Switching an existing file to incremental auto_vacuum takes a full
+        # VACUUM, which holds the write lock for as long as it runs, so it is
+        # left to tools.sqlite_maintenance; until then compact() is a no-op
+        mode = (await self.db.fetchone('PRAGMA auto_vacuum'))[0]
+        if mode != 2:
+            print(f"Aviso: {self.db.path} não usa auto_vacuum incremental; o espaço liberado pela retenção "
+                  f"só volta ao disco após python -m tools.sqlite_maintenance {self.db.path}")
+
+    async def describe(self) -> Dict[str, Any]:
+        return dict(await self.db.pragma_report(), path=self.db.path)
+
+    async def check_writable(self):
+        # BEGIN IMMEDIATE takes SQLite's write lock, so this fails on a
+        # read-only or locked database without writing anything
+        async with self.db.transaction():
+            pass
+
+    # Accounts
+
+    async def balance(self, guild_id: int, user_id: int) -> int:
+        row = await self.db.fetchone(
+            'SELECT balance FROM economy WHERE guild_id = ? AND user_id = ?', (guild_id, user_id)
+        )
+        return row[0] if row else 0
+
+    async def credit(self, guild_id: int, user_id: int, amount: int, kind: str,
+                     interaction_id: Optional[int] = None):
+        await transfers.credit(self.db, guild_id, user_id, amount, kind, interaction_id)
+
+    async def credit_many(self, amounts: Dict[Account, int], kind: str):
+        if not amounts:
+            return
+        async with self.db.transaction() as tx:
+            await tx.executemany('''
+                INSERT OR IGNORE INTO economy (guild_id, user_id, balance)
+                VALUES (?, ?, 0)
+            ''', list(amounts))
+            await tx.executemany('''
+                UPDATE economy
+                SET balance = balance + ?
+                WHERE guild_id = ? AND user_id = ?
+            ''', [(amount, guild_id, user_id) for (guild_id, user_id), amount in amounts.items()])
+            await ledger.record(tx, [
+                (guild_id, user_id, kind, SYSTEM_ACCOUNT, amount, None)
+                for (guild_id, user_id), amount in amounts.items()
+            ])
+
+    async def credit_payment(self, payment_id: str, guild_id: int, user_id: int, amount: int) -> bool:
+        async with self.db.transaction() as tx:
+            inserted = await tx.execute('''
+                INSERT OR IGNORE INTO processed_payments (payment_id, guild_id, user_id, amount)
+                VALUES (?, ?, ?, ?)
+            ''', (payment_id, guild_id, user_id, amount))
+            if not inserted:
+                return False
+            await transfers.mint(tx, guild_id, user_id, amount, 'payment')
+        transfers.transfer_results.labels(kind='payment', result='ok').inc()
+        return True
+
+    async def payment_processed(self, payment_id: str) -> bool:
+        row = await self.db.fetchone('SELECT 1 FROM processed_payments WHERE payment_id = ?', (payment_id,))
+        return row is not None
+
+    async def debit(self, guild_id: int, user_id: int, amount: int, kind: str,
+                    interaction_id: Optional[int] = None) -> bool:
+        return await transfers.debit(self.db, guild_id, user_id, amount, kind, interaction_id)
+
+    async def transfer(self, guild_id: int, sender_id: int, receiver_id: int, amount: int,
+                       interaction_id: Optional[int] = None) -> bool:
+        return await transfers.transfer(self.db, guild_id, sender_id, receiver_id, amount, interaction_id)
+
+    async def remove_percent(self, guild_id: int, user_id: int, percent: float,
+                             interaction_id: Optional[int] = None) -> Tuple[int, int, int]:
+        return await transfers.remove_percent(self.db, guild_id, user_id, percent, interaction_id)
+
+    async def reset(self, guild_id: int, user_id: int, interaction_id: Optional[int] = None) -> Optional[int]:
+        return await transfers.reset(self.db, guild_id, user_id, interaction_id)
+
+    async def reset_all(self, guild_id: int, interaction_id: Optional[int] = None, only_positive: bool = False):
+        await transfers.reset_all(self.db, guild_id, interaction_id, only_positive)
+
+    async def statement(self, guild_id: int, user_id: int, before: Optional[int] = None,
+                        limit: int = 10) -> List[tuple]:
+        return await ledger.statement(self.db, guild_id, user_id, before, limit)
+
+    async def checkpoint_ledger(self) -> int:
+        return await ledger.checkpoint(self.db)
+
+    async def rebuild_balance(self, guild_id: int, user_id: int) -> int:
+        return await ledger.rebuild_balance(self.db, guild_id, user_id)
+
+    # Messages
+
+    async def record_messages(self, messages: List[MessageRecord]):
+        authors = aggregate_messages(messages)
+        async with self.db.transaction() as tx:
+            await tx.executemany('''
+                INSERT OR IGNORE INTO economy (guild_id, user_id, balance)
+                VALUES (?, ?, 0)
+            ''', [(guild_id, user_id) for guild_id, user_id, _, _ in authors])
+            await tx.executemany('''
+                INSERT INTO messages (guild_id, user_id, content)
+                VALUES (?, ?, ?)
+            ''', [(message.guild_id, message.user_id, message.content) for message in messages])
+            # SET expressions all see the old message_count, so the reward
+            # counts how many multiples of 10 this batch crossed
+            await tx.executemany(f'''
+                UPDATE economy
+                SET message_count = message_count + ?,
+                balance = balance + ? * ((message_count + ?) / {MESSAGES_PER_REWARD} - message_count / {MESSAGES_PER_REWARD})
+                WHERE guild_id = ? AND user_id = ?
+            ''', [(count, reward, count, guild_id, user_id) for guild_id, user_id, count, reward in authors])
+            await tx.executemany(f'''
+                INSERT INTO ledger (guild_id, user_id, kind, counterparty, amount)
+                SELECT guild_id, user_id, 'message_reward', ?,
+                    ? * (message_count / {MESSAGES_PER_REWARD} - (message_count - ?) / {MESSAGES_PER_REWARD})
+                FROM economy
+                WHERE guild_id = ? AND user_id = ?
+                AND message_count / {MESSAGES_PER_REWARD} > (message_count - ?) / {MESSAGES_PER_REWARD}
+            ''', [
+                (SYSTEM_ACCOUNT, reward, count, guild_id, user_id, count)
+                for guild_id, user_id, count, reward in authors if reward
+            ])
+
+    async def prune_messages(self, cutoff: datetime, limit: int) -> int:
+        # messages.timestamp is written by CURRENT_TIMESTAMP as UTC text
+        cutoff = format_timestamp(cutoff)
+        async with self.db.transaction() as tx:
+            row = await tx.fetchone('''
+                SELECT MAX(id), COUNT(*) FROM (
+                    SELECT id FROM messages
+                    WHERE timestamp < ?
+                    ORDER BY id
+                    LIMIT ?
+                )
+            ''', (cutoff, limit))
+            last_id, count = row
+            if not count:
+                return 0
+
+            await tx.execute('''
+                INSERT INTO message_rollups (guild_id, user_id, hour, message_count)
+                SELECT guild_id, user_id, strftime('%Y-%m-%d %H:00:00', timestamp), COUNT(*)
+                FROM messages
+                WHERE id <= ? AND timestamp < ?
+                GROUP BY guild_id, user_id, strftime('%Y-%m-%d %H:00:00', timestamp)
+                ON CONFLICT (guild_id, user_id, hour)
+                DO UPDATE SET message_count = message_count + excluded.message_count
+            ''', (last_id, cutoff))
+            return await tx.execute('''
+                DELETE FROM messages
+                WHERE id <= ? AND timestamp < ?
+            ''', (last_id, cutoff))
+
+    async def compact(self):
+        # Each step of the pragma frees one page, so the cursor must be drained
+        await self.db.fetchall(f'PRAGMA incremental_vacuum({int(self.vacuum_pages)})')
+
+    # Exemptions
+
+    async def exempted_users(self) -> Set[Account]:
+        rows = await self.db.fetchall('SELECT guild_id, user_id FROM excepted_users')
+        return {(guild_id, user_id) for guild_id, user_id in rows}
+
+    async def add_exemption(self, guild_id: int, user_id: int):
+        await self.db.execute(
+            'INSERT OR REPLACE INTO excepted_users (guild_id, user_id) VALUES (?, ?)', (guild_id, user_id)
+        )
+
+    async def remove_exemption(self, guild_id: int, user_id: int):
+        await self.db.execute('DELETE FROM excepted_users WHERE guild_id = ? AND user_id = ?', (guild_id, user_id))
+
+    # Guild settings
+
+    async def guild_settings(self) -> Dict[int, GuildSettings]:
+        rows = await self.db.fetchall(f"SELECT {', '.join(GuildSettings._fields)} FROM guild_settings")
+        return {row[0]: GuildSettings(*row) for row in rows}
+
+    async def save_guild_settings(self, settings: GuildSettings):
+        await self.db.execute(
+            f"INSERT OR REPLACE INTO guild_settings ({', '.join(GuildSettings._fields)}) VALUES (?, ?, ?, ?, ?)",
+            tuple(settings)
+        )
+
+    # Rankings
+
+    async def all_balances(self, guild_ids: Optional[Iterable[int]] = None) -> Dict[Account, int]:
+        if guild_ids is None:
+            rows = await self.db.fetchall('SELECT guild_id, user_id, balance FROM economy')
+        else:
+            rows = await self._select_in(
+                'SELECT guild_id, user_id, balance FROM economy WHERE guild_id IN ({})', list(set(guild_ids))
+            )
+        return {(guild_id, user_id): balance or 0 for guild_id, user_id, balance in rows}
+
+    async def balances(self, accounts: Iterable[Account]) -> Dict[Account, int]:
+        accounts = list(set(accounts))
+        if not accounts:
+            return {}
+        # Row values keep the composite key lookup on the primary key index
+        rows = await self._select_in(
+            'SELECT guild_id, user_id, balance FROM economy WHERE (guild_id, user_id) IN (VALUES {})',
+            accounts, placeholder='(?, ?)'
+        )
+        return {(guild_id, user_id): balance or 0 for guild_id, user_id, balance in rows}
+
+    async def _select_in(self, sql: str, values: List[Any], placeholder: str = '?') -> List[tuple]:
+        # Chunked to stay under SQLite's bound-parameter limit
+        rows = []
+        for start in range(0, len(values), IN_CHUNK):
+            chunk = values[start:start + IN_CHUNK]
+            params = [param for value in chunk for param in (value if isinstance(value, tuple) else (value,))]
+            rows += await self.db.fetchall(sql.format(', '.join([placeholder] * len(chunk))), params)
+        return rows
+
+    async def totals(self, guild_id: int) -> Tuple[int, Optional[int]]:
+        return await self.db.fetchone('''
+            SELECT COUNT(*) as total_users,
+            SUM(balance) as total_money
+            FROM economy
+            WHERE guild_id = ? AND balance > 0
+        ''', (guild_id,))
+
+    # Bulk copy
+
+    async def count_rows(self, table: str) -> int:
+        return (await self.db.fetchone(f'SELECT COUNT(*) FROM {table}'))[0]
+
+    async def export_rows(self, table: str, batch: int) -> AsyncIterator[List[tuple]]:
+        columns = TABLES[table]
+        timestamps = [index for index, column in enumerate(columns) if column in TIMESTAMP_COLUMNS]
+        last_rowid = 0
+        while True:
+            rows = await self.db.fetchall(f'''
+                SELECT rowid, {', '.join(columns)} FROM {table}
+                WHERE rowid > ?
+                ORDER BY rowid
+                LIMIT ?
+            ''', (last_rowid, batch))
+            if not rows:
+                return
+            last_rowid = rows[-1][0]
+            converted = []
+            for row in rows:
+                row = list(row[1:])
+                for index in timestamps:
+                    row[index] = parse_timestamp(row[index])
+                converted.append(tuple(row))
+            yield converted
+
+    async def import_rows(self, table: str, rows: List[tuple]):
+        columns = TABLES[table]
+        timestamps = [index for index, column in enumerate(columns) if column in TIMESTAMP_COLUMNS]
+        converted = []
+        for row in rows:
+            row = list(row)
+            for index in timestamps:
+                row[index] = format_timestamp(row[index])
+            converted.append(tuple(row))
+        await self.db.executemany(
+            f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+            converted
+        )
+
+    async def finish_import(self):
+        # AUTOINCREMENT keys continue from the largest imported ID on their own
+        pass
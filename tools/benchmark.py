@@ -0,0 +1,287 @@
+"""Throughput benchmark for the bot's hot paths.
+
+Drives the real on_message, voice checkpoint, /saldo, /ranking and
+/enviar handlers from main.py against stub Discord objects and a temporary
+SQLite file. Reports ops/s, p50/p99 latency and database growth, and writes
+the results as JSON. Pass an earlier results file as ``--baseline`` to
+compare; the run fails when a p99 or a throughput figure regresses past
+``--tolerance``. The message rate limiter is off unless
+MESSAGE_RATE_PER_MINUTE is set; ``accepted`` counts the messages that
+got past it.
+
+    python -m tools.benchmark --users 1000 --messages 20000 --output bench.json
+    python -m tools.benchmark --baseline bench.json
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+from typing import Dict, List, Optional
+
+import discord
+
+import ratelimit
+
+_ids = itertools.count(10 ** 17)
+
+
+class FakeVoiceChannel(discord.VoiceChannel):
+    """A voice channel as far as voice.is_eligible's type check goes."""
+
+    # Shadows the property that reads the gateway voice states
+    members = None
+
+    def __init__(self):
+        self.members = []
+
+
+class FakeUser:
+    def __init__(self, user_id: int, guild: Optional['FakeGuild'] = None, admin: bool = False):
+        self.id = user_id
+        self.bot = False
+        self.guild = guild
+        self.name = self.display_name = f'user{user_id}'
+        self.mention = f'<@{user_id}>'
+        self.display_avatar = SimpleNamespace(url='https://cdn.discordapp.com/embed/avatars/0.png')
+        self.guild_permissions = SimpleNamespace(administrator=admin)
+        self.voice = None
+
+    async def send(self, *args, **kwargs):
+        pass
+
+
+class FakeGuild:
+    def __init__(self, guild_id: int):
+        self.id = guild_id
+        self.icon = None
+        self.members: Dict[int, FakeUser] = {}
+        self.voice_channels: List[SimpleNamespace] = []
+
+    def get_member(self, user_id: int) -> Optional[FakeUser]:
+        return self.members.get(user_id)
+
+    async def query_members(self, user_ids, limit, cache):
+        return [self.members[user_id] for user_id in user_ids if user_id in self.members]
+
+    async def fetch_member(self, user_id: int) -> FakeUser:
+        return self.members[user_id]
+
+
+class FakeResponse:
+    def __init__(self):
+        self._done = False
+
+    def is_done(self) -> bool:
+        return self._done
+
+    async def send_message(self, *args, **kwargs):
+        self._done = True
+
+    async def defer(self, *args, **kwargs):
+        self._done = True
+
+
+class FakeFollowup:
+    async def send(self, *args, **kwargs):
+        pass
+
+
+class FakeInteraction:
+    def __init__(self, user: FakeUser, guild: FakeGuild):
+        self.id = next(_ids)
+        self.user = user
+        self.guild = guild
+        self.guild_id = guild.id
+        self.response = FakeResponse()
+        self.followup = FakeFollowup()
+
+
+def _percentile(samples: List[float], q: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+def _summary(latencies: List[float], elapsed: float) -> dict:
+    return {
+        'ops': len(latencies),
+        'ops_per_sec': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(_percentile(latencies, 0.5) * 1000, 3),
+        'p99_ms': round(_percentile(latencies, 0.99) * 1000, 3),
+    }
+
+
+def _db_size(path: str) -> int:
+    return sum(
+        os.path.getsize(path + suffix)
+        for suffix in ('', '-wal', '-journal')
+        if os.path.exists(path + suffix)
+    )
+
+
+async def _timed(latencies: List[float], coro):
+    start = time.perf_counter()
+    await coro
+    latencies.append(time.perf_counter() - start)
+
+
+async def _bench_messages(main, guild: FakeGuild, users: List[FakeUser], count: int, rate: float,
+                          rng: random.Random) -> dict:
+    limited = ratelimit.limited_total.labels(limiter='messages')
+    limited_before = limited.value
+    latencies: List[float] = []
+    start = time.perf_counter()
+    for n in range(count):
+        if rate:
+            # Hold the offered load at ``rate`` messages per second
+            delay = start + n / rate - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        author = rng.choice(users)
+        message = SimpleNamespace(author=author, guild=guild, content='mensagem de benchmark ' * 3)
+        await _timed(latencies, main.on_message(message))
+        if not rate and n % 100 == 0:
+            # Let the batcher run as it would between gateway events
+            await asyncio.sleep(0)
+    await main.client.message_batcher.flush()
+    elapsed = time.perf_counter() - start
+    # Rate-limited messages return before any write; report how many took the real path
+    return dict(_summary(latencies, elapsed), accepted=count - int(limited.value - limited_before))
+
+
+async def _bench_voice(main, guild: FakeGuild, members: int, ticks: int) -> dict:
+    channel = FakeVoiceChannel()
+    guild.voice_channels = [channel]
+    for member in list(guild.members.values())[:members]:
+        member.voice = SimpleNamespace(channel=channel, afk=False, self_deaf=False)
+        channel.members.append(member)
+    tracker = main.client.voice_tracker
+    await tracker.rebuild([guild])
+
+    latencies: List[float] = []
+    start = time.perf_counter()
+    for _ in range(ticks):
+        # Pretend a minute went by so every session has something to pay
+        for key in tracker.sessions:
+            tracker.sessions[key] -= 60
+        await _timed(latencies, tracker.checkpoint())
+    elapsed = time.perf_counter() - start
+    return dict(_summary(latencies, elapsed), members=len(tracker.sessions))
+
+
+async def _bench_command(coro_factory, count: int, concurrency: int) -> dict:
+    latencies: List[float] = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(n):
+        async with semaphore:
+            await _timed(latencies, coro_factory(n))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(n) for n in range(count)))
+    elapsed = time.perf_counter() - start
+    return _summary(latencies, elapsed)
+
+
+async def run(args) -> dict:
+    import main
+
+    rng = random.Random(args.seed)
+    guild = FakeGuild(next(_ids))
+    users = [FakeUser(next(_ids), guild) for _ in range(args.users)]
+    guild.members = {user.id: user for user in users}
+    main.client._connection.user = FakeUser(next(_ids))
+
+    client = main.client
+    await client.setup_database()
+    await client.attach_guilds([guild])
+    client.message_batcher.start()
+    path = client.db.path
+    results = {'db_bytes_start': _db_size(path)}
+
+    results['on_message'] = await _bench_messages(main, guild, users, args.messages, args.rate, rng)
+    results['db_bytes_after_messages'] = _db_size(path)
+
+    results['voice_checkpoint'] = await _bench_voice(main, guild, args.voice_members, args.voice_ticks)
+
+    results['saldo'] = await _bench_command(
+        lambda n: main.saldo.callback(FakeInteraction(rng.choice(users), guild), None),
+        args.commands, args.concurrency
+    )
+    results['ranking'] = await _bench_command(
+        lambda n: main.ranking.callback(FakeInteraction(rng.choice(users), guild)),
+        args.commands, args.concurrency
+    )
+
+    def send(n):
+        sender, receiver = rng.sample(users, 2)
+        return main.enviar.callback(FakeInteraction(sender, guild), receiver, round(rng.uniform(0.01, 5), 2))
+    results['enviar'] = await _bench_command(send, args.commands, args.concurrency)
+
+    await client.message_batcher.stop()
+    results['db_bytes_end'] = _db_size(path)
+    await client.storage.close()
+    await client.db.close()
+    return results
+
+
+def _compare(results: dict, baseline: dict, tolerance: float) -> List[str]:
+    regressions = []
+    for name, current in results.items():
+        if not isinstance(current, dict):
+            continue
+        previous = baseline.get(name)
+        if not isinstance(previous, dict) or 'p99_ms' not in current or 'p99_ms' not in previous:
+            continue
+        if current['p99_ms'] > previous['p99_ms'] * (1 + tolerance):
+            regressions.append(f"{name}: p99 {previous['p99_ms']} -> {current['p99_ms']} ms")
+        if current['ops_per_sec'] < previous['ops_per_sec'] * (1 - tolerance):
+            regressions.append(f"{name}: {previous['ops_per_sec']} -> {current['ops_per_sec']} ops/s")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--messages', type=int, default=20000)
+    parser.add_argument('--rate', type=float, default=0, help='mensagens por segundo (0 = sem limite)')
+    parser.add_argument('--voice-members', type=int, default=500)
+    parser.add_argument('--voice-ticks', type=int, default=20)
+    parser.add_argument('--commands', type=int, default=500, help='execuções de cada comando')
+    parser.add_argument('--concurrency', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='grava os resultados neste arquivo JSON')
+    parser.add_argument('--baseline', help='resultados anteriores para comparar')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='piora aceita antes de falhar (0.2 = 20%%)')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # main reads its settings at import time
+        os.environ['DATABASE_PATH'] = os.path.join(tmp, 'bench.db')
+        os.environ.setdefault('TRACE_SPAN_THRESHOLD_SECONDS', 'inf')
+        # Synthetic users post far faster than the limiter allows; measure the write path
+        os.environ.setdefault('MESSAGE_RATE_PER_MINUTE', '0')
+        results = asyncio.run(run(args))
+
+    results['params'] = {key: value for key, value in vars(args).items() if key not in ('output', 'baseline')}
+    print(json.dumps(results, indent=2))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = _compare(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSÃO {regression}")
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""Copy the bot's economy data between storage backends.
+
+Source and target are each a SQLite file path or a PostgreSQL DSN. The
+target is brought to the current schema first and must hold no rows in
+any copied table. Tables are copied in batches, serial sequences are
+advanced past the imported IDs, and the copy is checked by comparing row
+counts and the total balance on both sides.
+
+    python -m tools.migrate_storage --source economy.db --target postgresql://localhost/economia
+    python -m tools.migrate_storage --source postgresql://localhost/economia --target copia.db
+"""
+import argparse
+import asyncio
+import sys
+import time
+
+from database import Database
+from postgres_storage import PostgresStorage
+from storage import TABLES, SQLiteStorage, Storage
+
+
+def open_storage(location: str) -> Storage:
+    if location.startswith(('postgres://', 'postgresql://')):
+        return PostgresStorage(location)
+    return SQLiteStorage(Database(location))
+
+
+async def copy(source: Storage, target: Storage, batch: int) -> bool:
+    await source.setup()
+    await target.setup()
+
+    filled = [table for table in TABLES if await target.count_rows(table)]
+    if filled:
+        print(f"FALHA: o destino já tem dados em {', '.join(filled)}")
+        return False
+
+    for table in TABLES:
+        start = time.perf_counter()
+        copied = 0
+        async for rows in source.export_rows(table, batch):
+            await target.import_rows(table, rows)
+            copied += len(rows)
+        print(f"{table}: {copied} linhas em {time.perf_counter() - start:.2f}s")
+    await target.finish_import()
+
+    ok = True
+    for table in TABLES:
+        expected, obtained = await source.count_rows(table), await target.count_rows(table)
+        if expected != obtained:
+            print(f"FALHA: {table} tem {expected} linhas na origem e {obtained} no destino")
+            ok = False
+
+    expected = sum((await source.all_balances()).values())
+    obtained = sum((await target.all_balances()).values())
+    print(f"Saldo total: origem {expected}, destino {obtained}")
+    ok = ok and expected == obtained
+    print("OK" if ok else "FALHA: cópia divergente")
+    return ok
+
+
+async def run(source_location: str, target_location: str, batch: int) -> bool:
+    source = open_storage(source_location)
+    target = open_storage(target_location)
+    await source.connect()
+    await target.connect()
+    try:
+        return await copy(source, target, batch)
+    finally:
+        await source.close()
+        await target.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--source', required=True, help='arquivo SQLite ou DSN PostgreSQL de origem')
+    parser.add_argument('--target', required=True, help='arquivo SQLite ou DSN PostgreSQL de destino')
+    parser.add_argument('--batch', type=int, default=5000, help='linhas por lote')
+    args = parser.parse_args()
+
+    ok = asyncio.run(run(args.source, args.target, args.batch))
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""Check that a failed scheduled run is retried after a restart.
+
+Registers two catch-up jobs on a temporary database, both of which
+missed their last trigger, one that fails and one that succeeds. After
+they run, a second scheduler reloads them from the same database, the
+way a restarted bot would. The failed job must still be due, the
+successful one must not, and the state the failed job wrote must
+survive.
+
+    python -m tools.scheduler_harness
+"""
+import asyncio
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta, timezone
+
+from database import Database
+from scheduler import CronSchedule, Scheduler
+
+SCHEDULE = '0 9 * * *'
+
+
+async def _failing(state):
+    state['tentativas'] = state.get('tentativas', 0) + 1
+    raise RuntimeError('Discord fora do ar')
+
+
+async def _succeeding(state):
+    state['tentativas'] = state.get('tentativas', 0) + 1
+
+
+def _scheduler(db: Database) -> Scheduler:
+    scheduler = Scheduler(db)
+    scheduler.add_job('falha', CronSchedule(SCHEDULE), _failing, catch_up=True)
+    scheduler.add_job('sucesso', CronSchedule(SCHEDULE), _succeeding, catch_up=True)
+    return scheduler
+
+
+async def run() -> bool:
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(os.path.join(tmp, 'scheduler.db'))
+        await db.connect()
+        scheduler = _scheduler(db)
+        await scheduler.setup()
+        # Both jobs last ran two days ago, so a trigger was missed
+        missed = (datetime.now(timezone.utc) - timedelta(days=2)).isoformat()
+        for name in scheduler.jobs:
+            await db.execute('INSERT INTO scheduler_jobs (name, last_run, state) VALUES (?, ?, ?)',
+                             (name, missed, '{}'))
+
+        await scheduler.start()
+        while any(job.state.get('tentativas') != 1 for job in scheduler.jobs.values()):
+            await asyncio.sleep(0.01)
+        await scheduler.stop()
+
+        restarted = _scheduler(db)
+        now = datetime.now(timezone.utc)
+        for job in restarted.jobs.values():
+            await restarted._load(job)
+        await db.close()
+
+    failed, succeeded = restarted.jobs['falha'], restarted.jobs['sucesso']
+    print(f"Após reiniciar: falha próxima em {failed.next_run.isoformat()}, "
+          f"sucesso próxima em {succeeded.next_run.isoformat()}")
+    ok = failed.next_run <= now < succeeded.next_run and failed.state.get('tentativas') == 1
+    print("OK" if ok else "FALHA: tarefa que falhou não ficou pendente após reiniciar")
+    return ok
+
+
+def main():
+    ok = asyncio.run(run())
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
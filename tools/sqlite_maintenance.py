@@ -0,0 +1,54 @@
+"""Offline maintenance for the bot's SQLite file.
+
+Converts the file to incremental auto_vacuum, which lets the retention job
+hand freed pages back to the disk a few at a time. The conversion is a
+full VACUUM: it rewrites the whole file and holds the write lock while it
+runs, so run it with the bot stopped.
+
+    python -m tools.sqlite_maintenance economy.db
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+from database import Database
+
+
+async def enable_incremental_vacuum(path: str) -> bool:
+    if not os.path.exists(path):
+        print(f"FALHA: {path} não existe")
+        return False
+    db = Database(path)
+    await db.connect()
+    try:
+        mode = (await db.fetchone('PRAGMA auto_vacuum'))[0]
+        if mode == 2:
+            print(f"{path} já usa auto_vacuum incremental")
+            return True
+
+        size = os.path.getsize(path)
+        start = time.perf_counter()
+        await db.execute('PRAGMA auto_vacuum = INCREMENTAL')
+        await db.execute('VACUUM')
+        mode = (await db.fetchone('PRAGMA auto_vacuum'))[0]
+    finally:
+        await db.close()
+
+    print(f"VACUUM em {time.perf_counter() - start:.2f}s; {size:,} -> {os.path.getsize(path):,} bytes")
+    print("OK" if mode == 2 else "FALHA: auto_vacuum não foi alterado")
+    return mode == 2
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('path', help='arquivo SQLite do bot (DATABASE_PATH)')
+    args = parser.parse_args()
+
+    ok = asyncio.run(enable_incremental_vacuum(args.path))
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+"""Concurrency stress test for the transfer engine.
+
+Fires thousands of simultaneous transfers and debits at a temporary
+SQLite database, or at an empty PostgreSQL database with ``--postgres``.
+The same user IDs exist in every guild, so a write that leaked across
+guilds would show up as drift. It checks that no balance goes negative and that the total supply only
+shrinks by the debits that succeeded. Every account is also rebuilt from
+the ledger and compared with its stored balance.
+
+    python -m tools.stress_transfers --accounts 50 --transfers 5000
+    python -m tools.stress_transfers --postgres postgresql://localhost/stress
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+from typing import Optional
+
+from database import Database
+from postgres_storage import PostgresStorage
+from storage import SQLiteStorage, Storage
+
+
+async def stress(storage: Storage, accounts: int, count: int, initial: int, seed: int, guilds: int = 2) -> bool:
+    rng = random.Random(seed)
+    await storage.setup()
+    if await storage.count_rows('economy'):
+        print("FALHA: o banco de destino precisa estar vazio")
+        return False
+
+    await storage.credit_many({
+        (guild_id, user_id): initial
+        for guild_id in range(1, guilds + 1)
+        for user_id in range(1, accounts + 1)
+    }, 'admin_add')
+    supply = guilds * accounts * initial
+
+    operations = []
+    debits = []
+    for _ in range(count):
+        guild_id = rng.randint(1, guilds)
+        sender = rng.randint(1, accounts)
+        receiver = rng.randint(1, accounts - 1)
+        receiver += receiver >= sender
+        # Large amounts make overdraft attempts common
+        amount = rng.randint(1, initial)
+        if rng.random() < 0.1:
+            debits.append(amount)
+            operations.append(storage.debit(guild_id, sender, amount, 'withdrawal'))
+        else:
+            debits.append(0)
+            operations.append(storage.transfer(guild_id, sender, receiver, amount))
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*operations)
+    elapsed = time.perf_counter() - start
+
+    debited = sum(amount for amount, ok in zip(debits, results) if ok and amount)
+    stored = await storage.all_balances()
+    total, lowest = sum(stored.values()), min(stored.values())
+    drifted = [
+        account for account, balance in stored.items()
+        if await storage.rebuild_balance(*account) != balance
+    ]
+
+    succeeded = sum(results)
+    print(f"{count} operações em {elapsed:.2f}s ({count / elapsed:,.0f} ops/s), "
+          f"{succeeded} aceitas, {count - succeeded} recusadas por saldo")
+    print(f"Oferta total: esperado {supply - debited}, obtido {total}; menor saldo: {lowest}")
+    print(f"Contas divergentes do razão: {len(drifted)}")
+
+    ok = total == supply - debited and lowest >= 0 and not drifted
+    print("OK" if ok else "FALHA: saldo criado ou destruído")
+    return ok
+
+
+async def run(accounts: int, count: int, initial: int, seed: int, guilds: int, postgres: Optional[str]) -> bool:
+    with tempfile.TemporaryDirectory() as tmp:
+        if postgres:
+            storage = PostgresStorage(postgres, max_size=20)
+        else:
+            storage = SQLiteStorage(Database(os.path.join(tmp, 'stress.db')))
+        await storage.connect()
+        try:
+            return await stress(storage, accounts, count, initial, seed, guilds)
+        finally:
+            await storage.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--accounts', type=int, default=50, help='contas por servidor')
+    parser.add_argument('--guilds', type=int, default=2)
+    parser.add_argument('--transfers', type=int, default=5000)
+    parser.add_argument('--initial', type=int, default=10_000, help='saldo inicial em centavos')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--postgres', metavar='DSN', help='roda contra este PostgreSQL (vazio) em vez de SQLite')
+    args = parser.parse_args()
+
+    ok = asyncio.run(run(args.accounts, args.transfers, args.initial, args.seed, args.guilds, args.postgres))
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
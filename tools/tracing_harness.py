@@ -0,0 +1,74 @@
+"""Check that Discord API calls are charged to handler span phases.
+
+Starts a local server that stands in for the Discord API, then runs a
+span that makes one REST call and one interaction response through a
+session carrying instrumentation.http_trace(), the same trace config the
+client passes to discord.py. Checks that the span recorded both the
+``rest`` and the ``response`` phase, each at least as long as the
+server's simulated latency.
+
+    python -m tools.tracing_harness --latency 0.05
+"""
+import argparse
+import asyncio
+import socket
+import sys
+
+import aiohttp
+from aiohttp import web
+
+import instrumentation
+import tracing
+from webserver import WebServer
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+async def run(latency: float) -> bool:
+    async def slow(request: web.Request) -> web.Response:
+        await asyncio.sleep(latency)
+        return web.json_response({})
+
+    port = _free_port()
+    server = WebServer('127.0.0.1', port)
+    server.add_route('GET', '/api/v10/users/@me', slow)
+    server.add_route('POST', '/api/v10/interactions/{id}/{token}/callback', slow)
+    await server.start()
+
+    base = f'http://127.0.0.1:{port}/api/v10'
+    tracing.threshold = float('inf')
+    try:
+        async with aiohttp.ClientSession(trace_configs=[instrumentation.http_trace()]) as session:
+            async with tracing.span('/harness') as span:
+                async with session.get(f'{base}/users/@me') as response:
+                    await response.read()
+                async with session.post(f'{base}/interactions/1/token/callback', json={'type': 4}) as response:
+                    await response.read()
+            # Outside a span the trace has nothing to charge and must not fail
+            async with session.get(f'{base}/users/@me') as response:
+                await response.read()
+    finally:
+        await server.stop()
+
+    phases = {key: round(value * 1000, 1) for key, value in span.phases.items()}
+    print(f"Fases do span (ms): {phases}")
+    ok = all(span.phases.get(phase, 0.0) >= latency for phase in ('rest', 'response'))
+    print("OK" if ok else "FALHA: fase rest ou response não registrada")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--latency', type=float, default=0.05, help='latência simulada da API em segundos')
+    args = parser.parse_args()
+
+    ok = asyncio.run(run(args.latency))
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,154 @@
+"""Load harness for the Mercado Pago webhook endpoint.
+
+Starts the real webhook server on a local port against a temporary
+database and a fake payment API, then posts signed notifications at a
+fixed rate, with a share of them repeated the way Mercado Pago retries.
+Checks that every payment was credited exactly once and that balances
+match the ledger.
+
+    python -m tools.webhook_harness --payments 2000 --duplicates 0.5 --rate 1000
+"""
+import argparse
+import asyncio
+import hashlib
+import hmac
+import os
+import random
+import socket
+import sys
+import tempfile
+import time
+
+import aiohttp
+
+from database import Database
+from payments import DEADCOINS_PER_REAL, PaymentWebhook, payment_reference
+from storage import SQLiteStorage
+from webserver import WebServer
+
+SECRET = 'harness-secret'
+
+
+class FakeMercadoPago:
+    """Answers payment lookups like the API would, after a simulated round-trip."""
+
+    def __init__(self, payments, latency: float):
+        self.payments = payments
+        self.latency = latency
+        self.lookups = 0
+
+    async def get_payment(self, payment_id: str):
+        self.lookups += 1
+        await asyncio.sleep(self.latency)
+        (guild_id, user_id), reais = self.payments[payment_id]
+        return {'status': 200, 'response': {
+            'id': int(payment_id),
+            'status': 'approved',
+            'external_reference': payment_reference(guild_id, user_id),
+            'transaction_amount': reais,
+        }}
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _headers(payment_id: str, request_id: str) -> dict:
+    ts = str(int(time.time() * 1000))
+    manifest = f'id:{payment_id};request-id:{request_id};ts:{ts};'
+    digest = hmac.new(SECRET.encode(), manifest.encode(), hashlib.sha256).hexdigest()
+    return {'x-signature': f'ts={ts},v1={digest}', 'x-request-id': request_id}
+
+
+async def run(count: int, duplicates: float, rate: float, users: int, latency: float, seed: int) -> bool:
+    rng = random.Random(seed)
+    payments = {
+        str(10_000_000 + i): ((rng.randint(1, 2), rng.randint(1, users)), rng.choice([1, 5, 10, 25.5]))
+        for i in range(count)
+    }
+    notifications = list(payments)
+    notifications += [rng.choice(notifications) for _ in range(int(count * duplicates))]
+    rng.shuffle(notifications)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(os.path.join(tmp, 'webhook.db'))
+        storage = SQLiteStorage(db)
+        await storage.connect()
+        await storage.setup()
+
+        gateway = FakeMercadoPago(payments, latency)
+        webhook = PaymentWebhook(storage, gateway, secret=SECRET)
+        port = _free_port()
+        server = WebServer('127.0.0.1', port)
+        server.add_route('POST', '/webhooks/mercadopago', webhook.handle)
+        await server.start()
+
+        url = f'http://127.0.0.1:{port}/webhooks/mercadopago'
+        latencies = []
+        statuses = {}
+
+        async def post(session, n, payment_id):
+            # Spread sends evenly so the offered load is ``rate`` per second
+            await asyncio.sleep(n / rate)
+            start = time.perf_counter()
+            async with session.post(
+                f'{url}?data.id={payment_id}&type=payment',
+                json={'type': 'payment', 'action': 'payment.updated', 'data': {'id': payment_id}},
+                headers=_headers(payment_id, f'req-{n}')
+            ) as response:
+                body = await response.text()
+            latencies.append(time.perf_counter() - start)
+            key = f'{response.status} {body}'
+            statuses[key] = statuses.get(key, 0) + 1
+
+        start = time.perf_counter()
+        connector = aiohttp.TCPConnector(limit=200)
+        async with aiohttp.ClientSession(connector=connector) as session:
+            await asyncio.gather(*(post(session, n, payment_id) for n, payment_id in enumerate(notifications)))
+        elapsed = time.perf_counter() - start
+        await server.stop()
+
+        expected = {}
+        for account, reais in payments.values():
+            expected[account] = expected.get(account, 0) + int(reais * DEADCOINS_PER_REAL) * 100
+        stored = await storage.all_balances()
+        credited = (await db.fetchone("SELECT COUNT(*) FROM ledger WHERE kind = 'payment'"))[0]
+        drifted = [
+            account for account, balance in stored.items()
+            if await storage.rebuild_balance(*account) != balance
+        ]
+        await storage.close()
+
+    latencies.sort()
+    p50 = latencies[len(latencies) // 2] * 1000
+    p99 = latencies[int(len(latencies) * 0.99)] * 1000
+    sent = len(notifications)
+    print(f"{sent} notificações ({sent - count} repetidas) em {elapsed:.2f}s "
+          f"({sent / elapsed:,.0f}/s); p50 {p50:.1f} ms, p99 {p99:.1f} ms")
+    print(f"Respostas: {dict(sorted(statuses.items()))}")
+    print(f"Consultas à API: {gateway.lookups}; créditos no razão: {credited} de {count} pagamentos")
+    print(f"Contas divergentes do razão: {len(drifted)}")
+
+    ok = credited == count and stored == expected and not drifted
+    print("OK" if ok else "FALHA: pagamento perdido ou creditado em dobro")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--payments', type=int, default=2000)
+    parser.add_argument('--duplicates', type=float, default=0.5, help='notificações repetidas por pagamento')
+    parser.add_argument('--rate', type=float, default=1000, help='notificações por segundo')
+    parser.add_argument('--users', type=int, default=100)
+    parser.add_argument('--latency', type=float, default=0.05, help='latência simulada da API em segundos')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    ok = asyncio.run(run(args.payments, args.duplicates, args.rate, args.users, args.latency, args.seed))
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+import contextlib
+import json
+import time
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+import metrics
+
+handler_seconds = metrics.histogram('handler_seconds', 'Command and event handler latency', ['handler'])
+phase_seconds = metrics.histogram(
+    'handler_phase_seconds', 'Time handlers spend in each phase (db, rest, response)', ['handler', 'phase']
+)
+slow_handlers = metrics.counter('slow_handlers_total', 'Handlers that ran past the span threshold', ['handler'])
+startup_seconds = metrics.gauge('startup_phase_seconds', 'Duration of each phase of the last startup', ['phase'])
+
+# Spans longer than this are printed; set once at startup
+threshold = 1.0
+
+
+class Span:
+    """Timing of one handler run, split by the phases it awaited on."""
+
+    __slots__ = ('name', 'attrs', 'start', 'phases')
+
+    def __init__(self, name: str, attrs: Dict[str, object]):
+        self.name = name
+        self.attrs = attrs
+        self.start = time.perf_counter()
+        self.phases: Dict[str, float] = {}
+
+    def add(self, phase: str, seconds: float):
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+
+_current: ContextVar[Optional[Span]] = ContextVar('span', default=None)
+
+
+def current() -> Optional[Span]:
+    """The span of the handler running in this context, if any."""
+    return _current.get()
+
+
+@contextlib.contextmanager
+def phase(name: str):
+    """Charge the time spent inside the block to ``name`` on the current span."""
+    span = _current.get()
+    if span is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        span.add(name, time.perf_counter() - start)
+
+
+@contextlib.asynccontextmanager
+async def span(name: str, **attrs):
+    """Time a handler run; tasks it spawns inherit the span through the context."""
+    current = Span(name, attrs)
+    token = _current.set(current)
+    error = None
+    try:
+        yield current
+    except BaseException as e:
+        error = type(e).__name__
+        raise
+    finally:
+        _current.reset(token)
+        elapsed = time.perf_counter() - current.start
+        handler_seconds.labels(handler=name).observe(elapsed)
+        for phase_name, seconds in current.phases.items():
+            phase_seconds.labels(handler=name, phase=phase_name).observe(seconds)
+        if elapsed >= threshold:
+            slow_handlers.labels(handler=name).inc()
+            # Phases overlap when a handler awaits several things at once,
+            # so they may add up to more than the total
+            print(json.dumps({
+                'span': name,
+                'ms': round(elapsed * 1000, 1),
+                'phases_ms': {key: round(value * 1000, 1) for key, value in current.phases.items()},
+                'error': error,
+                **current.attrs,
+            }, default=str))
+
+
+class StartupTimer:
+    """Times consecutive startup phases; each mark closes the phase that
+    ran since the previous one.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.start = self._last = time.perf_counter()
+        self.phases: Dict[str, float] = {}
+        self.attrs: Dict[str, object] = {}
+        self.done = False
+
+    def mark(self, phase: str):
+        now = time.perf_counter()
+        self.phases[phase] = now - self._last
+        self._last = now
+        startup_seconds.labels(phase=phase).set(self.phases[phase])
+
+    def finish(self, phase: str):
+        """Close the last phase and print the breakdown, once per startup."""
+        if self.done:
+            return
+        self.mark(phase)
+        self.done = True
+        print(json.dumps({
+            'startup': 'ready',
+            'ms': round((self._last - self.start) * 1000, 1),
+            'phases_ms': {key: round(value * 1000, 1) for key, value in self.phases.items()},
+            **self.attrs,
+        }, default=str))
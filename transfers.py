@@ -0,0 +1,125 @@
+from typing import Optional, Tuple
+
+import ledger
+import metrics
+from database import Database, Transaction
+from ledger import SYSTEM_ACCOUNT
+
+transfer_results = metrics.counter('transfers_total', 'Balance debits and transfers by outcome', ['kind', 'result'])
+
+
+async def _ensure(tx: Transaction, guild_id: int, *user_ids: int):
+    await tx.executemany('''
+        INSERT OR IGNORE INTO economy (guild_id, user_id, balance)
+        VALUES (?, ?, 0)
+    ''', [(guild_id, user_id) for user_id in user_ids])
+
+
+async def _debit(tx: Transaction, guild_id: int, user_id: int, amount: int) -> bool:
+    # The balance check and the write are one statement, so two concurrent
+    # debits can never both pass the check
+    rowcount = await tx.execute('''
+        UPDATE economy
+        SET balance = balance - ?
+        WHERE guild_id = ? AND user_id = ? AND balance >= ?
+    ''', (amount, guild_id, user_id, amount))
+    return rowcount == 1
+
+
+async def mint(tx: Transaction, guild_id: int, user_id: int, amount: int, kind: str,
+               interaction_id: Optional[int] = None):
+    """Credit inside the caller's transaction, for writes that must commit together."""
+    await _ensure(tx, guild_id, user_id)
+    await tx.execute('''
+        UPDATE economy
+        SET balance = balance + ?
+        WHERE guild_id = ? AND user_id = ?
+    ''', (amount, guild_id, user_id))
+    await ledger.record(tx, [(guild_id, user_id, kind, SYSTEM_ACCOUNT, amount, interaction_id)])
+
+
+async def credit(db: Database, guild_id: int, user_id: int, amount: int, kind: str,
+                 interaction_id: Optional[int] = None):
+    """Add ``amount`` cents minted by the system (admin credit, purchase, ...)."""
+    async with db.transaction() as tx:
+        await mint(tx, guild_id, user_id, amount, kind, interaction_id)
+    transfer_results.labels(kind=kind, result='ok').inc()
+
+
+async def debit(db: Database, guild_id: int, user_id: int, amount: int, kind: str,
+                interaction_id: Optional[int] = None) -> bool:
+    """Remove ``amount`` cents if the account can cover it; False leaves it untouched."""
+    async with db.transaction() as tx:
+        await _ensure(tx, guild_id, user_id)
+        ok = await _debit(tx, guild_id, user_id, amount)
+        if ok:
+            await ledger.record(tx, [(guild_id, user_id, kind, SYSTEM_ACCOUNT, -amount, interaction_id)])
+    transfer_results.labels(kind=kind, result='ok' if ok else 'insufficient').inc()
+    return ok
+
+
+async def transfer(db: Database, guild_id: int, sender_id: int, receiver_id: int, amount: int,
+                   interaction_id: Optional[int] = None) -> bool:
+    """Move ``amount`` cents between accounts in one BEGIN IMMEDIATE transaction."""
+    async with db.transaction() as tx:
+        await _ensure(tx, guild_id, sender_id, receiver_id)
+        ok = await _debit(tx, guild_id, sender_id, amount)
+        if ok:
+            await tx.execute('''
+                UPDATE economy
+                SET balance = balance + ?
+                WHERE guild_id = ? AND user_id = ?
+            ''', (amount, guild_id, receiver_id))
+            await ledger.record(tx, ledger.transfer_entries(guild_id, sender_id, receiver_id, amount, interaction_id))
+    transfer_results.labels(kind='transfer', result='ok' if ok else 'insufficient').inc()
+    return ok
+
+
+async def remove_percent(db: Database, guild_id: int, user_id: int, percent: float,
+                         interaction_id: Optional[int] = None) -> Tuple[int, int, int]:
+    """Remove ``percent`` of a balance; returns (old, removed, new) in cents."""
+    async with db.transaction() as tx:
+        await _ensure(tx, guild_id, user_id)
+        old = (await tx.fetchone(
+            'SELECT balance FROM economy WHERE guild_id = ? AND user_id = ?', (guild_id, user_id)
+        ))[0]
+        removed = int(old * (percent / 100))
+        await tx.execute('''
+            UPDATE economy
+            SET balance = balance - ?
+            WHERE guild_id = ? AND user_id = ?
+        ''', (removed, guild_id, user_id))
+        if removed:
+            await ledger.record(tx, [
+                (guild_id, user_id, 'admin_remove_percent', SYSTEM_ACCOUNT, -removed, interaction_id)
+            ])
+    transfer_results.labels(kind='admin_remove_percent', result='ok').inc()
+    return old, removed, old - removed
+
+
+async def reset(db: Database, guild_id: int, user_id: int,
+                interaction_id: Optional[int] = None) -> Optional[int]:
+    """Zero an account; returns the previous balance, or None if it doesn't exist."""
+    async with db.transaction() as tx:
+        row = await tx.fetchone(
+            'SELECT balance FROM economy WHERE guild_id = ? AND user_id = ?', (guild_id, user_id)
+        )
+        if row is None:
+            return None
+        await tx.execute('UPDATE economy SET balance = 0 WHERE guild_id = ? AND user_id = ?', (guild_id, user_id))
+        if row[0]:
+            await ledger.record(tx, [(guild_id, user_id, 'admin_reset', SYSTEM_ACCOUNT, -row[0], interaction_id)])
+    return row[0]
+
+
+async def reset_all(db: Database, guild_id: int, interaction_id: Optional[int] = None,
+                    only_positive: bool = False):
+    condition = 'balance > 0' if only_positive else 'balance != 0'
+    async with db.transaction() as tx:
+        await tx.execute(f'''
+            INSERT INTO ledger (guild_id, user_id, kind, counterparty, amount, interaction_id)
+            SELECT guild_id, user_id, 'admin_reset_all', ?, -balance, ?
+            FROM economy
+            WHERE guild_id = ? AND {condition}
+        ''', (SYSTEM_ACCOUNT, interaction_id, guild_id))
+        await tx.execute(f'UPDATE economy SET balance = 0 WHERE guild_id = ? AND {condition}', (guild_id,))
@@ -0,0 +1,164 @@
+import asyncio
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import discord
+
+import metrics
+from storage import Account, Storage
+
+voice_tick_members = metrics.gauge('voice_tick_members', 'Members credited by the last voice checkpoint')
+voice_members_credited = metrics.counter('voice_members_credited_total', 'Voice reward credits paid')
+voice_sessions_open = metrics.gauge('voice_sessions_open', 'Voice sessions currently accruing rewards')
+voice_tick_seconds = metrics.histogram('voice_tick_seconds', 'Duration of voice reward checkpoints')
+
+SessionKey = Account
+
+
+def is_eligible(member: discord.Member, state: Optional[discord.VoiceState]) -> bool:
+    # Voice channels only, as guild.voice_channels in rebuild; stage audiences aren't paid
+    return (
+        state is not None and isinstance(state.channel, discord.VoiceChannel)
+        and not member.bot and not state.afk and not state.self_deaf
+    )
+
+
+class VoiceTracker:
+    """Accrues voice rewards from voice state events instead of polling channels.
+
+    A session is opened when a member becomes eligible and closed when they
+    leave, go AFK or deafen themselves. Accrued time is paid on close and on
+    every checkpoint, pro rata to the second, at the session's guild rate.
+    Only guilds of this process's shards ever open sessions.
+
+    Session marks only advance once ``credit_many`` has committed. A closed
+    session stops accruing at once, but its earnings wait in ``unpaid``
+    until a payout commits, so a failed write is retried on the next close
+    or checkpoint instead of being lost.
+    """
+
+    def __init__(self, storage: Storage, cents_per_minute: Callable[[int], int],
+                 is_excepted: Callable[[int, int], bool]):
+        self.storage = storage
+        # guild_id -> reward rate, so per-guild settings apply on the next tick
+        self.cents_per_minute = cents_per_minute
+        self.is_excepted = is_excepted
+        # Called with (guild_id, user_id, cents) after each committed payout
+        self.on_credit: Optional[Callable[[int, int, int], None]] = None
+        self.sessions: Dict[SessionKey, float] = {}
+        # Cents earned by closed sessions whose payout hasn't committed yet
+        self.unpaid: Dict[SessionKey, int] = {}
+        # Serialises payouts so two of them never pay the same interval
+        self._lock: Optional[asyncio.Lock] = None
+
+    def _payout_lock(self) -> asyncio.Lock:
+        # Created on first use so it belongs to the running loop
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        return self._lock
+
+    def _accrue(self, key: SessionKey, now: float) -> Tuple[int, float]:
+        """Whole cents earned since the session mark, and the mark to move to once they're paid."""
+        started = self.sessions[key]
+        cents_per_second = self.cents_per_minute(key[0]) / 60
+        if cents_per_second <= 0:
+            return 0, now
+        cents = int((now - started) * cents_per_second)
+        # The new mark keeps the fractional remainder for the next payout
+        return cents, started + cents / cents_per_second
+
+    async def _pay(self, keys: Iterable[SessionKey], now: float) -> int:
+        """Pay the given open sessions up to ``now`` plus everything in ``unpaid``.
+
+        Nothing changes unless ``credit_many`` commits. Callers hold the payout lock.
+        """
+        unpaid = dict(self.unpaid)
+        payouts = dict(unpaid)
+        marks: Dict[SessionKey, Tuple[float, float]] = {}
+        for key in keys:
+            cents, mark = self._accrue(key, now)
+            marks[key] = (self.sessions[key], mark)
+            if cents > 0 and not self.is_excepted(*key):
+                payouts[key] = payouts.get(key, 0) + cents
+
+        if payouts:
+            await self.storage.credit_many(payouts, 'voice_reward')
+
+        for key, (old, new) in marks.items():
+            if self.sessions.get(key) == old:
+                self.sessions[key] = new
+        for key, cents in unpaid.items():
+            remaining = self.unpaid.get(key, 0) - cents
+            if remaining > 0:
+                self.unpaid[key] = remaining
+            else:
+                self.unpaid.pop(key, None)
+
+        voice_members_credited.inc(len(payouts))
+        if self.on_credit is not None:
+            for (guild_id, user_id), cents in payouts.items():
+                self.on_credit(guild_id, user_id, cents)
+        return len(payouts)
+
+    def open(self, member: discord.Member):
+        key = (member.guild.id, member.id)
+        if key not in self.sessions:
+            self.sessions[key] = time.monotonic()
+            voice_sessions_open.set(len(self.sessions))
+
+    async def close(self, member: discord.Member):
+        key = (member.guild.id, member.id)
+        if key in self.sessions:
+            await self._close_keys([key])
+
+    async def on_voice_state_update(self, member: discord.Member, after: discord.VoiceState):
+        if is_eligible(member, after):
+            self.open(member)
+        else:
+            await self.close(member)
+
+    async def rebuild(self, guilds: Iterable[discord.Guild]):
+        """Reconcile the given guilds' sessions with the gateway voice state,
+        e.g. after their shard (re)connects. Other guilds are left alone.
+        """
+        guild_ids = set()
+        present = set()
+        for guild in guilds:
+            guild_ids.add(guild.id)
+            for voice_channel in guild.voice_channels:
+                for member in voice_channel.members:
+                    if is_eligible(member, member.voice):
+                        present.add((guild.id, member.id))
+                        self.open(member)
+
+        await self._close_keys([
+            key for key in self.sessions if key[0] in guild_ids and key not in present
+        ])
+
+    async def close_guild(self, guild_id: int):
+        """Pay and close every session of a guild the bot left."""
+        await self._close_keys([key for key in self.sessions if key[0] == guild_id])
+
+    async def _close_keys(self, keys: List[SessionKey]):
+        async with self._payout_lock():
+            now = time.monotonic()
+            for key in keys:
+                # Another close may have won the lock first
+                if key not in self.sessions:
+                    continue
+                # Stop the clock now; the earnings stay in unpaid until paid
+                cents, _ = self._accrue(key, now)
+                if cents > 0 and not self.is_excepted(*key):
+                    self.unpaid[key] = self.unpaid.get(key, 0) + cents
+                del self.sessions[key]
+            voice_sessions_open.set(len(self.sessions))
+            await self._pay([], now)
+
+    async def checkpoint(self) -> int:
+        """Pay every open session up to now; run on the scheduler every minute."""
+        async with self._payout_lock():
+            now = time.monotonic()
+            paid = await self._pay(list(self.sessions), now)
+        voice_tick_seconds.observe(time.monotonic() - now)
+        voice_tick_members.set(paid)
+        return paid
@@ -0,0 +1,30 @@
+from typing import Awaitable, Callable, Optional
+
+from aiohttp import web
+
+Handler = Callable[[web.Request], Awaitable[web.StreamResponse]]
+
+
+class WebServer:
+    """aiohttp server that shares the bot's event loop (no thread per request)."""
+
+    def __init__(self, host: str, port: int):
+        self.host = host
+        self.port = port
+        self.app = web.Application()
+        self._runner: Optional[web.AppRunner] = None
+
+    def add_route(self, method: str, path: str, handler: Handler):
+        self.app.router.add_route(method, path, handler)
+
+    async def start(self):
+        self._runner = web.AppRunner(self.app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        print(f"Servidor HTTP ouvindo em {self.host}:{self.port}")
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None